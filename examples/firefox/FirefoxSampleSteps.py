@@ -5,11 +5,12 @@ import shutil
 import sys
 import tempfile
 
+from quickrelease.archive import ArchiveIndex, ExtractArchive
 from quickrelease.command import LoggedShellCommand
 from quickrelease.deliverable import FindDeliverables, GetDeliverable, GetAllDeliverables
 from quickrelease.exception import ReleaseFrameworkError
 from quickrelease.step import Step
-from quickrelease.utils import GetBuildPlatform, GetSHA1FileHash, JoinPaths
+from quickrelease.utils import GetBuildPlatform, GetSHA1FileHash, JoinPaths, ParseChecksumManifest
 
 def PlatformCheck(conf):
    thisPlatform = GetBuildPlatform()
@@ -23,6 +24,10 @@ def PlatformCheck(conf):
 def GetSourceDirRoot(conf):
     return JoinPaths(conf.rootDir, conf.Get('source_root_dir'))
 
+def GetSourceIndexFile(conf):
+    return JoinPaths(conf.rootDir, "%s.SHA1SUMS" % (os.path.basename(
+     conf.Get('source_download_url'))))
+
 def GetObjDir(conf):
     return JoinPaths(GetSourceDirRoot(conf), conf.Get('objdir'))
 
@@ -36,18 +41,13 @@ def VerifyFirefoxDownload(conf):
 
     sha1SumsFile = os.path.basename(conf.Get('sha1_checksum_download_url'))
 
-    sha1SumHandle = open(sha1SumsFile, 'r')
-
-    sumFilePath = "./source/%s" % (sourceFile)
+    sumFilePath = "source/%s" % (sourceFile)
     sourceSha1 = None
-    for line in sha1SumHandle.readlines():
-        (sha1, filename) = line.split(None, 1)
-        if filename.strip() == sumFilePath:
+    for (sha1, filename) in ParseChecksumManifest(sha1SumsFile):
+        if filename == sumFilePath:
             sourceSha1 = sha1
             break
 
-    sha1SumHandle.close()
-
     if sourceSha1 is None:
         raise ValueError("Couldn't find entry for %s in %s" %
          (sumFilePath, sha1SumsFile))
@@ -220,23 +220,27 @@ class FirefoxExtractSource(Step):
         sourceTarball = JoinPaths(conf.rootDir,
          os.path.basename(conf.Get('source_download_url')))
 
-        cmd = [ conf.GetConstant('TAR'),
-                '-xvjf',
-                sourceTarball ]
-
-        rv = LoggedShellCommand(command=cmd,
-                                workdir=conf.rootDir)
+        sourceIndex = ExtractArchive(sourceTarball, conf.rootDir)
+        sourceIndex.WriteChecksumManifest(GetSourceIndexFile(conf))
 
     def Verify(self):
         conf = self.config
 
         firefoxTestFiles = conf.Get('source_test_files', list)
-        sourceRoot = GetSourceDirRoot(conf)
+        sourceRootDir = os.path.normpath(conf.Get('source_root_dir'))
 
         try:
-            VerifyFileList(firefoxTestFiles, sourceRoot)
+            sourceIndex = ArchiveIndex.FromChecksumManifest(
+             GetSourceIndexFile(conf), conf.rootDir)
         except ValueError, ex:
-            raise self.SimpleStepError("Missing Firefox source file: %s" % (ex))
+            raise self.SimpleStepError("Couldn't read Firefox source index: "
+             "%s" % (ex))
+
+        for f in firefoxTestFiles:
+            testFile = JoinPaths(sourceRootDir, f).replace(os.sep, '/')
+            if testFile not in sourceIndex:
+                raise self.SimpleStepError("Missing Firefox source file: %s" %
+                 (testFile))
 
 class FirefoxConfigureBuild(Step):
     def _GetMozconfigFilename(self):
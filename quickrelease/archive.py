@@ -0,0 +1,1303 @@
+# ex:ts=4:sw=4:sts=4:et
+# -*- tab-width: 4; c-basic-offset: 4; indent-tabs-mode: nil -*-
+
+r"""In-process creation and extraction of tar.gz, tar.bz2 and zip archives,
+(de)compressed in parallel.
+
+Like C{pigz} and C{pbzip2}, archives are split into blocks which are
+compressed independently by a pool of processes, and written out in order as
+they're completed: tar.gz archives consist of one gzip member per block,
+tar.bz2 archives of one bzip2 stream per block, and zip entries of one
+deflate segment per block. The archive is written as a stream (it is never
+seeked), and its checksums are computed while it's written. Archives
+written this way are also decompressed in parallel when extracted with
+L{ExtractArchive}.
+"""
+
+import bz2
+from collections import deque
+import copy
+import hashlib
+import itertools
+import multiprocessing
+import os
+from Queue import Queue
+import re
+import stat
+from StringIO import StringIO
+import struct
+import sys
+import tarfile
+from threading import current_thread, local, Thread
+import time
+import zipfile
+import zlib
+
+from quickrelease.config import ConfigSpec
+from quickrelease.exception import ReleaseFrameworkError
+from quickrelease.utils import GetParallelWorkerCount, Makedirs, ParallelMap, ParseChecksumManifest, ReplaceFile
+
+ARCHIVE_FORMAT_TAR_GZ = 'tar.gz'
+"""A gzip-compressed tar archive."""
+ARCHIVE_FORMAT_TAR_BZ2 = 'tar.bz2'
+"""A bzip2-compressed tar archive."""
+ARCHIVE_FORMAT_ZIP = 'zip'
+"""A zip archive (including jar and xpi files)."""
+
+_ARCHIVE_EXTENSIONS = (('.tar.gz', ARCHIVE_FORMAT_TAR_GZ),
+                       ('.tgz', ARCHIVE_FORMAT_TAR_GZ),
+                       ('.tar.bz2', ARCHIVE_FORMAT_TAR_BZ2),
+                       ('.tbz2', ARCHIVE_FORMAT_TAR_BZ2),
+                       ('.zip', ARCHIVE_FORMAT_ZIP),
+                       ('.jar', ARCHIVE_FORMAT_ZIP),
+                       ('.xpi', ARCHIVE_FORMAT_ZIP),
+                      )
+
+_BLOCK_COMPRESSION_GZIP = 'gzip'
+_BLOCK_COMPRESSION_BZIP2 = 'bzip2'
+_BLOCK_COMPRESSION_DEFLATE = 'deflate'
+
+_ZIP_DATA_DESCRIPTOR_SIGNATURE = 'PK\x07\x08'
+
+def GetArchiveFormat(archivePath):
+    """
+    Determine the format of an archive from its file name.
+
+    @param archivePath: The name of (or path to) the archive.
+    @type archivePath: C{str}
+
+    @return: One of the C{ARCHIVE_FORMAT_*} constants in this module.
+    @rtype: C{str}
+
+    @raise ValueError: If the archive's extension isn't recognized.
+    """
+    lowerPath = archivePath.lower()
+    for (extension, archiveFormat) in _ARCHIVE_EXTENSIONS:
+        if lowerPath.endswith(extension):
+            return archiveFormat
+
+    raise ValueError("Unknown archive format: %s" % (archivePath))
+
+def _CompressBlock(work):
+    # Runs in the worker processes.
+    (compression, level, data, isLast) = work
+
+    if compression == _BLOCK_COMPRESSION_GZIP:
+        compressor = zlib.compressobj(level, zlib.DEFLATED,
+         16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    elif compression == _BLOCK_COMPRESSION_BZIP2:
+        return bz2.compress(data, level)
+    elif compression == _BLOCK_COMPRESSION_DEFLATE:
+        # Raw deflate; all but the last segment of an entry end with an
+        # empty, non-final stored block (i.e. a sync flush), so segments
+        # compressed independently can simply be concatenated.
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        if isLast:
+            return compressor.compress(data) + compressor.flush()
+        else:
+            return (compressor.compress(data) +
+             compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    assert False, "Unknown block compression: %s" % (compression)
+
+class _DigestingWriter(object):
+    """
+    A write-only file-like object which computes checksums of, and counts,
+    the data written through it.
+    """
+    def __init__(self, fileObj, algorithms):
+        object.__init__(self)
+        self._fileObj = fileObj
+        self._hashers = list((algo, hashlib.new(algo)) for algo in algorithms)
+        self._offset = 0
+
+    def write(self, data):
+        self._fileObj.write(data)
+        for (algo, h) in self._hashers:
+            h.update(data)
+        self._offset += len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        self._fileObj.flush()
+
+    def GetDigests(self):
+        return dict((algo, h.hexdigest()) for (algo, h) in self._hashers)
+
+class _ReadyResult(object):
+    """
+    Stands in for a pool's C{AsyncResult} for work which needs no compression.
+    """
+    def __init__(self, value):
+        object.__init__(self)
+        self._value = value
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return self._value
+
+class _OrderedCompressor(object):
+    """
+    Compresses blocks in a pool of worker processes, and passes the results,
+    in the order the blocks were submitted, to a sink function. At most a few
+    blocks per worker are in flight at any time, so memory use is bounded no
+    matter how large the archive is.
+
+    Submitting C{None} as the work passes C{None} to the sink in order,
+    without compressing anything.
+    """
+    def __init__(self, workers, sink):
+        object.__init__(self)
+        self._sink = sink
+        self._pending = deque()
+        self._window = workers * 2
+        self._pool = None
+
+        if workers > 1:
+            self._pool = multiprocessing.Pool(workers)
+
+    def Submit(self, work, context=None):
+        if self._pool is None:
+            if work is None:
+                self._sink(None, context)
+            else:
+                self._sink(_CompressBlock(work), context)
+            return
+
+        if work is None:
+            result = _ReadyResult(None)
+        else:
+            result = self._pool.apply_async(_CompressBlock, (work,))
+
+        self._pending.append((result, context))
+
+        while len(self._pending) > self._window:
+            self._Drain()
+
+    def _Drain(self):
+        (result, context) = self._pending.popleft()
+        self._sink(result.get(), context)
+
+    def Close(self):
+        while len(self._pending) > 0:
+            self._Drain()
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+    def Abort(self):
+        self._pending.clear()
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+
+class _TarBlockWriter(object):
+    """
+    A write-only file-like object for C{tarfile} to write a tar stream to;
+    the stream is split into blocks and submitted for compression.
+    """
+    def __init__(self, compressor, compression, level, blockSize):
+        object.__init__(self)
+        self._compressor = compressor
+        self._compression = compression
+        self._level = level
+        self._blockSize = blockSize
+        self._buffer = []
+        self._bufferSize = 0
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._bufferSize += len(data)
+
+        if self._bufferSize >= self._blockSize:
+            self._SubmitBlock()
+
+    def _SubmitBlock(self):
+        if self._bufferSize == 0:
+            return
+
+        data = ''.join(self._buffer)
+        self._buffer = []
+        self._bufferSize = 0
+        self._compressor.Submit((self._compression, self._level, data, False))
+
+    def close(self):
+        self._SubmitBlock()
+
+class _ZipEntry(object):
+    def __init__(self, zinfo, zip64, rawSource=None):
+        object.__init__(self)
+        self.zinfo = zinfo
+        self.zip64 = zip64
+        # For entries copied verbatim: (fileHandle, dataOffset)
+        self.rawSource = rawSource
+
+class _ZipStreamWriter(object):
+    """
+    Writes a zip archive as a stream: local headers are written with the
+    "data descriptor" flag set, so each entry's CRC and sizes can follow its
+    data, and the central directory is written (by C{zipfile}) at the end.
+    File data is compressed in segments by an L{_OrderedCompressor}; entries
+    from other zip archives can be copied verbatim, still compressed, with
+    L{AddRawEntry}.
+    """
+    def __init__(self, writer, workers, level, blockSize):
+        object.__init__(self)
+        self._writer = writer
+        self._level = level
+        self._blockSize = blockSize
+        self._compressor = _OrderedCompressor(workers, self._WriteSegment)
+        self._zipFile = zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED,
+         True)
+
+    def _StartEntry(self, zinfo, fileSize):
+        entry = _ZipEntry(zinfo, fileSize > zipfile.ZIP64_LIMIT)
+        zinfo.flag_bits |= 0x08
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.file_size = 0
+        zinfo.compress_size = 0
+        zinfo.CRC = 0
+        return entry
+
+    def _WriteSegment(self, data, context):
+        (entry, isFirst, isLast) = context
+
+        if isFirst:
+            entry.zinfo.header_offset = self._writer.tell()
+            self._writer.write(entry.zinfo.FileHeader(entry.zip64))
+
+        if entry.rawSource is not None:
+            self._CopyRawData(entry)
+        else:
+            self._writer.write(data)
+            entry.zinfo.compress_size += len(data)
+
+        if isLast:
+            self._WriteDataDescriptor(entry)
+
+    def _CopyRawData(self, entry):
+        (sourceHandle, offset) = entry.rawSource
+        remaining = entry.zinfo.compress_size
+        sourceHandle.seek(offset)
+
+        while remaining > 0:
+            data = sourceHandle.read(min(remaining, self._blockSize))
+            if not data:
+                raise ReleaseFrameworkError("Truncated zip entry: %s" %
+                 (entry.zinfo.filename))
+
+            self._writer.write(data)
+            remaining -= len(data)
+
+    def _WriteDataDescriptor(self, entry):
+        zinfo = entry.zinfo
+
+        if not zinfo.flag_bits & 0x08:
+            self._zipFile.filelist.append(zinfo)
+            self._zipFile.NameToInfo[zinfo.filename] = zinfo
+            return
+
+        if entry.zip64:
+            descriptorFormat = '<4sLQQ'
+        else:
+            if zinfo.compress_size > zipfile.ZIP64_LIMIT:
+                raise ReleaseFrameworkError("Compressed size of %s in zip "
+                 "archive exceeds 4 GB" % (zinfo.filename))
+            descriptorFormat = '<4sLLL'
+
+        self._writer.write(struct.pack(descriptorFormat,
+         _ZIP_DATA_DESCRIPTOR_SIGNATURE, zinfo.CRC, zinfo.compress_size,
+         zinfo.file_size))
+
+        self._zipFile.filelist.append(zinfo)
+        self._zipFile.NameToInfo[zinfo.filename] = zinfo
+
+    @staticmethod
+    def _NewZipInfo(arcname, fileStat):
+        # The zip format can't represent times before 1980.
+        zinfo = zipfile.ZipInfo(arcname, max((1980, 1, 1, 0, 0, 0),
+         time.localtime(fileStat.st_mtime)[0:6]))
+        zinfo.external_attr = (fileStat.st_mode & 0xFFFF) << 16L
+        return zinfo
+
+    def AddFile(self, path, arcname):
+        fileStat = os.stat(path)
+        zinfo = _ZipStreamWriter._NewZipInfo(arcname, fileStat)
+        entry = self._StartEntry(zinfo, fileStat.st_size)
+
+        crc = 0
+        isFirst = True
+        f = open(path, 'rb')
+        try:
+            data = f.read(self._blockSize)
+            while True:
+                nextData = f.read(self._blockSize)
+                isLast = not nextData
+
+                crc = zlib.crc32(data, crc)
+                zinfo.file_size += len(data)
+                if isLast:
+                    zinfo.CRC = crc & 0xFFFFFFFF
+
+                self._compressor.Submit((_BLOCK_COMPRESSION_DEFLATE,
+                 self._level, data, isLast), (entry, isFirst, isLast))
+
+                if isLast:
+                    break
+
+                isFirst = False
+                data = nextData
+        finally:
+            f.close()
+
+    def AddSymlink(self, path, arcname):
+        """
+        Add a symlink, as an entry whose mode marks it as one, and whose
+        contents are the link's target (as Info-ZIP does).
+        """
+        self._AddStoredEntry(_ZipStreamWriter._NewZipInfo(arcname,
+         os.lstat(path)), os.readlink(path))
+
+    def AddDirectory(self, path, arcname):
+        zinfo = _ZipStreamWriter._NewZipInfo(arcname.rstrip('/') + '/',
+         os.stat(path))
+        # The MS-DOS directory attribute.
+        zinfo.external_attr |= 0x10
+        self._AddStoredEntry(zinfo, '')
+
+    def _AddStoredEntry(self, zinfo, data):
+        # Small entries whose contents are known up front are stored
+        # uncompressed, with their sizes in the local header.
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.file_size = zinfo.compress_size = len(data)
+        zinfo.CRC = zlib.crc32(data) & 0xFFFFFFFF
+        entry = _ZipEntry(zinfo, False, (StringIO(data), 0))
+        self._compressor.Submit(None, (entry, True, True))
+
+    def AddRawEntry(self, zinfo, sourceHandle):
+        """
+        Copy an entry's data, as is, from the zip archive open as 
+        C{sourceHandle}; C{zinfo} is the entry's C{ZipInfo} (from the
+        archive's central directory).
+        """
+        sourceHandle.seek(zinfo.header_offset)
+        localHeader = sourceHandle.read(zipfile.sizeFileHeader)
+        if (len(localHeader) != zipfile.sizeFileHeader or
+         localHeader[0:4] != zipfile.stringFileHeader):
+            raise ReleaseFrameworkError("Bad local file header for zip "
+             "entry: %s" % (zinfo.filename))
+
+        fileHeader = struct.unpack(zipfile.structFileHeader, localHeader)
+        dataOffset = (zinfo.header_offset + zipfile.sizeFileHeader +
+         fileHeader[zipfile._FH_FILENAME_LENGTH] +
+         fileHeader[zipfile._FH_EXTRA_FIELD_LENGTH])
+
+        # The sizes are known, so no data descriptor is written.
+        rawInfo = copy.copy(zinfo)
+        rawInfo.flag_bits &= ~0x08
+        entry = _ZipEntry(rawInfo, (rawInfo.file_size > zipfile.ZIP64_LIMIT or
+         rawInfo.compress_size > zipfile.ZIP64_LIMIT), (sourceHandle,
+         dataOffset))
+        self._compressor.Submit(None, (entry, True, True))
+
+    def Close(self):
+        self._compressor.Close()
+        self._zipFile.close()
+
+    def Abort(self):
+        self._compressor.Abort()
+
+def _ExpandArchiveFiles(files, baseDir):
+    # Directories are included (so empty ones are archived too), and
+    # symlinks are archived as symlinks, not followed.
+    expandedFiles = []
+
+    for f in files:
+        path = os.path.join(baseDir, f)
+        if os.path.islink(path) or os.path.isfile(path):
+            expandedFiles.append(path)
+        elif os.path.isdir(path):
+            for root, dirs, dirFiles in os.walk(path):
+                expandedFiles.append(root)
+                dirs.sort()
+                # os.walk() lists symlinks to directories, but doesn't
+                # descend into them.
+                for d in dirs:
+                    if os.path.islink(os.path.join(root, d)):
+                        expandedFiles.append(os.path.join(root, d))
+                for df in sorted(dirFiles):
+                    expandedFiles.append(os.path.join(root, df))
+        else:
+            raise ValueError("CreateArchive(): invalid path: %s" % (path))
+
+    archiveFiles = []
+    for path in expandedFiles:
+        arcname = os.path.relpath(path, baseDir).replace(os.sep, '/')
+        # The base directory itself doesn't get an entry.
+        if arcname != os.curdir:
+            archiveFiles.append((path, arcname))
+
+    return archiveFiles
+
+def CreateArchive(archive, files, baseDir=None, archiveFormat=None,
+ workers=None, compressLevel=6, algorithms=('sha1',), blockSize=None):
+    """
+    Create a tar.gz, tar.bz2 or zip archive, compressing it in parallel.
+
+    @note: tar.bz2 archives created this way consist of several bzip2
+    streams, as with C{pbzip2}. The C{bzip2} tool and L{ExtractArchive} read
+    them fine, but Python 2's C{bz2} module (and so C{tarfile}) only reads
+    the first stream.
+
+    @param archive: The path of the archive to create, or a file-like object
+    to write the archive to (only its C{write()} method is used).
+    @type archive: C{str} or C{file}
+
+    @param files: The files and directories (which are added recursively) to
+    add to the archive, relative to C{baseDir}. Their names in the archive
+    are also relative to C{baseDir}. Directories get entries of their own,
+    so empty directories are preserved, and symlinks are stored as
+    symlinks, in both tar and zip archives.
+    @type files: C{list} of C{str}
+
+    @param baseDir: The directory the files to add are relative to. Default:
+    the current directory.
+    @type baseDir: C{str}
+
+    @param archiveFormat: One of the C{ARCHIVE_FORMAT_*} constants in this
+    module. Default: determined from the archive's file name; see
+    L{GetArchiveFormat}.
+    @type archiveFormat: C{str}
+
+    @param workers: The number of processes to compress with. Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+
+    @param compressLevel: The compression level, 1 (fastest) through 9
+    (best).
+    @type compressLevel: C{int}
+
+    @param algorithms: The names of the checksum algorithms to compute over
+    the archive.
+    @type algorithms: C{list} or C{tuple} of C{str}
+
+    @param blockSize: The size of the blocks compressed in parallel. Default:
+    the C{ARCHIVE_COMPRESSION_BLOCK_SIZE} constant.
+    @type blockSize: C{int}
+
+    @return: A dictionary of algorithm names to hex digests of the archive.
+    @rtype: C{dict}
+
+    @raise ValueError: If a file to add doesn't exist, or the archive format
+    is unknown.
+    @raise ReleaseFrameworkError: If a zip entry is too large for the zip
+    format.
+    """
+    if baseDir is None:
+        baseDir = os.getcwd()
+
+    if workers is None:
+        workers = GetParallelWorkerCount()
+
+    if blockSize is None:
+        blockSize = ConfigSpec.GetConstant('ARCHIVE_COMPRESSION_BLOCK_SIZE')
+
+    archivePath = None
+    if isinstance(archive, basestring):
+        archivePath = archive
+
+    if archiveFormat is None:
+        if archivePath is None:
+            raise ValueError("CreateArchive(): archiveFormat must be "
+             "specified when writing to a file object")
+        archiveFormat = GetArchiveFormat(archivePath)
+
+    if archiveFormat not in (ARCHIVE_FORMAT_TAR_GZ, ARCHIVE_FORMAT_TAR_BZ2,
+     ARCHIVE_FORMAT_ZIP):
+        raise ValueError("Unknown archive format: %s" % (archiveFormat))
+
+    archiveFiles = _ExpandArchiveFiles(files, baseDir)
+
+    if archivePath is not None:
+        archiveHandle = open(archivePath, 'wb')
+    else:
+        archiveHandle = archive
+
+    writer = _DigestingWriter(archiveHandle, algorithms)
+
+    try:
+        if archiveFormat == ARCHIVE_FORMAT_ZIP:
+            _WriteZipArchive(writer, archiveFiles, workers, compressLevel,
+             blockSize)
+        else:
+            _WriteTarArchive(writer, archiveFiles, archiveFormat, workers,
+             compressLevel, blockSize)
+    except:
+        if archivePath is not None:
+            archiveHandle.close()
+            os.remove(archivePath)
+        raise
+
+    if archivePath is not None:
+        archiveHandle.close()
+    else:
+        writer.flush()
+
+    return writer.GetDigests()
+
+def _WriteTarArchive(writer, archiveFiles, archiveFormat, workers, level,
+ blockSize):
+    if archiveFormat == ARCHIVE_FORMAT_TAR_GZ:
+        compression = _BLOCK_COMPRESSION_GZIP
+    else:
+        compression = _BLOCK_COMPRESSION_BZIP2
+
+    compressor = _OrderedCompressor(workers,
+     lambda data, context: writer.write(data))
+
+    try:
+        blockWriter = _TarBlockWriter(compressor, compression, level,
+         blockSize)
+        tarArchive = tarfile.open(mode='w|', fileobj=blockWriter)
+        for (path, arcname) in archiveFiles:
+            tarArchive.add(path, arcname, False)
+        tarArchive.close()
+        blockWriter.close()
+    except:
+        compressor.Abort()
+        raise
+
+    compressor.Close()
+
+def _WriteZipArchive(writer, archiveFiles, workers, level, blockSize):
+    zipWriter = _ZipStreamWriter(writer, workers, level, blockSize)
+
+    try:
+        for (path, arcname) in archiveFiles:
+            if os.path.islink(path):
+                zipWriter.AddSymlink(path, arcname)
+            elif os.path.isdir(path):
+                zipWriter.AddDirectory(path, arcname)
+            else:
+                zipWriter.AddFile(path, arcname)
+    except:
+        zipWriter.Abort()
+        raise
+
+    zipWriter.Close()
+
+_BZIP2_STREAM_START = re.compile(r'BZh[1-9]1AY&SY')
+_GZIP_MEMBER_START = re.compile('\x1f\x8b\x08')
+_STREAM_START_MAX_LENGTH = 10
+
+# The largest segment, in blocks, buffered while looking for the start of the
+# next compressed stream; archives with larger streams (e.g. ones created by
+# plain gzip or bzip2, which consist of a single stream) are decompressed
+# serially from that point on.
+_MAX_SEGMENT_BLOCKS = 32
+
+# Files up to this many blocks in size are handed to the pool of writer
+# threads; larger files are written as they're decompressed.
+_MAX_POOLED_FILE_BLOCKS = 4
+
+def _NewDecompressor(compression):
+    if compression == _BLOCK_COMPRESSION_BZIP2:
+        return bz2.BZ2Decompressor()
+    else:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+def _DecompressSegment(work):
+    # Runs in the worker processes. Returns None if the segment isn't exactly
+    # one complete stream, i.e. if its start was falsely detected.
+    (compression, data) = work
+
+    try:
+        decompressor = _NewDecompressor(compression)
+        output = decompressor.decompress(data)
+
+        if decompressor.unused_data:
+            return None
+
+        if compression == _BLOCK_COMPRESSION_BZIP2:
+            try:
+                decompressor.decompress('')
+                return None
+            except EOFError:
+                return output
+        else:
+            output += decompressor.flush()
+            if len(data) < 18:
+                return None
+
+            (crc, size) = struct.unpack('<LL', data[-8:])
+            if (zlib.crc32(output) & 0xFFFFFFFF != crc or
+             len(output) & 0xFFFFFFFF != size):
+                return None
+
+            return output
+    except (IOError, EOFError, ValueError, zlib.error):
+        return None
+
+def _SerialDecompress(compression, chunks):
+    decompressor = _NewDecompressor(compression)
+
+    for chunk in chunks:
+        while chunk:
+            try:
+                output = decompressor.decompress(chunk)
+            except EOFError:
+                # The previous bzip2 stream ended exactly at a chunk boundary.
+                decompressor = _NewDecompressor(compression)
+                continue
+
+            yield output
+
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = _NewDecompressor(compression)
+
+    if compression != _BLOCK_COMPRESSION_BZIP2:
+        yield decompressor.flush()
+
+def _DecompressStream(compression, fileHandle, workers, blockSize):
+    """
+    Decompress a (possibly multi-stream) gzip or bzip2 file, yielding the
+    decompressed data in chunks.
+
+    The file is split at the (candidate) starts of streams, and the segments
+    are decompressed in parallel. Since the byte sequences streams start with
+    can also occur in the compressed data, each segment is checked to be
+    exactly one complete stream; from the first segment which isn't, the file
+    is decompressed serially.
+    """
+    readChunks = iter(lambda: fileHandle.read(blockSize), '')
+
+    if workers <= 1:
+        for output in _SerialDecompress(compression, readChunks):
+            yield output
+        return
+
+    if compression == _BLOCK_COMPRESSION_BZIP2:
+        streamStart = _BZIP2_STREAM_START
+    else:
+        streamStart = _GZIP_MEMBER_START
+
+    pool = multiprocessing.Pool(workers)
+    pending = deque()
+    window = workers * 2
+    maxSegmentSize = blockSize * _MAX_SEGMENT_BLOCKS
+    buf = ''
+    scanPos = 1
+    fallBack = False
+    atEnd = False
+
+    try:
+        while not fallBack:
+            chunk = next(readChunks, None)
+
+            if chunk is None:
+                atEnd = True
+                if buf:
+                    pending.append((pool.apply_async(_DecompressSegment,
+                     ((compression, buf),)), buf))
+                    buf = ''
+            else:
+                buf += chunk
+                while True:
+                    match = streamStart.search(buf, scanPos)
+                    if match is None:
+                        scanPos = max(1, len(buf) - _STREAM_START_MAX_LENGTH)
+                        break
+
+                    segment = buf[:match.start()]
+                    pending.append((pool.apply_async(_DecompressSegment,
+                     ((compression, segment),)), segment))
+                    buf = buf[match.start():]
+                    scanPos = 1
+
+            while len(pending) > 0 and (atEnd or len(pending) > window or
+             pending[0][0].ready()):
+                output = pending[0][0].get()
+                if output is None:
+                    fallBack = True
+                    break
+
+                pending.popleft()
+                yield output
+
+            if atEnd and not fallBack:
+                return
+
+            if len(buf) > maxSegmentSize:
+                fallBack = True
+
+        remainingData = list(segment for (result, segment) in pending)
+        remainingData.append(buf)
+        pending.clear()
+        buf = ''
+
+        for output in _SerialDecompress(compression, itertools.chain(
+         remainingData, readChunks)):
+            yield output
+    finally:
+        pool.terminate()
+        pool.join()
+
+class _ChunkReader(object):
+    """
+    A read-only file-like object over an iterator of strings.
+    """
+    def __init__(self, chunks):
+        object.__init__(self)
+        self._chunks = chunks
+        self._current = ''
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = []
+        wanted = size
+
+        while size < 0 or wanted > 0:
+            if self._pos >= len(self._current):
+                self._current = next(self._chunks, None)
+                self._pos = 0
+                if self._current is None:
+                    self._current = ''
+                    break
+                continue
+
+            if size < 0:
+                end = len(self._current)
+            else:
+                end = min(len(self._current), self._pos + wanted)
+
+            parts.append(self._current[self._pos:end])
+            wanted -= end - self._pos
+            self._pos = end
+
+        return ''.join(parts)
+
+class ArchiveIndex(object):
+    """
+    An index of the files extracted from an archive by L{ExtractArchive}: 
+    their paths (relative to the directory the archive was extracted into,
+    with C{/} separators), sizes and checksums.
+    """
+    def __init__(self, destDir, algorithms):
+        object.__init__(self)
+        self._destDir = destDir
+        self._algorithms = tuple(algorithms)
+        self._entries = {}
+
+    def _GetDestDir(self): return self._destDir
+    def _GetAlgorithms(self): return self._algorithms
+    def _GetPaths(self): return tuple(sorted(self._entries.keys()))
+
+    destDir = property(_GetDestDir)
+    """The directory the archive was extracted into. Read-only.
+    @type: C{str}"""
+
+    algorithms = property(_GetAlgorithms)
+    """The checksum algorithms computed for each file. Read-only.
+    @type: C{tuple} of C{str}"""
+
+    paths = property(_GetPaths)
+    """The paths of the extracted files, sorted. Read-only.
+    @type: C{tuple} of C{str}"""
+
+    def _AddFile(self, path, size, digests):
+        self._entries[path] = (size, digests)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def GetSize(self, path):
+        """
+        @return: The size of the given extracted file (C{None} if the index 
+        was loaded from a checksum manifest).
+        @rtype: C{int}
+
+        @raise KeyError: If the file isn't in the index.
+        """
+        return self._entries[path][0]
+
+    def GetDigest(self, path, algorithm='sha1'):
+        """
+        @return: The hex digest of the given extracted file.
+        @rtype: C{str}
+
+        @raise KeyError: If the file isn't in the index, or the checksum
+        wasn't computed.
+        """
+        return self._entries[path][1][algorithm]
+
+    def WriteChecksumManifest(self, manifestPath, algorithm='sha1'):
+        """
+        Write the index out as a checksum manifest (in C{sha1sum} format),
+        which can be read with L{FromChecksumManifest}, or checked with
+        L{VerifyChecksumManifest<quickrelease.utils.VerifyChecksumManifest>}.
+        """
+        manifestHandle = open(manifestPath, 'wb')
+        try:
+            for path in self.paths:
+                manifestHandle.write("%s  %s\n" % (self.GetDigest(path,
+                 algorithm), path))
+        finally:
+            manifestHandle.close()
+
+    @staticmethod
+    def FromChecksumManifest(manifestPath, destDir, algorithm='sha1'):
+        """
+        Load an index written with L{WriteChecksumManifest}.
+
+        @raise ValueError: If the manifest can't be read or parsed.
+        """
+        index = ArchiveIndex(destDir, (algorithm,))
+
+        for (checksum, path) in ParseChecksumManifest(manifestPath):
+            index._AddFile(path, None, { algorithm: checksum })
+
+        return index
+
+class _FileWritePool(object):
+    """
+    A bounded pool of threads writing (and checksumming) extracted files.
+    """
+    def __init__(self, workers, index):
+        object.__init__(self)
+        self._index = index
+        self._queue = Queue(max(1, workers * 2))
+        self._errors = []
+        self._threads = list(Thread(target=self._RunWorker) for i in
+         range(max(1, workers)))
+
+        for t in self._threads:
+            t.start()
+
+    def _RunWorker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+
+                if len(self._errors) == 0:
+                    _WriteExtractedFile(self._index, *job)
+            except:
+                self._errors.append(sys.exc_info())
+            finally:
+                self._queue.task_done()
+
+    def _CheckErrors(self):
+        if len(self._errors) != 0:
+            err = self._errors[0]
+            raise err[0], err[1], err[2]
+
+    def Submit(self, *job):
+        self._CheckErrors()
+        self._queue.put(job)
+
+    def Wait(self):
+        self._queue.join()
+        self._CheckErrors()
+
+    def Close(self):
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._CheckErrors()
+
+def _WriteExtractedFile(index, relPath, destPath, chunks, mode, mtime):
+    hashers = list((algo, hashlib.new(algo)) for algo in index.algorithms)
+    size = 0
+
+    if os.path.lexists(destPath):
+        os.remove(destPath)
+
+    destHandle = open(destPath, 'wb')
+    try:
+        for chunk in chunks:
+            destHandle.write(chunk)
+            for (algo, h) in hashers:
+                h.update(chunk)
+            size += len(chunk)
+    finally:
+        destHandle.close()
+
+    if mode:
+        os.chmod(destPath, mode & 07777)
+    if mtime is not None:
+        os.utime(destPath, (mtime, mtime))
+
+    index._AddFile(relPath, size, dict((algo, h.hexdigest()) for (algo, h) in
+     hashers))
+
+def _GetExtractPath(destDir, memberName):
+    relPath = os.path.normpath(memberName.replace('/', os.sep))
+
+    if (os.path.isabs(relPath) or relPath == os.pardir or
+     relPath.startswith(os.pardir + os.sep)):
+        raise ReleaseFrameworkError("Refusing to extract archive member "
+         "outside of destination directory: %s" % (memberName))
+
+    return (relPath.replace(os.sep, '/'), os.path.join(destDir, relPath))
+
+def _CheckExtractDir(destDir, path, memberName):
+    # Archive members can't be written through symlinks leading out of the
+    # destination directory (checking the member's name isn't enough).
+    realDestDir = os.path.realpath(destDir)
+    realPath = os.path.realpath(path)
+
+    if (realPath != realDestDir and
+     not realPath.startswith(os.path.join(realDestDir, ''))):
+        raise ReleaseFrameworkError("Refusing to extract archive member "
+         "outside of destination directory: %s" % (memberName))
+
+def _ExtractSymlink(destDir, destPath, linkTarget, memberName):
+    targetPath = os.path.join(os.path.dirname(destPath),
+     linkTarget.replace('/', os.sep))
+    relTargetPath = os.path.relpath(targetPath, destDir)
+
+    if (os.path.isabs(linkTarget) or relTargetPath == os.pardir or
+     relTargetPath.startswith(os.pardir + os.sep)):
+        raise ReleaseFrameworkError("Refusing to extract archive symlink "
+         "pointing outside of destination directory: %s -> %s" % (memberName,
+         linkTarget))
+
+    _CheckExtractDir(destDir, os.path.dirname(destPath), memberName)
+    _CheckExtractDir(destDir, targetPath, memberName)
+
+    if os.path.lexists(destPath):
+        os.remove(destPath)
+    os.symlink(linkTarget, destPath)
+
+def _ReadChunks(fileHandle, chunkSize):
+    return iter(lambda: fileHandle.read(chunkSize), '')
+
+def ExtractArchive(archivePath, destDir, archiveFormat=None, workers=None,
+ algorithms=('sha1',), blockSize=None):
+    """
+    Extract a tar.gz, tar.bz2 or zip archive, in parallel, and index the
+    extracted files.
+
+    Compressed tar archives which consist of several gzip members or bzip2
+    streams (e.g. those created by L{CreateArchive}, C{pigz} or C{pbzip2})
+    are decompressed in parallel, by a pool of processes; archives consisting
+    of a single stream are decompressed serially. Zip entries are
+    decompressed in parallel. In either case, files are written, and
+    checksummed, by a bounded pool of threads.
+
+    @param archivePath: The archive to extract.
+    @type archivePath: C{str}
+
+    @param destDir: The directory to extract the archive into; it is created
+    if necessary.
+    @type destDir: C{str}
+
+    @param archiveFormat: One of the C{ARCHIVE_FORMAT_*} constants in this
+    module. Default: determined from the archive's file name; see
+    L{GetArchiveFormat}.
+    @type archiveFormat: C{str}
+
+    @param workers: The number of processes to decompress with, and threads
+    to write files with. Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+
+    @param algorithms: The names of the checksum algorithms to compute for
+    each extracted file.
+    @type algorithms: C{list} or C{tuple} of C{str}
+
+    @param blockSize: The size of the blocks the archive is read in. Default:
+    the C{ARCHIVE_COMPRESSION_BLOCK_SIZE} constant.
+    @type blockSize: C{int}
+
+    @return: An index of the regular files extracted.
+    @rtype: L{ArchiveIndex}
+
+    @raise ValueError: If the archive doesn't exist, or the archive format
+    is unknown.
+    @raise ReleaseFrameworkError: If an archive member would be extracted
+    outside of C{destDir}, including through a symlink, or is a symlink
+    pointing outside of it.
+    """
+    if not os.path.isfile(archivePath):
+        raise ValueError("ExtractArchive(): invalid archive: %s" %
+         (archivePath))
+
+    if archiveFormat is None:
+        archiveFormat = GetArchiveFormat(archivePath)
+
+    if archiveFormat not in (ARCHIVE_FORMAT_TAR_GZ, ARCHIVE_FORMAT_TAR_BZ2,
+     ARCHIVE_FORMAT_ZIP):
+        raise ValueError("Unknown archive format: %s" % (archiveFormat))
+
+    if workers is None:
+        workers = GetParallelWorkerCount()
+
+    if blockSize is None:
+        blockSize = ConfigSpec.GetConstant('ARCHIVE_COMPRESSION_BLOCK_SIZE')
+
+    Makedirs(destDir)
+    index = ArchiveIndex(destDir, algorithms)
+
+    if archiveFormat == ARCHIVE_FORMAT_ZIP:
+        _ExtractZipArchive(archivePath, destDir, index, workers, blockSize)
+    else:
+        _ExtractTarArchive(archivePath, destDir, index, archiveFormat, workers,
+         blockSize)
+
+    return index
+
+def _ExtractTarArchive(archivePath, destDir, index, archiveFormat, workers,
+ blockSize):
+    if archiveFormat == ARCHIVE_FORMAT_TAR_GZ:
+        compression = _BLOCK_COMPRESSION_GZIP
+    else:
+        compression = _BLOCK_COMPRESSION_BZIP2
+
+    archiveHandle = open(archivePath, 'rb')
+    decompressedChunks = _DecompressStream(compression, archiveHandle, workers,
+     blockSize)
+    writePool = _FileWritePool(workers, index)
+    directories = []
+
+    try:
+        tarArchive = tarfile.open(mode='r|', fileobj=_ChunkReader(
+         decompressedChunks))
+
+        for member in tarArchive:
+            (relPath, destPath) = _GetExtractPath(destDir, member.name)
+
+            if member.isdir():
+                _CheckExtractDir(destDir, destPath, member.name)
+                Makedirs(destPath)
+                directories.append((destPath, member))
+                continue
+
+            _CheckExtractDir(destDir, os.path.dirname(destPath), member.name)
+            Makedirs(os.path.dirname(destPath))
+
+            if member.isfile():
+                memberHandle = tarArchive.extractfile(member)
+                if member.size <= blockSize * _MAX_POOLED_FILE_BLOCKS:
+                    writePool.Submit(relPath, destPath, 
+                     (memberHandle.read(),), member.mode, member.mtime)
+                else:
+                    _WriteExtractedFile(index, relPath, destPath,
+                     _ReadChunks(memberHandle, blockSize), member.mode,
+                     member.mtime)
+            elif member.issym():
+                _ExtractSymlink(destDir, destPath, member.linkname,
+                 member.name)
+            elif member.islnk():
+                (targetRelPath, targetPath) = _GetExtractPath(destDir,
+                 member.linkname)
+                _CheckExtractDir(destDir, targetPath, member.linkname)
+                # The link target may still be queued to be written.
+                writePool.Wait()
+                if os.path.lexists(destPath):
+                    os.remove(destPath)
+                os.link(targetPath, destPath)
+                if targetRelPath in index:
+                    index._AddFile(relPath, index.GetSize(targetRelPath),
+                     index._entries[targetRelPath][1])
+
+        tarArchive.close()
+    finally:
+        writePool.Close()
+        decompressedChunks.close()
+        archiveHandle.close()
+
+    # Set directory permissions last, in case they aren't writable.
+    for (destPath, member) in reversed(directories):
+        os.chmod(destPath, member.mode & 07777)
+        os.utime(destPath, (member.mtime, member.mtime))
+
+def _ExtractZipArchive(archivePath, destDir, index, workers, blockSize):
+    threadState = local()
+
+    def ExtractEntry(zinfo):
+        if not hasattr(threadState, 'zipFile'):
+            threadState.zipFile = zipfile.ZipFile(archivePath, 'r')
+            openZipFiles.append(threadState.zipFile)
+
+        if zinfo.filename.endswith('/'):
+            return None
+
+        (relPath, destPath) = _GetExtractPath(destDir, zinfo.filename)
+        mode = zinfo.external_attr >> 16
+
+        # Symlinks are created once everything else has been extracted, so
+        # other entries are never written through them.
+        if stat.S_ISLNK(mode):
+            return (destPath, threadState.zipFile.read(zinfo),
+             zinfo.filename)
+
+        mtime = time.mktime(zinfo.date_time + (0, 0, -1))
+        entryHandle = threadState.zipFile.open(zinfo)
+        try:
+            _WriteExtractedFile(index, relPath, destPath, _ReadChunks(
+             entryHandle, blockSize), mode, mtime)
+        finally:
+            entryHandle.close()
+
+        return None
+
+    openZipFiles = []
+    zipFile = zipfile.ZipFile(archivePath, 'r')
+
+    try:
+        # Create the directories up front, so the workers never race to
+        # create the same one.
+        for zinfo in zipFile.infolist():
+            destPath = _GetExtractPath(destDir, zinfo.filename)[1]
+            if not zinfo.filename.endswith('/'):
+                destPath = os.path.dirname(destPath)
+            _CheckExtractDir(destDir, destPath, zinfo.filename)
+            Makedirs(destPath)
+
+        symlinks = ParallelMap(ExtractEntry, zipFile.infolist(), workers)
+    finally:
+        zipFile.close()
+        for zf in openZipFiles:
+            zf.close()
+
+    for symlink in symlinks:
+        if symlink is not None:
+            (destPath, linkTarget, memberName) = symlink
+            _ExtractSymlink(destDir, destPath, linkTarget, memberName)
+
+def RepackZip(sourceArchive, destArchive=None, changes=None, removals=(),
+ workers=None, compressLevel=6, algorithms=('sha1',), blockSize=None):
+    """
+    Repack a zip (or jar, or xpi) archive, replacing, adding or removing some
+    of its entries.
+
+    Unchanged entries are copied verbatim, without being decompressed and
+    recompressed; only replaced and added entries are compressed (in
+    parallel, as with L{CreateArchive}). The new archive, including its
+    central directory, is written in a single streaming pass.
+
+    @param sourceArchive: The archive to repack.
+    @type sourceArchive: C{str}
+
+    @param destArchive: The path to write the repacked archive to. Default:
+    C{sourceArchive} is replaced (once the repacked archive has been
+    completely written).
+    @type destArchive: C{str}
+
+    @param changes: A dictionary of entry names to the paths of files with
+    their new contents. Entries not in the source archive are added to the
+    end of the archive.
+    @type changes: C{dict}
+
+    @param removals: The names of entries to remove.
+    @type removals: iterable of C{str}
+
+    @param workers: The number of processes to compress with. Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+
+    @param compressLevel: The compression level, 1 (fastest) through 9
+    (best), for replaced and added entries.
+    @type compressLevel: C{int}
+
+    @param algorithms: The names of the checksum algorithms to compute over
+    the repacked archive.
+    @type algorithms: C{list} or C{tuple} of C{str}
+
+    @param blockSize: The size of the blocks compressed in parallel, and 
+    copied in. Default: the C{ARCHIVE_COMPRESSION_BLOCK_SIZE} constant.
+    @type blockSize: C{int}
+
+    @return: A dictionary of algorithm names to hex digests of the repacked
+    archive.
+    @rtype: C{dict}
+
+    @raise ValueError: If the source archive or a file with new contents
+    doesn't exist, or an entry to remove isn't in the archive.
+    @raise ReleaseFrameworkError: If the source archive is corrupt.
+    """
+    if not os.path.isfile(sourceArchive):
+        raise ValueError("RepackZip(): invalid archive: %s" % (sourceArchive))
+
+    if changes is None:
+        changes = {}
+
+    for path in changes.values():
+        if not os.path.isfile(path):
+            raise ValueError("RepackZip(): invalid path: %s" % (path))
+
+    if workers is None:
+        workers = GetParallelWorkerCount()
+
+    if blockSize is None:
+        blockSize = ConfigSpec.GetConstant('ARCHIVE_COMPRESSION_BLOCK_SIZE')
+
+    if destArchive is None:
+        destArchive = sourceArchive
+
+    sourceZip = zipfile.ZipFile(sourceArchive, 'r')
+    try:
+        sourceEntries = sourceZip.infolist()
+    finally:
+        sourceZip.close()
+
+    removals = set(removals)
+    sourceNames = set(zinfo.filename for zinfo in sourceEntries)
+    for name in removals:
+        if name not in sourceNames:
+            raise ValueError("RepackZip(): no such entry to remove: %s" %
+             (name))
+
+    tmpDestArchive = os.path.join(os.path.dirname(os.path.abspath(
+     destArchive)), ".%s.qrrepack-%d-%d" % (os.path.basename(destArchive),
+     os.getpid(), current_thread().ident))
+
+    sourceHandle = open(sourceArchive, 'rb')
+    destHandle = open(tmpDestArchive, 'wb')
+
+    try:
+        writer = _DigestingWriter(destHandle, algorithms)
+        zipWriter = _ZipStreamWriter(writer, workers, compressLevel, blockSize)
+
+        try:
+            for zinfo in sourceEntries:
+                if zinfo.filename in removals:
+                    continue
+                elif zinfo.filename in changes:
+                    zipWriter.AddFile(changes[zinfo.filename],
+                     zinfo.filename)
+                else:
+                    zipWriter.AddRawEntry(zinfo, sourceHandle)
+
+            for name in sorted(changes.keys()):
+                if name not in sourceNames:
+                    zipWriter.AddFile(changes[name], name)
+        except:
+            zipWriter.Abort()
+            raise
+
+        zipWriter.Close()
+        destHandle.close()
+        ReplaceFile(tmpDestArchive, destArchive)
+    finally:
+        sourceHandle.close()
+        if not destHandle.closed:
+            destHandle.close()
+        if os.path.exists(tmpDestArchive):
+            os.remove(tmpDestArchive)
+
+    return writer.GetDigests()
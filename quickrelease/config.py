@@ -22,14 +22,30 @@ Important highlights from the U{ConfigParser<http://docs.python.org/library/conf
   - Lines beginning with '#' or ';' are ignored and may be used to provide comments.
 
 See the U{ConfigParser<http://docs.python.org/library/configparser.html>} module documentation for further information.
+
+Setting the C{QUICKRELEASE_PROFILE_CONFIG} environment variable profiles all
+accesses to L{ConfigSpec} values and constants: the number of calls to each
+method, for each option, the time spent in them (and interpolating values),
+how often values came from the cache and which L{Step<quickrelease.step.Step>}
+made the calls. A report, ranked by time, is written when the program exits:
+to standard error if the variable is set to C{-}, or otherwise, to the file it
+names.
 """
 
 import ConfigParser
+import atexit
+import cPickle
+import glob
+import hashlib
 import os
 import re
+import sys
+import threading
+import time
 
 from quickrelease import constants
 from quickrelease.exception import ReleaseFrameworkError
+from quickrelease.version import QUICKRELEASE_VERSION
 
 def ConfSpecErrorIsMissingError(confSpecErrDeets):
     """
@@ -70,6 +86,8 @@ class ConfigSpecError(ReleaseFrameworkError):
     """See L{ConfigParser.ParsingError}"""
     NO_CONSTANT_ERROR = 6
     """The constant name requested is not defined."""
+    INTERPOLATION_CYCLE_ERROR = 7
+    """An option's value refers, directly or indirectly, to itself."""
 
     def __init__(self, errorStr, details=None):
          ReleaseFrameworkError.__init__(self, errorStr, details)
@@ -81,6 +99,234 @@ OVERRIDES_DISABLED_ERR_STR = ("Commandline variable overrides are not enabled "
  "in config file %s; enable them by setting 'allow_config_overrides' in the "
  "'quickrelease' section.")
 
+_INTERPOLATION_VAR_RE = re.compile(r"%\(([^)]+)\)s")
+
+class _InterpolationGraph(object):
+    # Interpolates values the way SafeConfigParser does, but each value is
+    # parsed into a template (a tuple of literals and references to other
+    # options) only once, and references are resolved iteratively, in
+    # dependency order, memoizing each option's value as it's resolved. So
+    # arbitrarily deep reference chains work, and each option is only
+    # interpolated once per "scope" (the dictionaries an option is looked up
+    # in, in order: overrides, the section's values and the defaults).
+    #
+    # Errors (other than cycles, which SafeConfigParser would report as
+    # exceeding its maximum interpolation depth) are the same as
+    # SafeConfigParser's.
+    _LITERAL = 0
+    _REFERENCE = 1
+    _SYNTAX_ERROR = 2
+
+    def __init__(self, optionxform):
+        object.__init__(self)
+        self._optionxform = optionxform
+        # raw value -> template
+        self._templates = {}
+
+    def GetTemplates(self):
+        return self._templates
+
+    def AddTemplates(self, templates):
+        self._templates.update(templates)
+
+    def _Compile(self, rawValue):
+        try:
+            return self._templates[rawValue]
+        except KeyError:
+            pass
+
+        parts = []
+        literal = []
+        rest = rawValue
+
+        while rest:
+            p = rest.find('%')
+            if p < 0:
+                literal.append(rest)
+                break
+            if p > 0:
+                literal.append(rest[:p])
+                rest = rest[p:]
+
+            c = rest[1:2]
+            if c == '%':
+                literal.append('%')
+                rest = rest[2:]
+                continue
+
+            if len(literal) != 0:
+                parts.append((_InterpolationGraph._LITERAL, ''.join(literal)))
+                literal = []
+
+            if c == '(':
+                m = _INTERPOLATION_VAR_RE.match(rest)
+                if m is None:
+                    parts.append((_InterpolationGraph._SYNTAX_ERROR,
+                     "bad interpolation variable reference %r" % rest))
+                    break
+
+                rest = rest[m.end():]
+                # The remainder of the value is kept for error messages.
+                parts.append((_InterpolationGraph._REFERENCE,
+                 self._optionxform(m.group(1)), rest))
+            else:
+                parts.append((_InterpolationGraph._SYNTAX_ERROR,
+                 "'%%' must be followed by '%%' or '(', found: %r" % (rest,)))
+                break
+
+        if len(literal) != 0:
+            parts.append((_InterpolationGraph._LITERAL, ''.join(literal)))
+
+        template = tuple(parts)
+        self._templates[rawValue] = template
+        return template
+
+    @staticmethod
+    def Lookup(name, scopes):
+        for scope in scopes:
+            if name in scope:
+                return scope[name]
+
+        raise KeyError(name)
+
+    def _GetReferences(self, name, scopes):
+        return list(part[1] for part in self._Compile(
+         _InterpolationGraph.Lookup(name, scopes)) if
+         part[0] == _InterpolationGraph._REFERENCE)
+
+    def FindCycle(self, scopes, names, missing=None):
+        """
+        Look for a reference cycle among the given options, and the options
+        they refer to, as looked up in the given scopes.
+
+        @param missing: If given, references to options which aren't defined
+        in any of the scopes are appended to it, as (referring option,
+        missing option) tuples.
+        @type  missing: C{list}
+
+        @return: The cycle, as a list of option names (starting and ending
+        with the same option), or C{None}.
+        """
+        finished = set()
+
+        for name in names:
+            if name in finished:
+                continue
+
+            path = [name]
+            pending = [iter(self._GetReferences(name, scopes))]
+
+            while len(pending) != 0:
+                for ref in pending[-1]:
+                    if ref in path:
+                        return path[path.index(ref):] + [ref]
+                    elif ref in finished:
+                        continue
+
+                    try:
+                        refs = self._GetReferences(ref, scopes)
+                    except KeyError:
+                        if missing is not None:
+                            missing.append((path[-1], ref))
+                        finished.add(ref)
+                        continue
+
+                    path.append(ref)
+                    pending.append(iter(refs))
+                    break
+                else:
+                    finished.add(path.pop())
+                    pending.pop()
+
+        return None
+
+    def Interpolate(self, section, option, scopes, memo):
+        """
+        Interpolate the value of the given option, as looked up in the
+        given scopes.
+
+        @param memo: Interpolated values, by option name, for these scopes;
+        updated with the values interpolated along the way.
+        @type memo: C{dict}
+        """
+        try:
+            return memo[option]
+        except KeyError:
+            pass
+
+        try:
+            rawValue = _InterpolationGraph.Lookup(option, scopes)
+        except KeyError:
+            raise ConfigParser.NoOptionError(option, section)
+
+        # [option name, template, index of the next part, interpolated parts]
+        stack = [[option, self._Compile(rawValue), 0, []]]
+        path = [option]
+
+        while len(stack) != 0:
+            frame = stack[-1]
+            template = frame[1]
+            accum = frame[3]
+
+            while frame[2] < len(template):
+                part = template[frame[2]]
+                frame[2] += 1
+
+                if part[0] == _InterpolationGraph._LITERAL:
+                    accum.append(part[1])
+                elif part[0] == _InterpolationGraph._REFERENCE:
+                    ref = part[1]
+                    if ref in memo:
+                        accum.append(memo[ref])
+                        continue
+
+                    try:
+                        refValue = _InterpolationGraph.Lookup(ref, scopes)
+                    except KeyError:
+                        raise ConfigParser.InterpolationMissingOptionError(
+                         option, section, part[2], ref)
+
+                    if ref in path:
+                        raise ConfigSpecError("Interpolation cycle in "
+                         "section [%s], option %s: %s" % (section, option,
+                         ' -> '.join(path[path.index(ref):] + [ref])),
+                         ConfigSpecError.INTERPOLATION_CYCLE_ERROR)
+
+                    stack.append([ref, self._Compile(refValue), 0, []])
+                    path.append(ref)
+                    break
+                else:
+                    raise ConfigParser.InterpolationSyntaxError(option,
+                     section, part[1])
+            else:
+                value = ''.join(accum)
+                memo[frame[0]] = value
+                stack.pop()
+                path.pop()
+
+                if len(stack) != 0:
+                    stack[-1][3].append(value)
+
+        return memo[option]
+
+class _ValueContext(object):
+    # The values cached for a ConfigSpec, or for one of its
+    # PartnerConfigViews (which have partner variables overlaid).
+    def __init__(self, partnerVars=None):
+        object.__init__(self)
+        self.partnerVars = partnerVars
+        self.Clear()
+
+    def Clear(self):
+        # (section, name, coercion, interpolation overrides) -> value
+        self.values = {}
+        # (section, commandline overrides applied) -> tuple of dicts values
+        # are looked up in
+        self.scopes = {}
+        # (section, commandline overrides applied) -> option name ->
+        # interpolated value
+        self.interpolated = {}
+
 class ConfigSpec(object):
     """
     A class representing a QuickRelease runtime-specified configuration 
@@ -91,8 +337,26 @@ class ConfigSpec(object):
     DELIV_SECTION_PREFIX = 'deliverable'
     PARTNER_SECTION_PREFIX = 'partner'
     USER_DEFINED_CONSTANTS_ENV_VAR = 'QUICKRELEASE_USER_DEFINED_CONSTANTS'
+    PROFILE_CONFIG_ENV_VAR = 'QUICKRELEASE_PROFILE_CONFIG'
     QR_CONSTANTS_DICT_NAME = 'QUICKRELEASE_CONSTANTS'
 
+    # Bumped whenever the contents of config snapshots change.
+    _SNAPSHOT_FORMAT = 3
+
+    _OPTION_TYPE_NAMES = { 'bool': bool,
+                           'dict': dict,
+                           'float': float,
+                           'int': int,
+                           'list': list,
+                           'str': str,
+                         }
+
+    # name -> resolved value
+    _gConstantsCache = {}
+    # The user-defined constants module's dictionaries (or the builtin ones)
+    _gEnvConstantsHandlersCache = None
+    _gConstantsDictCache = None
+
     @staticmethod
     def GetConstant(name):
         """
@@ -110,6 +374,12 @@ class ConfigSpec(object):
         L{ConfigSpec} handles instead of this method. However, this method can
         be (and is) used in places where it's not convenient to obtain one.
 
+        Resolved constants are cached: the environment variable of the same
+        name, and the C{QUICKRELEASE_USER_DEFINED_CONSTANTS} environment 
+        variable, are only read the first time a constant is requested. If
+        either (or the constants dictionaries themselves) are changed at 
+        runtime, call L{FlushConstantsCache}.
+
         @param  name: The name of the constant to retrieve.
         @type   name: C{str}
 
@@ -119,18 +389,47 @@ class ConfigSpec(object):
                   specified for the variable when obtaining it from the 
                   environment.
         """
+        try:
+            return ConfigSpec._gConstantsCache[name]
+        except KeyError:
+            pass
+
+        value = ConfigSpec._ResolveConstant(name, os.getenv(name))
+        ConfigSpec._gConstantsCache[name] = value
+        return value
+
+    @staticmethod
+    def FlushConstantsCache():
+        """
+        Clear the cache of resolved constants (see L{GetConstant}), and of
+        the user-defined constants module's dictionaries, so the environment
+        is read again.
+        """
+        ConfigSpec._gConstantsCache.clear()
+        ConfigSpec._gEnvConstantsHandlersCache = None
+        ConfigSpec._gConstantsDictCache = None
 
-        value = os.getenv(name)
+    @staticmethod
+    def _ResolveConstant(name, value):
+        # Constants QuickRelease itself uses have defaults (and environment
+        # handlers), in case a user-defined constants module predates them.
+        isDefaultConstant = name in constants.QUICKRELEASE_DEFAULT_CONSTANTS
 
         if value is not None:
             envConstantsHandlers = ConfigSpec._GetEnvConstantsHandlerDict()
-            if name in envConstantsHandlers.keys():
+            if name in envConstantsHandlers:
                 return envConstantsHandlers[name](value)
+            elif (isDefaultConstant and
+             name in constants.CONSTANTS_FROM_ENV_HANDLERS):
+                return constants.CONSTANTS_FROM_ENV_HANDLERS[name](value)
             else:
                 return value
 
-        if name in ConfigSpec.GetDefinedConstants():
-            return ConfigSpec._GetConstantsDict()[name]
+        constantsDict = ConfigSpec._GetConstantsDict()
+        if name in constantsDict:
+            return constantsDict[name]
+        elif isDefaultConstant:
+            return constants.QUICKRELEASE_DEFAULT_CONSTANTS[name]
 
         raise ConfigSpecError("Undefined constant '%s'" % (name),
          ConfigSpecError.NO_CONSTANT_ERROR)
@@ -145,7 +444,15 @@ class ConfigSpec(object):
 
     @staticmethod
     def _GetEnvConstantsHandlerDict():
-        modName = os.getenv(ConfigSpec.USER_DEFINED_CONSTANTS_ENV_VAR)
+        if ConfigSpec._gEnvConstantsHandlersCache is None:
+            ConfigSpec._gEnvConstantsHandlersCache = (
+             ConfigSpec._LoadEnvConstantsHandlerDict(os.getenv(
+             ConfigSpec.USER_DEFINED_CONSTANTS_ENV_VAR)))
+
+        return ConfigSpec._gEnvConstantsHandlersCache
+
+    @staticmethod
+    def _LoadEnvConstantsHandlerDict(modName):
         if modName is not None:
             # the env handlers are (right now) optional, so ignore
             # any import/etc. errors.
@@ -161,7 +468,14 @@ class ConfigSpec(object):
 
     @staticmethod
     def _GetConstantsDict():
-        modName = os.getenv(ConfigSpec.USER_DEFINED_CONSTANTS_ENV_VAR)
+        if ConfigSpec._gConstantsDictCache is None:
+            ConfigSpec._gConstantsDictCache = ConfigSpec._LoadConstantsDict(
+             os.getenv(ConfigSpec.USER_DEFINED_CONSTANTS_ENV_VAR))
+
+        return ConfigSpec._gConstantsDictCache
+
+    @staticmethod
+    def _LoadConstantsDict(modName):
         if modName is not None:
             try:
                 return ConfigSpec.GetUserDefinedConstantsDict(modName,
@@ -182,10 +496,13 @@ class ConfigSpec(object):
                   available via the environment.)
         @rtype:   C{list}
         """
-        return ConfigSpec._GetConstantsDict().keys()
+        constantsDict = ConfigSpec._GetConstantsDict()
+        return constantsDict.keys() + list(x for x in
+         constants.QUICKRELEASE_DEFAULT_CONSTANTS.keys() if x not in
+         constantsDict)
 
     def __init__(self, configFile, rootDir=os.getcwd(),
-     section=DEFAULT_SECTION, overrides=()):
+     section=DEFAULT_SECTION, overrides=(), optionTypes=None, includes=()):
         """
         Create a handle to a QuickRelease configuration specification
         ("C{ConfigSpec}") for use.
@@ -212,8 +529,37 @@ class ConfigSpec(object):
         any are provided. 
         @type  overrides: C{list} of C{str}
 
+        @param optionTypes: The types of options which should be coerced
+        (and so validated) when the config specification is loaded, in
+        addition to any declared by the C{option_types} item in the
+        'quickrelease' section. Keys are "section:name" (or "name", for the
+        default section), and values are one of the types L{Get} supports,
+        or their names (e.g. C{list} or C{'list'}). The coerced values are
+        cached, so later requests for them with the same coercion don't have
+        to parse them again. In the config file, C{option_types} is a 
+        dictionary; e.g.: C{option_types=[official_platforms list] 
+        [firefox:build_test_files list] [require_pgp_validation bool]}
+        @type  optionTypes: C{dict}
+
+        @param includes: Additional config files ("fragments") to load, after
+        any listed in the C{include_files} item of the config file's
+        'quickrelease' section. (Those are whitespace-separated paths, which
+        may contain wildcards, relative to the config file's directory.)
+        Fragments are only scanned for their section headers when the
+        C{ConfigSpec} is created; each is loaded the first time one of its
+        sections is used. Fragments defining values in the default section,
+        the 'quickrelease' section or partner sections, or defining a section
+        also defined elsewhere, are loaded immediately, so values are the same
+        as if all the files had been loaded in order.
+        @type  includes: C{list} of C{str}
+
         @return:  C{ConfigSpec} reference
 
+        @note: If the C{CONFIG_SNAPSHOT_DIR} constant is set, the parsed
+        configuration specification is saved there, and subsequent
+        C{ConfigSpec}s for the same (unmodified) file are created from that
+        snapshot, instead of parsing the file again.
+
         @raise ConfigSpecError: raises C{ConfigSpecError}s exceptions in the
         following cases:
             1. The specified config file to parse is missing or an invalid value
@@ -224,6 +570,8 @@ class ConfigSpec(object):
             4. L{SafeConfigParser<ConfigParser.SafeConfigParser>} errors 
             encountered while parsing the config file may be raised as 
             converted L{ConfigSpecError<quickrelease.config.ConfigSpecError>}s.
+            5. An option type is invalid, or a typed option's value can't be
+            coerced to its type.
         """
 
         # We have to error check this ourselves because the ConfigParser class
@@ -246,23 +594,54 @@ class ConfigSpec(object):
         # Override hash given from the commandline (i.e. -D)
         self._clOverrides = {}
 
-        try:
-            self._configSpec.read(configFile)
-        except ConfigParser.Error, ex:
-            raise ConfigSpec._ConvertToConfigParserError(ex)
+        self._valueContext = _ValueContext()
+        self._interpolation = _InterpolationGraph(
+         self._configSpec.optionxform)
+
+        # partner name -> partner section name
+        self._partnerSections = {}
+        # partner name -> PartnerConfigView
+        self._partnerViews = {}
+
+        # All the config files loaded (or to be loaded), and for those
+        # loaded on demand, which sections they define.
+        self._includeManifest = ''
+        self._includeFiles = []
+        self._sectionNames = None
+        # section -> fragment file
+        self._pendingSections = {}
+        # fragment file -> sections
+        self._pendingIncludes = {}
+        self._loadLock = threading.RLock()
+
+        snapshotKey = ConfigSpec._GetSnapshotKey(configFile, includes)
+        snapshot = self._LoadSnapshot(snapshotKey, includes)
+
+        if snapshot is None:
+            try:
+                self._configSpec.read(configFile)
+            except ConfigParser.Error, ex:
+                raise ConfigSpec._ConvertToConfigParserError(ex)
+
+            self._ReadIncludes(includes)
 
         if section != ConfigSpec.DEFAULT_SECTION:
             if self.section not in self.sectionList:
                 raise ConfigSpecError("Invalid initial section '%s'" %
                  (section))
 
-        for section in self.sectionList:
-            if ConfigSpec._IsPartnerSection(section):
-                for item in self.GetSectionItems(section):
-                    self.rawConfig.set(ConfigSpec.DEFAULT_SECTION,
-                     'PARTNER_%s' % (item), '')
-
-        self._ResetPartnerDefaultSectionVars()
+        # Snapshots are taken with the partner defaults already seeded (and
+        # reset).
+        if snapshot is None:
+            partnerSectionPrefix = ConfigSpec._GetPartnerSectionName('')
+            for section in self.sectionList:
+                if ConfigSpec._IsPartnerSection(section):
+                    self._partnerSections[section[len(
+                     partnerSectionPrefix):]] = section
+                    for item in self.GetSectionItems(section):
+                        self._SetDefaultValue('PARTNER_%s' % (item), '')
+
+            self._ResetPartnerDefaultSectionVars()
   
         try:
             self._allowOverrides = self.SectionGet('quickrelease',
@@ -309,27 +688,406 @@ class ConfigSpec(object):
 
                 self._clOverrides[overrideSection][overrideName] = overrideVal
 
+            self.FlushValueCache()
+
         # DBUG
         #print "Commandline overrides: "
         #pprint.pprint(self._clOverrides)
         #print "Initial defaults: "
         #pprint.pprint(self.GetRawConfig().defaults())
         #print ', '.join(self.rawConfig.defaults())
-        self._DefaultSectionPartnerSanityCheck()
+        if snapshot is None:
+            self._DefaultSectionPartnerSanityCheck()
+
+        # Snapshots are only checked for cycles without overrides, which may
+        # introduce them.
+        if (snapshot is None or not snapshot['interpolationChecked'] or
+         len(overrides) != 0):
+            self._CheckInterpolationCycles()
+
+        if snapshot is None and snapshotKey is not None:
+            self._SaveSnapshot(snapshotKey, len(overrides) == 0)
+
+        self._optionTypes = self._GetDeclaredOptionTypes(optionTypes)
+        self._CoerceTypedOptions()
+
+    def _GetDeclaredOptionTypes(self, optionTypes):
+        declaredTypes = {}
+
+        try:
+            declaredTypes.update(self.SectionGet('quickrelease',
+             'option_types', dict))
+        except ConfigSpecError, ex:
+            if not ConfSpecErrorIsMissingError(ex.details):
+                raise ex
+
+        if optionTypes is not None:
+            declaredTypes.update(optionTypes)
+
+        typesByOption = {}
+        for (optionKey, optionType) in declaredTypes.items():
+            if type(optionType) is str:
+                optionType = ConfigSpec._OPTION_TYPE_NAMES.get(optionType)
+
+            if optionType not in ConfigSpec._OPTION_TYPE_NAMES.values():
+                raise ConfigSpecError("Invalid type specified for option %s: "
+                 "%s" % (optionKey, declaredTypes[optionKey]),
+                 ConfigSpecError.COERCION_TYPE_ERROR)
+
+            keyParts = optionKey.split(ConfigSpec.CONFIG_SECTION_DELIMETER)
+            optionName = keyParts.pop().strip()
+            if len(keyParts) == 0:
+                optionSection = ConfigSpec.DEFAULT_SECTION
+            else:
+                optionSection = ConfigSpec.CONFIG_SECTION_DELIMETER.join(
+                 keyParts).strip()
+
+            typesByOption[(optionSection,
+             self._configSpec.optionxform(optionName))] = optionType
+
+        return typesByOption
+
+    def _CoerceTypedOptions(self):
+        # Coercing the options caches their coerced values.
+        for ((section, name), optionType) in self._optionTypes.items():
+            try:
+                self.SectionGet(section, name, optionType)
+            except ConfigSpecError, ex:
+                # Options are only validated if they're defined.
+                if not ConfSpecErrorIsMissingError(ex.details):
+                    raise ex
+            except ValueError, ex:
+                raise ConfigSpecError("Invalid %s value for option %s in "
+                 "section %s: %s" % (optionType.__name__, name, section, ex),
+                 ConfigSpecError.COERCION_TYPE_ERROR)
+
+    def _GetOptionTypes(self):
+        return dict(("%s%s%s" % (section, ConfigSpec.CONFIG_SECTION_DELIMETER,
+         name), optionType) for ((section, name), optionType) in
+         self._optionTypes.items())
+
+    @staticmethod
+    def _ScanSectionHeaders(configFile):
+        # Only what's needed to find section headers, the way ConfigParser
+        # does: they're never indented (that's a continuation line), or
+        # comments.
+        headers = []
+
+        configHandle = open(configFile, 'r')
+        try:
+            for line in configHandle:
+                if line[:1] in ('', '#', ';') or line[0].isspace():
+                    continue
+
+                m = ConfigParser.RawConfigParser.SECTCRE.match(line)
+                if m is not None and m.group('header') not in headers:
+                    headers.append(m.group('header'))
+        finally:
+            configHandle.close()
+
+        return headers
+
+    @staticmethod
+    def _ResolveIncludeFiles(configFile, includeManifest, includes):
+        includeFiles = []
+
+        configDir = os.path.dirname(os.path.abspath(configFile))
+        for includePattern in includeManifest.split():
+            includePattern = os.path.join(configDir, includePattern)
+            matches = sorted(glob.glob(includePattern))
+            if len(matches) == 0:
+                raise ConfigSpecError("Included config file '%s' missing." %
+                 (includePattern))
+            includeFiles += matches
+
+        for includeFile in includes:
+            if not os.path.isfile(includeFile):
+                raise ConfigSpecError("Included config file '%s' missing." %
+                 (includeFile))
+            includeFiles.append(os.path.abspath(includeFile))
+
+        return includeFiles
+
+    def _ReadIncludes(self, includes):
+        try:
+            self._includeManifest = self._configSpec.get('quickrelease',
+             'include_files', True)
+        except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+            self._includeManifest = ''
+
+        includeFiles = ConfigSpec._ResolveIncludeFiles(self.configFile,
+         self._includeManifest, includes)
+
+        if len(includeFiles) == 0:
+            return
+
+        # Only the main config file has been loaded at this point.
+        sectionNames = self._configSpec.sections()
+        sectionFileCounts = dict((s, 1) for s in sectionNames)
+        includeSections = []
+
+        for includeFile in includeFiles:
+            headers = ConfigSpec._ScanSectionHeaders(includeFile)
+            includeSections.append((includeFile, headers))
+
+            for header in headers:
+                if header == ConfigSpec.DEFAULT_SECTION:
+                    continue
+                elif header not in sectionFileCounts:
+                    sectionNames.append(header)
+                    sectionFileCounts[header] = 0
+                sectionFileCounts[header] += 1
+
+        for (includeFile, headers) in includeSections:
+            loadNow = False
+            for header in headers:
+                if (header in (ConfigSpec.DEFAULT_SECTION, 'quickrelease') or
+                 ConfigSpec._IsPartnerSection(header) or
+                 sectionFileCounts[header] > 1):
+                    loadNow = True
+                    break
+
+            if loadNow:
+                try:
+                    self._configSpec.read(includeFile)
+                except ConfigParser.Error, ex:
+                    raise ConfigSpec._ConvertToConfigParserError(ex)
+            else:
+                self._pendingIncludes[includeFile] = headers
+                for header in headers:
+                    self._pendingSections[header] = includeFile
+
+        self._includeFiles = includeFiles
+        self._sectionNames = sectionNames
+
+    def _EnsureSectionLoaded(self, section):
+        if section not in self._pendingSections:
+            return
+
+        self._loadLock.acquire()
+        try:
+            includeFile = self._pendingSections.get(section)
+            if includeFile is None:
+                # Another thread got here first.
+                return
+
+            try:
+                self._configSpec.read(includeFile)
+            except ConfigParser.Error, ex:
+                raise ConfigSpec._ConvertToConfigParserError(ex)
+
+            loadedSections = self._pendingIncludes.pop(includeFile)
+            for loadedSection in loadedSections:
+                del self._pendingSections[loadedSection]
+        finally:
+            self._loadLock.release()
+
+        self._CheckInterpolationCycles(loadedSections)
+
+    def _EnsureAllSectionsLoaded(self):
+        for section in self._pendingSections.keys():
+            self._EnsureSectionLoaded(section)
+
+    @staticmethod
+    def _GetSnapshotKey(configFile, includes):
+        # Snapshots are invalidated by any change to the config file, or to
+        # QuickRelease itself (which may change what a snapshot contains).
+        # (Changes to included files are checked when the snapshot is
+        # loaded.)
+        if ConfigSpec.GetConstant('CONFIG_SNAPSHOT_DIR') is None:
+            return None
+
+        configStat = os.stat(configFile)
+        return (ConfigSpec._SNAPSHOT_FORMAT, QUICKRELEASE_VERSION,
+         os.path.abspath(configFile), configStat.st_size,
+         configStat.st_mtime, tuple(os.path.abspath(f) for f in includes))
+
+    @staticmethod
+    def _GetIncludeFileStats(includeFiles):
+        includeStats = []
+        for includeFile in includeFiles:
+            try:
+                includeStat = os.stat(includeFile)
+            except OSError:
+                return None
+            includeStats.append((includeFile, includeStat.st_size,
+             includeStat.st_mtime))
+        return includeStats
+
+    @staticmethod
+    def _GetSnapshotFile(snapshotKey):
+        return os.path.join(ConfigSpec.GetConstant('CONFIG_SNAPSHOT_DIR'),
+         "%s.qrsnapshot" % (hashlib.sha1(snapshotKey[2]).hexdigest()))
+
+    def _LoadSnapshot(self, snapshotKey, includes):
+        if snapshotKey is None:
+            return None
+
+        try:
+            snapshotHandle = open(ConfigSpec._GetSnapshotFile(snapshotKey),
+             'rb')
+            try:
+                snapshot = cPickle.load(snapshotHandle)
+            finally:
+                snapshotHandle.close()
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            # A missing or corrupt snapshot just means we'll reparse.
+            return None
+
+        if type(snapshot) is not dict or snapshot.get('key') != snapshotKey:
+            return None
+
+        # The include_files item comes from the config file, which is
+        # unchanged (it's part of the key), but its wildcards may match a
+        # different set of files now; any change to that set, or to the
+        # files themselves, means the snapshot is stale.
+        includeFiles = list(x[0] for x in snapshot['includeStats'])
+        try:
+            if ConfigSpec._ResolveIncludeFiles(self.configFile,
+             snapshot['includeManifest'], includes) != includeFiles:
+                return None
+        except ConfigSpecError:
+            return None
+
+        if (ConfigSpec._GetIncludeFileStats(includeFiles) !=
+         snapshot['includeStats']):
+            return None
+
+        rawConfig = self._configSpec
+        rawConfig._defaults = rawConfig._dict(snapshot['defaults'])
+        rawConfig._sections = rawConfig._dict()
+        for (sectionName, sectionItems) in snapshot['sections']:
+            rawConfig._sections[sectionName] = rawConfig._dict(sectionItems)
+
+        self._partnerSections = snapshot['partnerSections']
+        self._interpolation.AddTemplates(snapshot['templates'])
+        self._includeManifest = snapshot['includeManifest']
+        self._includeFiles = includeFiles
+        self._sectionNames = snapshot['sectionNames']
+        self._pendingIncludes = snapshot['pendingIncludes']
+        for (includeFile, headers) in self._pendingIncludes.items():
+            for header in headers:
+                self._pendingSections[header] = includeFile
+        return snapshot
+
+    def _SaveSnapshot(self, snapshotKey, interpolationChecked):
+        rawConfig = self._configSpec
+        snapshot = { 'key': snapshotKey,
+                     'defaults': rawConfig._defaults.items(),
+                     'sections': list((name, sectionDict.items()) for
+                      (name, sectionDict) in rawConfig._sections.items()),
+                     'partnerSections': self._partnerSections,
+                     'templates': self._interpolation.GetTemplates(),
+                     'interpolationChecked': interpolationChecked,
+                     'includeManifest': self._includeManifest,
+                     'includeStats': ConfigSpec._GetIncludeFileStats(
+                      self._includeFiles),
+                     'sectionNames': self._sectionNames,
+                     'pendingIncludes': self._pendingIncludes,
+                   }
+
+        snapshotFile = ConfigSpec._GetSnapshotFile(snapshotKey)
+        tmpSnapshotFile = "%s.%d.tmp" % (snapshotFile, os.getpid())
+
+        # The snapshot is only a cache; failing to write it isn't fatal.
+        try:
+            Makedirs(os.path.dirname(snapshotFile))
+            snapshotHandle = open(tmpSnapshotFile, 'wb')
+            try:
+                cPickle.dump(snapshot, snapshotHandle,
+                 cPickle.HIGHEST_PROTOCOL)
+            finally:
+                snapshotHandle.close()
+
+            # Not atomic on Win32, but close enough for a cache.
+            if os.name == 'nt' and os.path.exists(snapshotFile):
+                os.remove(snapshotFile)
+            os.rename(tmpSnapshotFile, snapshotFile)
+        except (IOError, OSError):
+            if os.path.exists(tmpSnapshotFile):
+                os.remove(tmpSnapshotFile)
+
+    def _CheckInterpolationCycles(self, sections=None):
+        # A cycle only involving values from the default section shows up in
+        # every section, so for the other sections, only look at the options
+        # they (or their overrides) define themselves. (Sections which
+        # haven't been loaded yet are checked when they are.)
+        #
+        # References to undefined options are reported too. Values in the
+        # default section may legitimately refer to options only some
+        # sections define, though, so theirs are only reported if no section
+        # (or override) defines the option; if some sections haven't been
+        # loaded yet, that can't be known, so they're reported when used.
+        # Configs which allow overrides may refer to options only supplied
+        # when the value is retrieved, so theirs are always reported when
+        # used.
+        if sections is None:
+            sections = [ConfigSpec.DEFAULT_SECTION] + list(s for s in
+             self._configSpec.sections() if s not in self._pendingSections)
+
+        for section in sections:
+            try:
+                scopes = self._GetScopes(section, self._valueContext)
+            except ConfigParser.Error, ex:
+                raise ConfigSpec._ConvertToConfigParserError(ex)
+
+            names = scopes[0].keys() + scopes[1].keys()
+            if section == ConfigSpec.DEFAULT_SECTION:
+                names += scopes[2].keys()
+
+            missing = []
+            cycle = self._interpolation.FindCycle(scopes, names, missing)
+            if cycle is not None:
+                raise ConfigSpecError("Interpolation cycle in section [%s]: "
+                 "%s" % (section, ' -> '.join(cycle)),
+                 ConfigSpecError.INTERPOLATION_CYCLE_ERROR)
+
+            if self._allowOverrides:
+                missing = []
+            elif section == ConfigSpec.DEFAULT_SECTION:
+                missing = self._GetUndefinedReferences(missing)
+
+            if len(missing) != 0:
+                (option, reference) = missing[0]
+                raise ConfigSpecError("Option %s in section [%s] refers to "
+                 "undefined option %s" % (option, section, reference),
+                 ConfigSpecError.INTERPOLATION_MISSING_OPTION_ERROR)
+
+    def _GetUndefinedReferences(self, missing):
+        if len(self._pendingSections) != 0:
+            return []
+
+        optionxform = self._configSpec.optionxform
+        definedNames = set()
+        for sectionDict in self._configSpec._sections.values():
+            definedNames.update(sectionDict.keys())
+        for sectionOverrides in self._clOverrides.values():
+            definedNames.update(optionxform(k) for k in sectionOverrides)
+
+        return list(x for x in missing if x[1] not in definedNames)
 
     def _GetRootDir(self): return self._rootDir
-    def _GetRawConfig(self): return self._configSpec
     def _GetConfigFile(self): return self._configFile
     def _GetSection(self): return self._currentSection
-    def _GetSectionList(self): return self.rawConfig.sections()
+
+    def _GetRawConfig(self):
+        self._EnsureAllSectionsLoaded()
+        return self._configSpec
+
+    def _GetSectionList(self):
+        if self._sectionNames is None:
+            return self._configSpec.sections()
+        return list(self._sectionNames)
 
     def _SetSection(self, newSection):
         newSection = newSection.strip()
         if self.section == newSection:
             return
 
+        self._EnsureSectionLoaded(newSection)
+
         if (newSection.lower() != ConfigSpec.DEFAULT_SECTION.lower() and
-         (not self.rawConfig.has_section(newSection))):
+         (not self._configSpec.has_section(newSection))):
             raise ConfigSpecError("Non-existent config spec section: %s" %
              (newSection), ConfigSpecError.NO_SECTION_ERROR)
         self._currentSection = newSection
@@ -351,11 +1109,10 @@ class ConfigSpec(object):
         if sectionName is None:
             sectionName = self.section
 
+        self._EnsureSectionLoaded(sectionName)
+
         # TODO: include overrides
-        try:
-            return list(x[0] for x in self.rawConfig.items(sectionName))
-        except ConfigParser.Error, ex:
-            raise ConfigSpec._ConvertToConfigParserError(ex)
+        return self._GetSectionOptionNames(sectionName)
 
     def GetSectionElements(self, sectionName=None):
         """
@@ -374,9 +1131,45 @@ class ConfigSpec(object):
         if sectionName is None:
             sectionName = self.section
 
+        self._EnsureSectionLoaded(sectionName)
+
         # TODO: include overrides
+        return self._GetSectionElements(sectionName)
+
+    def _GetSectionOptionNames(self, section):
+        # The options ConfigParser.items() would return, in the same order,
+        # without interpolating their values.
+        self._EnsureSectionLoaded(section)
+
+        defaults = self._configSpec.defaults()
         try:
-            return self.rawConfig.items(sectionName)
+            sectionDict = self._configSpec._sections[section]
+        except KeyError:
+            if section != ConfigParser.DEFAULTSECT:
+                raise ConfigSpecError("No section: %r" % (section),
+                 ConfigSpecError.NO_SECTION_ERROR)
+            sectionDict = {}
+
+        return defaults.keys() + list(x for x in sectionDict.keys() if
+         x not in defaults and x != '__name__')
+
+    def _GetSectionElements(self, section, partnerVars=None):
+        # Like ConfigParser.items(), but interpolated with our own
+        # interpolation, so without its limit on reference depth. As with
+        # items(), commandline overrides aren't applied; partner variables,
+        # if given, are.
+        names = self._GetSectionOptionNames(section)
+
+        scopes = (self._configSpec._sections.get(section, {}),
+         self._configSpec.defaults())
+        if partnerVars is not None:
+            scopes = (self._GetSectionPartnerVars(section, partnerVars),) + (
+             scopes)
+
+        memo = {}
+        try:
+            return list((name, self._interpolation.Interpolate(section, name,
+             scopes, memo)) for name in names)
         except ConfigParser.Error, ex:
             raise ConfigSpec._ConvertToConfigParserError(ex)
 
@@ -392,7 +1185,7 @@ class ConfigSpec(object):
 
     rawConfig = property(_GetRawConfig)
     """The underlying L{SafeConfigParser<ConfigParser.SafeConfigParser>}
-    handle. Read-only.
+    handle, with all included config files loaded. Read-only.
     @type: L{SafeConfigParser<ConfigParser.SafeConfigParser>}"""
 
     section = property(_GetSection, _SetSection)
@@ -403,6 +1196,11 @@ class ConfigSpec(object):
     """A C{list} of all defined sections in the configuration specification.
     Read-only.
     @type: C{list}"""
+
+    optionTypes = property(_GetOptionTypes)
+    """The declared types of typed options, keyed by "section:name"; see
+    L{ConfigSpec.__init__}. Read-only.
+    @type: C{dict}"""
     sectionItems = property(GetSectionItems)
     """A C{list} of all defined items ("options") in the current section.
     Read-only.
@@ -413,15 +1211,37 @@ class ConfigSpec(object):
     @type: C{list}"""
 
     def _DefaultSectionPartnerSanityCheck(self):
-        for key in self.rawConfig.defaults().keys():
+        for key in self._configSpec.defaults().keys():
             if re.match('^PARTNER_', key, re.I):
-                assert self.rawConfig.get(ConfigSpec.DEFAULT_SECTION,
+                assert self._configSpec.get(ConfigSpec.DEFAULT_SECTION,
                  key) == '', "Invalid Key."
 
+    def _SetDefaultValue(self, key, value):
+        # All changes to the underlying config go through here, so cached
+        # values are only thrown away when a value actually changes. (Only
+        # PARTNER_ variables are changed, and partner views overlay all of
+        # those, so the views' caches remain valid.)
+        optionKey = self._configSpec.optionxform(key)
+        if self._configSpec.defaults().get(optionKey) != value:
+            self._configSpec.set(ConfigSpec.DEFAULT_SECTION, key, value)
+            self._valueContext.Clear()
+
+    def FlushValueCache(self):
+        """
+        Clear the cache of values returned by L{Get}, L{SectionGet} and
+        L{PartnerGet}, and the partner views returned by L{ForPartner}.
+
+        The C{ConfigSpec} does this itself whenever its values change (e.g. 
+        when a partner section is selected); it only needs to be called if
+        the underlying L{rawConfig} is modified directly.
+        """
+        self._valueContext.Clear()
+        self._partnerViews.clear()
+
     def _ResetPartnerDefaultSectionVars(self):
-        for key in self.rawConfig.defaults().keys():
+        for key in self._configSpec.defaults().keys():
             if re.match('^PARTNER_', key, re.I):
-                self.rawConfig.set(ConfigSpec.DEFAULT_SECTION, key, '')
+                self._SetDefaultValue(key, '')
                 #rv = self.rawConfig.remove_option(ConfigSpec.DEFAULT_SECTION, key)
                 #print "set for %s: %s" % (key, rv)
 
@@ -450,28 +1270,109 @@ class ConfigSpec(object):
         if not self.ValidPartner(partner):
             raise ConfigSpecError("Invalid/unknown partner: %s" % (partner))
 
-        partnerSectionName = self._GetPartnerSectionName(partner)
-        self.section = partnerSectionName
+        self.section = self._partnerSections[partner]
 
         # We do this so different variables from other partner sections don't
         # pollute the default variable namespace
         self._ResetPartnerDefaultSectionVars()
 
-        for item in self.sectionElements:
-            if not re.match('^PARTNER_', item[0], re.I):
-                #print "Setting PARTNER_%s=%s" % (item[0], item[1])
-                self.rawConfig.set(ConfigSpec.DEFAULT_SECTION,
-                 "PARTNER_%s" % (item[0]), item[1])
+        for (key, value) in self._GetPartnerVars(partner).items():
+            self._SetDefaultValue(key, value)
 
-        #print ', '.join(self.rawConfig.defaults())
-        #print "really? %s" % (self.rawConfig.has_option(ConfigSpec.DEFAULT_SECTION, 'partner_build_number'))
+    def _GetPartnerVars(self, partner):
+        # The PARTNER_ variables SetPartnerSection() would put into the
+        # default section for the given partner; every known PARTNER_
+        # variable is included (blank, if the partner doesn't define it), so
+        # these can be overlaid on the defaults without other partners'
+        # values leaking through.
+        optionxform = self._configSpec.optionxform
+        partnerVars = {}
+
+        for key in self._configSpec.defaults().keys():
+            if re.match('^PARTNER_', key, re.I):
+                partnerVars[key] = ''
+
+        for (section, sectionOverrides) in self._clOverrides.items():
+            if ConfigSpec._IsPartnerSection(section):
+                for overrideKey in sectionOverrides.keys():
+                    partnerVars[optionxform("PARTNER_%s" % (overrideKey))] = ''
+
+        partnerSectionName = self._partnerSections[partner]
+        sectionElements = self._GetSectionElements(partnerSectionName,
+         partnerVars)
+
+        for (key, value) in sectionElements:
+            if not re.match('^PARTNER_', key, re.I):
+                partnerVars[optionxform("PARTNER_%s" % (key))] = value
 
         if self._clOverrides.has_key(partnerSectionName):
-            for overrideKey in self._clOverrides[partnerSectionName]:
-                #print "Setting PARTNER_%s=%s" % (item[0], item[1])
-                self.rawConfig.set(ConfigSpec.DEFAULT_SECTION,
-                 "PARTNER_%s" % (overrideKey),
-                 self._clOverrides[partnerSectionName][overrideKey])
+            for (overrideKey, overrideVal) in (
+             self._clOverrides[partnerSectionName].items()):
+                partnerVars[optionxform("PARTNER_%s" % (overrideKey))] = (
+                 overrideVal)
+
+        return partnerVars
+
+    def _GetSectionPartnerVars(self, section, partnerVars):
+        # ConfigParser gives variables passed to get()/items() precedence
+        # over the section's own options, whereas PARTNER_ variables set by
+        # SetPartnerSection() live in the default section, and so are
+        # shadowed by them; drop any the section defines itself.
+        sectionOptions = self._configSpec._sections.get(section, {})
+        return dict(x for x in partnerVars.items() if x[0] not in
+         sectionOptions)
+
+    def Freeze(self):
+        """
+        Create an immutable copy of the C{ConfigSpec}, as it is now: with
+        the same current section (and so the same C{PARTNER_} variables), and
+        with any included config files loaded.
+
+        The copy may be read from any number of threads at once, without
+        locking; its section can't be changed, and further changes to this
+        C{ConfigSpec} don't affect it. Use L{ForPartner} on the copy to read
+        other partners' values.
+
+        @return: The frozen copy.
+        @rtype:  L{FrozenConfigSpec}
+        """
+        return FrozenConfigSpec(self)
+
+    def ForPartner(self, partner):
+        """
+        Obtain a read-only view of this C{ConfigSpec}, as it would be after
+        calling L{SetPartnerSection} for the named partner.
+
+        Unlike L{SetPartnerSection}, this leaves the C{ConfigSpec} untouched:
+        the partner's C{PARTNER_} variables are overlaid on the configuration
+        when values are interpolated, instead of being written into the
+        default section. Views for several partners may therefore be used at
+        once (e.g. from different threads).
+
+        Views are created once per partner, and reused.
+
+        @param partner: The name of the partner.
+        @type  partner: C{str}
+
+        @return: A view of the configuration, with the partner's section
+        selected.
+        @rtype:  L{PartnerConfigView}
+
+        @raise ConfigSpecError: If the partner isn't defined.
+        """
+        try:
+            return self._partnerViews[partner]
+        except KeyError:
+            pass
+
+        if not self.ValidPartner(partner):
+            raise ConfigSpecError("Invalid/unknown partner: %s" % (partner),
+             ConfigSpecError.NO_SECTION_ERROR)
+
+        view = PartnerConfigView(self, partner,
+         _ValueContext(self._GetPartnerVars(partner)))
+        self._partnerViews[partner] = view
+        return view
 
     @staticmethod
     def _GetPartnerSectionName(partnerName):
@@ -515,15 +1416,25 @@ class ConfigSpec(object):
         @return:  Does the given string represent a validly defined "partner"
         for the current configuration specification.
         """
-        return self._GetPartnerSectionName(partner) in self.sectionList
+        return partner in self._partnerSections
+
+    def _GetPartners(self):
+        return tuple(sorted(self._partnerSections.keys()))
+
+    partners = property(_GetPartners)
+    """The names of all partners defined in the configuration specification.
+    Read-only.
+    @type: C{tuple} of C{str}"""
 
     def PartnerGet(self, partner, name, coercion=None, interpolation={}):
         """
         Retrieve the value for the given item name in the specified-partner's
         section.
 
-        Care is taken to ensure that the C{ConfigSpec} handle state is left as
-        it was.
+        The value is resolved as if L{SetPartnerSection} had been called for
+        the partner (i.e. C{PARTNER_} variables refer to that partner's
+        values), but the C{ConfigSpec} handle state is left as it was. See
+        L{ForPartner}.
 
         @param partner: The partner to query the partner-section for the
         requested item. 
@@ -537,18 +1448,16 @@ class ConfigSpec(object):
         comprehensive explanation of this method's other arguments and 
         possible exceptions.
         """
-        # TODO: this really needs to call SetPartnerSection() for fully-correct
-        # behavior.
-        return self.SectionGet(self._GetPartnerSectionName(partner),
-                                      name,
-                                      coercion,
-                                      interpolation)
+        return self.ForPartner(partner).Get(name, coercion, interpolation)
 
     def SectionGet(self, section, name, coercion=None, interpOverrides={}):
         """
         Retrieve the value for the given item name in the specified-section.
-        Care is taken to ensure that the C{ConfigSpec} handle state is left as
-        it was.
+
+        The value is resolved against the given section directly; the
+        C{ConfigSpec}'s current section (and the C{PARTNER_} variables set by
+        L{SetPartnerSection}) are left untouched, so this is safe to call from
+        several threads at once.
 
         @param section: The name of the section to obtain the requested item
         from.
@@ -562,15 +1471,20 @@ class ConfigSpec(object):
         comprehensive explanation of this method's other arguments and 
         possible exceptions.
         """
-        origSection = self.section
+        section = self._CheckSectionName(section)
+        return self._GetCachedValue(section, name, coercion, interpOverrides)
 
-        try:
-            self.section = section
-            value = self.Get(name, coercion, interpOverrides)
-        finally:
-            self.section = origSection
+    def _CheckSectionName(self, section):
+        section = section.strip()
+        self._EnsureSectionLoaded(section)
 
-        return value
+        if (section != self.section and
+         section.lower() != ConfigSpec.DEFAULT_SECTION.lower() and
+         not self._configSpec.has_section(section)):
+            raise ConfigSpecError("Non-existent config spec section: %s" %
+             (section), ConfigSpecError.NO_SECTION_ERROR)
+
+        return section
 
     # TODO: when the default section is specified, restrict access to just
     # what defaults() returns
@@ -602,92 +1516,165 @@ class ConfigSpec(object):
         L{SafeConfigParser<ConfigParser.SafeConfigParser>} errors are converted 
         to L{ConfigSpecError<quickrelease.config.ConfigSpecError>}s as 
         appropriate.
+
+        @note: Values are cached (per section, name, coercion and 
+        interpolation overrides), so repeatedly retrieving a value is cheap.
+        C{list} and C{dict} values are copies of the cached value, so they may
+        be freely modified.
+
+        @note: Interpolation follows
+        L{SafeConfigParser<ConfigParser.SafeConfigParser>}'s rules, but
+        references may be nested to any depth; values which refer to
+        themselves (directly or indirectly) are reported when the 
+        configuration specification is loaded, as 
+        C{INTERPOLATION_CYCLE_ERROR}s. So are references to undefined
+        options, as C{INTERPOLATION_MISSING_OPTION_ERROR}s, except those in
+        default section values to options some section defines. (If the
+        configuration specification allows overrides, references to
+        undefined options are instead reported when the value is retrieved
+        without an override for them.)
         """
-       
+        return self._GetCachedValue(self.section, name, coercion,
+         interpOverrides)
+
+    def _GetCachedValue(self, section, name, coercion, interpOverrides,
+     context=None):
+        if context is None:
+            context = self._valueContext
 
+        try:
+            if interpOverrides is None:
+                cacheKey = (section, name, coercion, None)
+            else:
+                cacheKey = (section, name, coercion,
+                 frozenset(interpOverrides.items()))
+            value = context.values[cacheKey]
+        except KeyError:
+            value = self._GetValue(section, name, coercion, interpOverrides,
+             context)
+            context.values[cacheKey] = value
+        except (TypeError, AttributeError):
+            # Unhashable (or invalid) overrides; let _GetValue() sort it out.
+            value = self._GetValue(section, name, coercion, interpOverrides,
+             context)
+
+        if coercion is list:
+            return list(value)
+        elif coercion is dict:
+            return dict(value)
+
+        return value
+
+    def _GetScopes(self, section, context, applyClOverrides=True):
+        # The dictionaries values in the given section are looked up in (the
+        # same ones ConfigParser.get() uses): the partner variables (for
+        # partner views) and commandline overrides, then the section's own
+        # values, then the default section's.
+        scopesKey = (section, applyClOverrides)
+        try:
+            return context.scopes[scopesKey]
+        except KeyError:
+            pass
+
+        self._EnsureSectionLoaded(section)
+
+        try:
+            sectionDict = self._configSpec._sections[section]
+        except KeyError:
+            if section != ConfigParser.DEFAULTSECT:
+                raise ConfigParser.NoSectionError(section)
+            sectionDict = {}
+
+        overrides = {}
+        if context.partnerVars is not None:
+            overrides.update(self._GetSectionPartnerVars(section,
+             context.partnerVars))
+
+        # ORDER MATTERS HERE: section overrides take precedence over default
+        # section overrides.
+        for overrideSection in (ConfigSpec.DEFAULT_SECTION, section):
+            if applyClOverrides and self._clOverrides.has_key(overrideSection):
+                for (key, value) in self._clOverrides[overrideSection].items():
+                    overrides[self._configSpec.optionxform(key)] = value
+
+        scopes = (overrides, sectionDict, self._configSpec.defaults())
+        context.scopes[scopesKey] = scopes
+        return scopes
+
+    def _GetValue(self, section, name, coercion, interpOverrides, context):
         getRawValues = interpOverrides is None
-        overrides = None
 
         if coercion not in (bool, str, int, float, list, dict, None):
             raise ConfigSpecError("Invalid coercion type specified: %s" %
              (coercion), ConfigSpecError.COERCION_TYPE_ERROR)
 
-        # Overrides/raw values aren't supported by the underlying
-        # ConfigParser class, so skip all the override stuff and fast-track
-        # coercions of this type
         if coercion in (bool, int, float):
             if getRawValues or len(interpOverrides.keys()) != 0:
                 raise ConfigSpecError("Raw values and overrides are not "
                  "compatible with type coercions for bool, int, or float.")
 
-            try:
-                if coercion is bool:
-                    return self.rawConfig.getboolean(self.section, name)
-                elif coercion is int:
-                    return self.rawConfig.getint(self.section, name)
-                elif coercion is float:
-                    return self.rawConfig.getfloat(self.section, name)
-            except ConfigParser.Error, ex:
-                raise ConfigSpec._ConvertToConfigParserError(ex)
-
         if (not getRawValues and len(interpOverrides.keys()) != 0 and
          not self._allowOverrides):
             raise ConfigSpecError(OVERRIDES_DISABLED_ERR_STR % 
              (self.configFile))
 
-        # _And_ we have to do this here so variables that consist of other
-        # (interpolated) variables correctly pick up the overrides specified
-        # in the environment.
-        envCurrentSectionOverrides = {}
-        envDefaultSectionOverrides = {}
-        
-        try:
-            envCurrentSectionOverrides = self._clOverrides[self.section]
-        except KeyError:
-            pass
+        optionxform = self._configSpec.optionxform
+        name = optionxform(name)
 
-        try:
-            envDefaultSectionOverrides = self._clOverrides[
-             ConfigSpec.DEFAULT_SECTION]
-        except KeyError:
-            pass
+        # bool, int and float values have always been read with
+        # ConfigParser.getboolean() and friends, which ignore commandline
+        # overrides.
+        applyClOverrides = coercion not in (bool, int, float)
 
         try:
-            # ORDER MATTERS HERE: 
-            # the dict() conversion takes the last item if there
-            # is any overlap, so we want the overrides in the following 
-            # order:
-            # -- Passed in to the function
-            # -- Specified as a section override
-            # -- specified as a default section override
-            overrides = dict(envDefaultSectionOverrides.items() +
-                             envCurrentSectionOverrides.items() +
-                             interpOverrides.items())
-        except TypeError:
-            raise ConfigSpecError("Invalid interpolation overrides "
-             "specified; must be convertable a dictionary.",
-             ConfigSpecError.COERCION_TYPE_ERROR)
-
-        if not self._allowOverrides:
-            assert 0 == len(overrides.keys()), ("ConfigSpec variable overrides "
-             "disabled, but slipped in anyway.")
+            scopes = self._GetScopes(section, context, applyClOverrides)
 
-        # We handle these above, but assert it, just in case:
-        assert coercion not in (bool, int, float), ("bool, int, or float "
-         "coercion slipped through?")
+            if not self._allowOverrides:
+                assert 0 == len(self._clOverrides.keys()), ("ConfigSpec "
+                 "variable overrides disabled, but slipped in anyway.")
 
-        try:
-            confVal = self.rawConfig.get(self.section, name, getRawValues,
-             overrides)
-            if coercion is list:
-                return confVal.split()
-            elif coercion is dict:
-                return ConfigSpec._ConfStringToDict(confVal)
-            elif coercion is None or coercion is str:
-                return confVal
+            if getRawValues:
+                try:
+                    confVal = _InterpolationGraph.Lookup(name, scopes)
+                except KeyError:
+                    raise ConfigParser.NoOptionError(name, section)
+            elif len(interpOverrides.keys()) != 0:
+                # Overrides passed in to the function take precedence over
+                # everything else; values interpolated with them can't be
+                # reused for other requests.
+                try:
+                    interpVars = dict((optionxform(k), v) for (k, v) in
+                     interpOverrides.items())
+                except (TypeError, ValueError):
+                    raise ConfigSpecError("Invalid interpolation overrides "
+                     "specified; must be convertable a dictionary.",
+                     ConfigSpecError.COERCION_TYPE_ERROR)
+
+                confVal = self._interpolation.Interpolate(section, name,
+                 (interpVars,) + scopes, {})
+            else:
+                confVal = self._interpolation.Interpolate(section, name,
+                 scopes, context.interpolated.setdefault((section,
+                 applyClOverrides), {}))
         except ConfigParser.Error, ex:
             raise ConfigSpec._ConvertToConfigParserError(ex)
 
+        if coercion is list:
+            return confVal.split()
+        elif coercion is dict:
+            return ConfigSpec._ConfStringToDict(confVal)
+        elif coercion is bool:
+            # Same as ConfigParser.getboolean()
+            if confVal.lower() not in self._configSpec._boolean_states:
+                raise ValueError("Not a boolean: %s" % (confVal))
+            return self._configSpec._boolean_states[confVal.lower()]
+        elif coercion is int:
+            return int(confVal)
+        elif coercion is float:
+            return float(confVal)
+        elif coercion is None or coercion is str:
+            return confVal
+
         assert False, "Unreachable (or should be...)"
 
     @staticmethod
@@ -711,65 +1698,461 @@ class ConfigSpec(object):
         else:
             return ConfigSpecError(err.message, errCode)
 
-    # This method may seem a little convoluted, but to get the type of error
-    # reporting we wanted, we decided to parse the string manually, in two 
-    # phases. A couple of initial impl's were done using regular expressions,
-    # but they didn't provide the information we wanted to be able to report 
-    # to the user about the format error in their config file.
+    # Elements are parsed in a single pass over the string, without using
+    # regular expressions, so we can report exactly which element of the
+    # user's config is malformed. Missing-value errors are only reported once
+    # the whole string has been scanned, so malformed elements are reported
+    # first.
     @staticmethod
     def _ConfStringToDict(confStr):
         retDict = {}
+        missingValueError = None
 
-        dictParts = []
+        confStr = confStr.strip()
+        confStrLen = len(confStr)
         i = 0
 
-        confStr = confStr.strip()
-        while i < len(confStr):
-            part = confStr[i:]
-            #print part
-            partStart = part.find('[')
+        while i < confStrLen:
+            partStart = confStr.find('[', i)
 
             if partStart == -1:
                 raise ConfigSpecError("Malformed dictionary element: %s" %
-                 (part))
-      
-            partEnd = part.find(']', partStart)
+                 (confStr[i:]))
+
+            partEnd = confStr.find(']', partStart)
 
             if partEnd == -1:
                 raise ConfigSpecError("Malformed dictionary element2: %s" %
-                 (part))
-     
-            # without brackets
-            #   keyValuePair = dictStr[i + partStart + 1:i + partEnd]
-            # with brackets
-            keyValuePair = confStr[i + partStart:i + partEnd + 1]
+                 (confStr[i:]))
 
-            # Ignore empty key/value pairs
-            if len(keyValuePair[1:len(keyValuePair) - 1].strip()) > 0:
-                dictParts.append(keyValuePair)
-            i += partEnd + 1
+            i = partEnd + 1
+            keyPart = confStr[partStart + 1:partEnd].lstrip()
 
-        for fullKey in dictParts:
-            keyPart = fullKey[1:len(fullKey) - 1]
-            keyPart = keyPart.lstrip()
+            # Ignore empty key/value pairs
+            if len(keyPart) == 0:
+                continue
 
-            keyPartSplit = re.split('\s+', keyPart, 1)
-            keyName = keyPartSplit[0]
+            keyPartSplit = keyPart.split(None, 1)
             if len(keyPartSplit) != 2:
-                raise ConfigSpecError("Missing dictionary value for key %s: %s"
-                 % (keyName, fullKey))
+                if missingValueError is None:
+                    missingValueError = ConfigSpecError("Missing dictionary "
+                     "value for key %s: %s" % (keyPartSplit[0],
+                     confStr[partStart:partEnd + 1]))
+                continue
 
-            keyValue = keyPartSplit[1].lstrip()
-            if 0 == len(keyValue):
-                raise ConfigSpecError("Missing dictionary value for key %s: %s"
-                 % (keyName, fullKey))
+            retDict[keyPartSplit[0]] = keyPartSplit[1]
 
-            retDict[keyName] = keyValue
+        if missingValueError is not None:
+            raise missingValueError
 
         return retDict
 
+class PartnerConfigView(object):
+    """
+    A read-only view of a L{ConfigSpec}, with a partner's section selected;
+    obtained by calling L{ConfigSpec.ForPartner}.
+
+    Values are resolved as the L{ConfigSpec} would resolve them after a call
+    to L{SetPartnerSection<ConfigSpec.SetPartnerSection>} for the partner,
+    but the view never modifies the L{ConfigSpec}, so views for different
+    partners don't interfere with each other, or with the L{ConfigSpec}
+    itself.
+    """
+    __slots__ = ('_config', '_partner', '_section', '_context')
+
+    def __init__(self, config, partner, context):
+        object.__init__(self)
+        self._config = config
+        self._partner = partner
+        self._section = ConfigSpec._GetPartnerSectionName(partner)
+        self._context = context
+
+    def _GetConfig(self): return self._config
+    def _GetPartner(self): return self._partner
+    def _GetSection(self): return self._section
+    def _GetRootDir(self): return self._config.rootDir
+    def _GetConfigFile(self): return self._config.configFile
+    def _GetSectionList(self): return self._config.sectionList
+    def _GetPartners(self): return self._config.partners
+
+    config = property(_GetConfig)
+    """The L{ConfigSpec} this is a view of. Read-only.
+    @type: L{ConfigSpec}"""
+
+    partner = property(_GetPartner)
+    """The name of the partner. Read-only.
+    @type: C{str}"""
+
+    section = property(_GetSection)
+    """The partner's section name. Read-only.
+    @type: C{str}"""
+
+    rootDir = property(_GetRootDir)
+    """See L{ConfigSpec.rootDir}. Read-only.
+    @type: C{str}"""
+
+    configFile = property(_GetConfigFile)
+    """See L{ConfigSpec.configFile}. Read-only.
+    @type: C{str}"""
+
+    sectionList = property(_GetSectionList)
+    """See L{ConfigSpec.sectionList}. Read-only.
+    @type: C{list}"""
+
+    partners = property(_GetPartners)
+    """See L{ConfigSpec.partners}. Read-only.
+    @type: C{tuple} of C{str}"""
+
+    GetConstant = staticmethod(ConfigSpec.GetConstant)
+
+    def GetSectionItems(self, sectionName=None):
+        """
+        See L{ConfigSpec.GetSectionItems}; defaults to the partner's section.
+        """
+        if sectionName is None:
+            sectionName = self.section
+
+        return self._config.GetSectionItems(sectionName)
+
+    def GetSectionElements(self, sectionName=None):
+        """
+        See L{ConfigSpec.GetSectionElements}; defaults to the partner's
+        section. Values are interpolated with the partner's C{PARTNER_}
+        variables.
+        """
+        if sectionName is None:
+            sectionName = self.section
+
+        return self._config._GetSectionElements(sectionName,
+         self._context.partnerVars)
+
+    def ValidDeliverable(self, deliverable):
+        """See L{ConfigSpec.ValidDeliverable}."""
+        return self._config.ValidDeliverable(deliverable)
+
+    def ValidPartner(self, partner):
+        """See L{ConfigSpec.ValidPartner}."""
+        return self._config.ValidPartner(partner)
+
+    def Get(self, name, coercion=None, interpOverrides={}):
+        """
+        Retrieve the value for the given item name in the partner's section.
+
+        @see: L{ConfigSpec.Get()<quickrelease.config.ConfigSpec.Get>}
+        """
+        return self._config._GetCachedValue(self.section, name, coercion,
+         interpOverrides, self._context)
+
+    def SectionGet(self, section, name, coercion=None, interpOverrides={}):
+        """
+        Retrieve the value for the given item name in the specified-section,
+        with C{PARTNER_} variables referring to this view's partner.
+
+        @see: L{ConfigSpec.SectionGet()<quickrelease.config.ConfigSpec.SectionGet>}
+        """
+        section = self._config._CheckSectionName(section)
+        return self._config._GetCachedValue(section, name, coercion,
+         interpOverrides, self._context)
+
+    def PartnerGet(self, partner, name, coercion=None, interpolation={}):
+        """
+        @see: L{ConfigSpec.PartnerGet()<quickrelease.config.ConfigSpec.PartnerGet>}
+        """
+        return self._config.ForPartner(partner).Get(name, coercion,
+         interpolation)
+
+class FrozenConfigSpec(ConfigSpec):
+    """
+    An immutable copy of a L{ConfigSpec}, created by
+    L{ConfigSpec.Freeze}.
+
+    All of the L{ConfigSpec}'s read methods may be called concurrently from
+    several threads. (The only state they modify is caches of values, which
+    are the same no matter which thread computes them.) Changing the current
+    section, including via
+    L{SetPartnerSection<ConfigSpec.SetPartnerSection>}, raises a
+    L{ConfigSpecError}; to change the configuration, modify the original
+    L{ConfigSpec} and freeze it again.
+
+    The underlying L{rawConfig<ConfigSpec.rawConfig>} is a copy private to
+    this object, and must not be modified.
+    """
+    def __init__(self, config):
+        # Everything's copied from the given ConfigSpec, rather than loaded,
+        # so there's no call to ConfigSpec.__init__().
+        object.__init__(self)
+
+        config._EnsureAllSectionsLoaded()
+        sourceParser = config._configSpec
+
+        self._configSpec = ConfigParser.SafeConfigParser()
+        self._configSpec._defaults = self._configSpec._dict(
+         sourceParser._defaults.items())
+        self._configSpec._sections = self._configSpec._dict()
+        for (sectionName, sectionDict) in sourceParser._sections.items():
+            self._configSpec._sections[sectionName] = self._configSpec._dict(
+             sectionDict.items())
+
+        self._configFile = config._configFile
+        self._rootDir = config._rootDir
+        self._currentSection = config._currentSection
+        self._allowOverrides = config._allowOverrides
+        self._clOverrides = dict((section, dict(sectionOverrides)) for
+         (section, sectionOverrides) in config._clOverrides.items())
+        self._optionTypes = dict(config._optionTypes)
+
+        self._valueContext = _ValueContext()
+        self._interpolation = _InterpolationGraph(
+         self._configSpec.optionxform)
+        self._interpolation.AddTemplates(config._interpolation.GetTemplates())
+
+        self._partnerSections = dict(config._partnerSections)
+        self._partnerViews = {}
+
+        self._includeManifest = config._includeManifest
+        self._includeFiles = list(config._includeFiles)
+        if config._sectionNames is None:
+            self._sectionNames = None
+        else:
+            self._sectionNames = list(config._sectionNames)
+        self._pendingSections = {}
+        self._pendingIncludes = {}
+        self._loadLock = None
+
+    def _RaiseFrozenError(self):
+        raise ConfigSpecError("Frozen config specifications can't be "
+         "modified; modify the original ConfigSpec, and call Freeze() again.")
+
+    def _SetSection(self, newSection):
+        if newSection.strip() != self.section:
+            self._RaiseFrozenError()
+
+    def _SetDefaultValue(self, key, value):
+        self._RaiseFrozenError()
+
+    def SetPartnerSection(self, partner):
+        """
+        @raise ConfigSpecError: Always; the section of a frozen config
+        specification can't be changed. Use
+        L{ForPartner<ConfigSpec.ForPartner>} instead.
+        """
+        self._RaiseFrozenError()
+
+    def Freeze(self):
+        """
+        @return: This object; it's already frozen.
+        @rtype:  L{FrozenConfigSpec}
+        """
+        return self
+
+    section = property(ConfigSpec._GetSection, _SetSection)
+    """The current section name. Read-only (setting it to anything but
+    its current value raises a L{ConfigSpecError}).
+    @type: C{str}"""
+
+def _GetCallArg(args, kwargs, index, name):
+    if len(args) > index:
+        return args[index]
+    return kwargs.get(name, '?')
+
+class _ConfigAccessProfiler(object):
+    # Replaces the ConfigSpec (and PartnerConfigView) value and constant
+    # accessors with wrappers which count and time calls to them. Misses of
+    # the value and constant caches, and time spent interpolating values, are
+    # attributed to every profiled call in progress (in the current thread),
+    # since each of them waited on it.
+    _MAX_STEP_SEARCH_DEPTH = 30
+
+    def __init__(self, reportFile):
+        object.__init__(self)
+        self._reportFile = reportFile
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (method, option) -> [calls, seconds, misses, interpolation seconds,
+        # errors]
+        self._accesses = {}
+        # step name -> [calls, seconds]
+        self._steps = {}
+
+    def Install(self):
+        accessors = (
+         (ConfigSpec, 'Get', lambda a, k: "%s:%s" % (a[0].section,
+          _GetCallArg(a, k, 1, 'name'))),
+         (ConfigSpec, 'SectionGet', lambda a, k: "%s:%s" % (
+          _GetCallArg(a, k, 1, 'section'), _GetCallArg(a, k, 2, 'name'))),
+         (ConfigSpec, 'PartnerGet', lambda a, k: "%s:%s" % (
+          ConfigSpec._GetPartnerSectionName(_GetCallArg(a, k, 1, 'partner')),
+          _GetCallArg(a, k, 2, 'name'))),
+         (PartnerConfigView, 'Get', lambda a, k: "%s:%s" % (a[0].section,
+          _GetCallArg(a, k, 1, 'name'))),
+         (PartnerConfigView, 'SectionGet', lambda a, k: "%s:%s" % (
+          _GetCallArg(a, k, 1, 'section'), _GetCallArg(a, k, 2, 'name'))),
+         (PartnerConfigView, 'PartnerGet', lambda a, k: "%s:%s" % (
+          ConfigSpec._GetPartnerSectionName(_GetCallArg(a, k, 1, 'partner')),
+          _GetCallArg(a, k, 2, 'name'))),
+        )
+
+        for (cls, methodName, getOptionName) in accessors:
+            setattr(cls, methodName, self._WrapAccessor("%s.%s" % (
+             cls.__name__, methodName), getattr(cls, methodName).im_func,
+             getOptionName))
+
+        getConstant = staticmethod(self._WrapAccessor('GetConstant',
+         ConfigSpec.GetConstant, lambda a, k: _GetCallArg(a, k, 0, 'name')))
+        ConfigSpec.GetConstant = getConstant
+        PartnerConfigView.GetConstant = getConstant
+
+        ConfigSpec._GetValue = self._WrapMiss(ConfigSpec._GetValue.im_func)
+        ConfigSpec._ResolveConstant = staticmethod(self._WrapMiss(
+         ConfigSpec._ResolveConstant))
+        _InterpolationGraph.Interpolate = self._WrapInterpolation(
+         _InterpolationGraph.Interpolate.im_func)
+
+        atexit.register(self.Report)
+
+    def _GetActiveCalls(self):
+        try:
+            return self._local.activeCalls
+        except AttributeError:
+            self._local.activeCalls = []
+            return self._local.activeCalls
+
+    def _GetCallingStep(self):
+        # Imported here; steps depend on this module.
+        from quickrelease.step import Step
+
+        frame = sys._getframe(3)
+        depth = 0
+        while frame is not None and depth < (
+         _ConfigAccessProfiler._MAX_STEP_SEARCH_DEPTH):
+            caller = frame.f_locals.get('self')
+            if isinstance(caller, Step):
+                return caller.name
+            frame = frame.f_back
+            depth += 1
+
+        return None
+
+    def _WrapAccessor(self, methodName, func, getOptionName):
+        def ProfiledAccessor(*args, **kwargs):
+            activeCalls = self._GetActiveCalls()
+            # [misses, interpolation seconds, failed]
+            call = [0, 0.0, False]
+            activeCalls.append(call)
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            except:
+                call[2] = True
+                raise
+            finally:
+                elapsed = time.time() - start
+                activeCalls.pop()
+                self._RecordAccess(methodName, getOptionName(args, kwargs),
+                 call, elapsed, len(activeCalls) == 0)
+
+        ProfiledAccessor.__name__ = func.__name__
+        ProfiledAccessor.__doc__ = func.__doc__
+        return ProfiledAccessor
+
+    def _WrapMiss(self, func):
+        def ProfiledMiss(*args, **kwargs):
+            for call in self._GetActiveCalls():
+                call[0] += 1
+            return func(*args, **kwargs)
+
+        return ProfiledMiss
+
+    def _WrapInterpolation(self, func):
+        def ProfiledInterpolation(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                for call in self._GetActiveCalls():
+                    call[1] += elapsed
+
+        return ProfiledInterpolation
+
+    def _RecordAccess(self, methodName, optionName, call, elapsed, outermost):
+        # Only outermost calls are attributed to steps, so nested calls
+        # aren't counted twice.
+        if outermost:
+            stepName = self._GetCallingStep()
+
+        self._lock.acquire()
+        try:
+            key = (methodName, optionName)
+            if key not in self._accesses:
+                self._accesses[key] = [0, 0.0, 0, 0.0, 0]
+
+            stats = self._accesses[key]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += call[0]
+            stats[3] += call[1]
+            if call[2]:
+                stats[4] += 1
+
+            if outermost:
+                if stepName not in self._steps:
+                    self._steps[stepName] = [0, 0.0]
+                self._steps[stepName][0] += 1
+                self._steps[stepName][1] += elapsed
+        finally:
+            self._lock.release()
+
+    def Report(self):
+        self._lock.acquire()
+        try:
+            accesses = sorted(self._accesses.items(), key=lambda x: x[1][1],
+             reverse=True)
+            steps = sorted(self._steps.items(), key=lambda x: x[1][1],
+             reverse=True)
+        finally:
+            self._lock.release()
+
+        lines = ["ConfigSpec access profile (process %d):" % (os.getpid()),
+                 "",
+                 "%8s %10s %8s %8s %8s %10s  %s" % ('calls', 'total ms',
+                  'hits', 'misses', 'errors', 'interp ms', 'method/option'),
+                ]
+
+        for ((methodName, optionName), stats) in accesses:
+            # A call is a hit if it succeeded without anything it needed
+            # having to be resolved.
+            lines.append("%8d %10.3f %8d %8d %8d %10.3f  %s %s" % (stats[0],
+             stats[1] * 1000, max(stats[0] - stats[2] - stats[4], 0),
+             stats[2], stats[4], stats[3] * 1000, methodName, optionName))
+
+        lines += ["",
+                  "%8s %10s  %s" % ('calls', 'total ms', 'step'),
+                 ]
+
+        for (stepName, stats) in steps:
+            if stepName is None:
+                stepName = '(not in a step)'
+            lines.append("%8d %10.3f  %s" % (stats[0], stats[1] * 1000,
+             stepName))
+
+        report = '\n'.join(lines) + '\n'
+
+        if self._reportFile == '-':
+            sys.stderr.write(report)
+        else:
+            reportHandle = open(self._reportFile, 'w')
+            try:
+                reportHandle.write(report)
+            finally:
+                reportHandle.close()
+
 # Need to put this down here, because we have a circular import dependency on 
 # this, unfortunately.
 
-from quickrelease.utils import ImportModule
+from quickrelease.utils import ImportModule, Makedirs
+
+if os.getenv(ConfigSpec.PROFILE_CONFIG_ENV_VAR):
+    _ConfigAccessProfiler(os.getenv(
+     ConfigSpec.PROFILE_CONFIG_ENV_VAR)).Install()
 
@@ -177,6 +177,7 @@ def main():
              ConfigSpec.QR_CONSTANTS_DICT_NAME)
             os.environ[ConfigSpec.USER_DEFINED_CONSTANTS_ENV_VAR] = (
              options.userConstants)
+            ConfigSpec.FlushConstantsCache()
         except ConfigSpecError, ex:
             print >> sys.stderr, str(ex)
             o.print_help(file=sys.stderr)
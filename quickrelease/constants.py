@@ -75,18 +75,52 @@ Various constants that can be useful for QuickRelease L{Process<quickrelease.pro
 
 QUICKRELEASE_CONSTANTS['BUILD_PLATFORMS'] = QUICKRELEASE_CONSTANTS['BUILD_PLATFORMS_MAP'].values()
 
+QUICKRELEASE_DEFAULT_CONSTANTS = {
+    # Number of workers QuickRelease uses for operations it runs in parallel;
+    # 0 means one per CPU.
+    'PARALLEL_WORKER_COUNT': 0,
+
+    # Size of the chunks, in bytes, files are read in when computing their
+    # checksums.
+    'HASH_READ_CHUNK_SIZE': 1024 * 1024,
+
+    # Path to a file in which to persist deliverable checksums across runs;
+    # None means checksums are only cached in memory.
+    'DELIVERABLE_CHECKSUM_CACHE': None,
+
+    # Size of the blocks, in bytes, archives are split into to be compressed
+    # in parallel.
+    'ARCHIVE_COMPRESSION_BLOCK_SIZE': 1024 * 1024,
+
+    # Directory in which to keep pre-parsed snapshots of config files, so
+    # they can be loaded more quickly; None disables snapshots.
+    'CONFIG_SNAPSHOT_DIR': None,
+}
+"""
+Constants QuickRelease itself uses, with their default values. These are
+also part of L{QUICKRELEASE_CONSTANTS<quickrelease.constants.QUICKRELEASE_CONSTANTS>};
+the defaults are used if a user-defined constants module doesn't define them.
+"""
+
+QUICKRELEASE_CONSTANTS.update(QUICKRELEASE_DEFAULT_CONSTANTS)
+
 CONSTANTS_FROM_ENV_HANDLERS = {
     'BUILD_PLATFORMS': lambda val: tuple(val.split()),
     'RUN_SHELL_COMMAND_DEFAULT_TIMEOUT': lambda val: int(val),
     'RUN_SHELL_COMMAND_TIMEOUT_FACTOR': lambda val: int(val),
     'RUN_SHELL_COMMAND_IN_MEM_LINES': lambda val: int(val),
     'S3_PUSH_TIMEOUT': lambda val: int(val),
+    'PARALLEL_WORKER_COUNT': lambda val: int(val),
+    'HASH_READ_CHUNK_SIZE': lambda val: int(val),
+    'ARCHIVE_COMPRESSION_BLOCK_SIZE': lambda val: int(val),
     'BUILD_PLATFORM_EXTENSIONS': lambda val: NotImplementedError("Need to turn BUILD_PLATFORM_EXTENSIONS overloads into a dict!"), 
     'S3_MIME_TYPES': lambda val: NotImplementedError("Need to turn S3_MIME_TYPES overloads into a dict!"), 
 }
 """A dictionary of named constants -> handlers to convert an environment 
 variable string into the expected Python type. The type should match
-what the named constant in L{QUICKRELEASE_CONSTANTS<quickrelease.constants.QUICKRELEASE_CONSTANTS>} returns.
+what the named constant in L{QUICKRELEASE_CONSTANTS<quickrelease.constants.QUICKRELEASE_CONSTANTS>} returns. (The handlers for
+L{QUICKRELEASE_DEFAULT_CONSTANTS<quickrelease.constants.QUICKRELEASE_DEFAULT_CONSTANTS>} are used if a user-defined constants module
+doesn't define its own.)
 """
 
 
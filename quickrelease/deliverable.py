@@ -14,7 +14,7 @@ about the deliverable. Deliverables may also be filtered by attribute.
 
 There are three types of attributes which may be defined and used to filter:
 
-  1. B{Callback attributes}: this callback function is called with the L{Deliverable<quickrelease.deliverable.Deliverable>} object to match against; if the function returns the string being filtered for, the deliverable is considered to match.
+  1. B{Callback attributes}: this callback function is called with the L{Deliverable<quickrelease.deliverable.Deliverable>} object to match against; if the function returns the string being filtered for, the deliverable is considered to match. Callbacks are only called from several threads at once if explicitly requested (see L{PrecomputeAttributes<quickrelease.deliverable.PrecomputeAttributes>}).
   2. B{Regular expression attributes}: the file name is evaluated against the given regular expression; usually, this regular expression contains a (singular) backreference that is used to match against.
   3. B{Value attributes}: these are static values that are simply matched against verbatim.
 
@@ -172,16 +172,35 @@ The constructor for your subclassed object will be called, in order, with the fo
 
 """
 
-import copy
+from array import array
+import atexit
+import cPickle
+import fnmatch
+import operator
 import os
 import re
+from threading import Lock, local
+import types
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from quickrelease.config import ConfigSpecError, ConfigSpec, ConfSpecErrorIsMissingError
-from quickrelease.utils import ImportModule, ImportFunction, JoinPaths
+from quickrelease.exception import ReleaseFrameworkError
+from quickrelease.utils import GetFileHashes, ImportModule, ImportFunction, JoinPaths, ParallelMap, ParseChecksumManifest, ReadMemo
 
 class Deliverable(object):
     """
     Represents a single deliverable on the file system.
+
+    The deliverable's definition is parsed from the config file once per
+    deliverable class and shared by all deliverables of that class; each
+    C{Deliverable} only holds its path, its class name, and a reference to
+    that shared definition. (Its other state is kept in C{__slots__}; 
+    subclasses may still set their own instance attributes.)
     """
     DELIVERABLE_CONFIG_PREFIX = (ConfigSpec.DELIV_SECTION_PREFIX +
      ConfigSpec.CONFIG_SECTION_DELIMETER)
@@ -191,11 +210,16 @@ class Deliverable(object):
 
     _gDeliverablesCache = {}
     _gAttributeCallbackCache = {}
+    _gClassDescriptorCache = weakref.WeakKeyDictionary()
 
     ATTRIB_TYPE_CALLBACK = 0
     ATTRIB_TYPE_REGEX = 1
     ATTRIB_TYPE_VALUE = 2
 
+    # __dict__ is only allocated if a subclass sets other attributes.
+    __slots__ = ('_file', '_deliverableClass', '_descriptor', '_stat',
+     '_attributeCache', '__dict__')
+
     def __init__(self, deliverableFile, deliverableClass, config, *args,
      **kwargs):
         """
@@ -212,7 +236,7 @@ class Deliverable(object):
 
         @raise ValueError: A ValueError is raised when:
           1. The provided C{deliverableFile} isn't a full path.
-          2. The provided C{deliverableFile} doesn't exist.
+          2. The provided C{deliverableFile} doesn't exist (unless the deliverable is being created by L{FindDeliverablesFromListing}, in which case it may not exist locally).
           3. The provided C{deliverableClass} is not a valid deliverable defined in the config file passed.
         @raise ConfigSpecError: A ConfigSpecError is raised when:
           1. The deliverable definition does not include a C{name} or C{regex} item.
@@ -221,114 +245,45 @@ class Deliverable(object):
         """
         object.__init__(self, *args, **kwargs)
 
+        verifyFile = not getattr(_gUnverifiedConstruction, 'active', False)
+
         if not os.path.isabs(deliverableFile):
             raise ValueError("Must provide absolute path to Deliverable "
              "constructor")
-        elif not os.path.isfile(deliverableFile):
+        elif verifyFile and not os.path.isfile(deliverableFile):
             raise ValueError("Non-existent file passed to Deliverable "
              "constructor")
-        elif not IsValidDeliverableClass(config, deliverableClass):
+        elif (deliverableClass not in Deliverable._gClassDescriptorCache.get(
+         config, ()) and not IsValidDeliverableClass(config, deliverableClass)):
             raise ValueError("Non-existent deliverable class passed to "
              "Deliverable constructor: %s" % deliverableClass)
 
-        self._configSection = DeliverableSectionNameFromClass(deliverableClass)
-        self._deliverableClass = deliverableClass
-        self._queriedDeliverableClass = None
         self._file = deliverableFile
-        self._regex = None
-        self._name = None
-        self._filterAttributes = None
-        self._attributes = []
-        self._attributeHandlers = {}
-
-        deliverableSectionItems = config.GetSectionItems(self._configSection)
-
-        if 'name' in deliverableSectionItems:
-            self._name = config.SectionGet(self._configSection, 'name').strip()
-
-        if 'regex' in deliverableSectionItems:
-            self._regex = config.SectionGet(self._configSection,
-             'regex').strip()
-
-        if self.regex is None and self.name is None:
-            raise ConfigSpecError(self.ERROR_STR_NEED_NAME_OR_REGEX %
-             (self._deliverableClass))
-
-        if 'attributes' in deliverableSectionItems:
-            self._attributes = config.SectionGet(self._configSection,
-             'attributes', list)
-
-        for attr in self._attributes:
-            attributeValue = None
-            attributeType = None
-
-            if ('attrib_%s_handler' % (attr)) in deliverableSectionItems:
-                attributeType = Deliverable.ATTRIB_TYPE_CALLBACK
-                attributeValue = config.SectionGet(self._configSection,
-                 'attrib_%s_handler' % (attr))
-            elif ('attrib_%s_regex' % (attr)) in deliverableSectionItems:
-                attributeType = Deliverable.ATTRIB_TYPE_REGEX
-                attributeValue = config.SectionGet(self._configSection,
-                 'attrib_%s_regex' % (attr))
-            elif ('attrib_%s_value' % (attr)) in deliverableSectionItems:
-                attributeType = Deliverable.ATTRIB_TYPE_VALUE
-                attributeValue = config.SectionGet(self._configSection,
-                 'attrib_%s_value' % (attr))
-            else:
-                raise ConfigSpecError("Deliverable class '%s' defines "
-                 "attribute '%s', but doesn't define handler for it." %
-                 (deliverableClass, attr))
-
-            attributeHandlerDescriptor = {}
-            attributeHandlerDescriptor['type'] = attributeType
-
-            if attributeType == Deliverable.ATTRIB_TYPE_CALLBACK:
-                if Deliverable._gAttributeCallbackCache.has_key(attributeValue):
-                    attributeHandlerDescriptor['handler'] = (
-                     Deliverable._gAttributeCallbackCache[attributeValue])
-                else:
-                    try:
-                        handlerFunction = ImportFunction(attributeValue)
-                        attributeHandlerDescriptor['handler'] = handlerFunction
-                        Deliverable._gAttributeCallbackCache[attributeValue] = (
-                         handlerFunction)
-                    except NameError, ex:
-                        raise ConfigSpecError("Deliverable class '%s' defines "
-                         "an attribute callback handler for attribute '%s', "
-                         "but the callback is undefined: %s" % (
-                         self._deliverableClass, attr, str(ex)))
-
-            elif (attributeType == Deliverable.ATTRIB_TYPE_REGEX or
-             attributeType == Deliverable.ATTRIB_TYPE_VALUE):
-                attributeHandlerDescriptor['handler'] = attributeValue
-
-                # Hacky
-                if attributeType == Deliverable.ATTRIB_TYPE_REGEX:
-                    regexFlags = 0
-                    try:
-                        regexFlagsStr = config.SectionGet(self._configSection,
-                         'regexflags').strip()
-                        regexFlags = eval(regexFlagsStr) 
-                    except ConfigSpecError, ex:
-                        if not ConfSpecErrorIsMissingError(ex.details):
-                            raise ex
-
-                    attributeHandlerDescriptor['regexFlags'] = regexFlags
-            else:
-                assert False, "Unknown attribute handler type: %s" % (
-                 attributeType)
-
-            self._attributeHandlers[attr] = attributeHandlerDescriptor
-
-        if 'filter_attributes' in deliverableSectionItems:
-            self._filterAttributes = config.SectionGet(self._configSection,
-             'filter_attributes', list)
-
-        if self.filterAttributes is not None:
-            for fa in self.filterAttributes:
-                if fa not in self.attributes:
-                    raise ConfigSpecError("Deliverable class '%s' defines "
-                     "invalid filter attribute '%s'" % (deliverableClass, fa))
+        self._deliverableClass = deliverableClass
+        self._descriptor = _GetDeliverableClassDescriptor(config,
+         deliverableClass)
+        self._stat = None
+        self._attributeCache = None
+
+    # Objects with __slots__ can only be pickled with protocols below 2 if
+    # they provide their state themselves.
+    def __getstate__(self):
+        state = {}
+        for klass in type(self).__mro__:
+            slots = klass.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = (slots,)
+            for slot in slots:
+                if (slot not in ('__dict__', '__weakref__') and
+                 hasattr(self, slot)):
+                    state[slot] = getattr(self, slot)
+
+        state.update(getattr(self, '__dict__', {}))
+        return state
+
+    def __setstate__(self, state):
+        for (name, value) in state.items():
+            object.__setattr__(self, name, value)
 
     def __rep__(self):
         return "<class %s: %s (%s)>" % (self.__class__, self.name,
@@ -339,18 +294,13 @@ class Deliverable(object):
         return self.fileName
 
     def _GetClass(self): return self._deliverableClass
-    def _GetQueriedName(self): return self._queriedDeliverableClass
+    def _GetQueriedName(self): return None
     def _GetFileName(self): return self._file
     def _GetBasename(self): return os.path.basename(self.fileName)
     def _GetDirname(self): return os.path.dirname(self.fileName)
-    def _GetRegex(self): return self._regex
-    def _GetAttributes(self): return tuple(self._attributes)
-
-    def _GetFilterAttributes(self):
-        if self._filterAttributes is None:
-            return None
-        else:
-            return tuple(self._filterAttributes)
+    def _GetRegex(self): return self._descriptor.regex
+    def _GetAttributes(self): return self._descriptor.attributes
+    def _GetFilterAttributes(self): return self._descriptor.filterAttributes
 
     name = property(_GetClass)
     """The name of the deliverable class. Read-only.
@@ -388,6 +338,96 @@ class Deliverable(object):
     """A list of attributes which may be used to filter deliverables of this type. Read-only.
     @type: C{list}"""
 
+    def _GetStat(self, refresh=False):
+        if refresh or self._stat is None:
+            self._stat = os.stat(self._file)
+        return self._stat
+
+    # Callback attribute results are cached against the file's size and
+    # modification time; None means the file can't be stat()ed, and
+    # results shouldn't be cached.
+    def _GetStatKey(self):
+        try:
+            fileStat = self._GetStat(refresh=True)
+        except OSError:
+            return None
+
+        return (fileStat.st_size, fileStat.st_mtime)
+
+    def _IsAttributeCached(self, attribute, statKey):
+        return (statKey is not None and self._attributeCache is not None and
+         attribute in self._attributeCache and
+         self._attributeCache[attribute][0] == statKey)
+
+    def _CacheAttribute(self, attribute, statKey, value):
+        if statKey is None:
+            return
+
+        if self._attributeCache is None:
+            self._attributeCache = {}
+
+        self._attributeCache[attribute] = (statKey, value)
+
+    def _CallAttributeCallback(self, attribute):
+        return self._descriptor.attributeHandlers[attribute][1](self)
+
+    def _GetSize(self): return self._GetStat().st_size
+    def _GetMtime(self): return self._GetStat().st_mtime
+
+    size = property(_GetSize)
+    """The size of the deliverable file, in bytes. The file is stat()ed the
+    first time this (or C{mtime}) is requested; calls to L{GetDigest} update
+    it. Read-only.
+    @type: C{int}"""
+
+    mtime = property(_GetMtime)
+    """The modification time of the deliverable file. See C{size}.
+    Read-only.
+    @type: C{float}"""
+
+    def GetDigest(self, algorithm='sha1'):
+        """
+        Get a checksum of the deliverable file.
+
+        Checksums are cached in memory and, if the C{DELIVERABLE_CHECKSUM_CACHE}
+        constant names a file, across runs. The cache is keyed by the file's
+        path, inode, size and modification time, so once a file has been
+        hashed, getting its checksum again only costs a stat() call, unless
+        the file changes.
+
+        @param algorithm: The name of the checksum algorithm, as understood by
+        C{hashlib.new()}, e.g. C{'md5'}, C{'sha1'}, C{'sha512'}.
+        @type algorithm: C{str}
+
+        @return: The hex digest of the deliverable file.
+        @rtype: C{str}
+
+        @raise ValueError: If the algorithm is unknown.
+        @raise OSError: If the deliverable file can't be stat()ed.
+
+        @see: L{PrecomputeDigests}, to compute checksums of many
+        deliverables in parallel.
+        """
+        return self._GetDigests((algorithm,))[algorithm]
+
+    def _GetDigests(self, algorithms):
+        fileStat = self._GetStat(refresh=True)
+        digests = _gChecksumCache.Get(self._file, fileStat, algorithms)
+
+        missingAlgorithms = list(a for a in algorithms if a not in digests)
+        if len(missingAlgorithms) != 0:
+            newDigests = GetFileHashes(self._file, missingAlgorithms)
+
+            # Don't cache checksums of files which changed while we were
+            # hashing them.
+            if (_ChecksumCache.GetStatKey(fileStat) ==
+             _ChecksumCache.GetStatKey(self._GetStat(refresh=True))):
+                _gChecksumCache.Update(self._file, fileStat, newDigests)
+
+            digests.update(newDigests)
+
+        return digests
+
     def GetAttribute(self, attribute):
         """
         Get the named attribute from the deliverable.
@@ -396,6 +436,10 @@ class Deliverable(object):
         a regular expression, calling a callback function, or merely fetching
         a local, static attribute (a string).
 
+        The results of callback functions are cached; the callback is only
+        called again if the deliverable file's size or modification time
+        changes.
+
         @param attribute: The name of the deliverable's attribute to get.
         @type attribute: C{str}
 
@@ -405,17 +449,16 @@ class Deliverable(object):
         @raise ValueError: When an attribute is requested which the deliverable does not define.
         """
 
-        if attribute not in self.attributes:
+        try:
+            (handlerType, handler) = self._descriptor.attributeHandlers[
+             attribute]
+        except KeyError:
             raise ValueError("Deliverable class '%s' has no attribute '%s" % (self.name, attribute))
-
-        handlerType = self._attributeHandlers[attribute]['type']
   
         if handlerType == Deliverable.ATTRIB_TYPE_VALUE:
-            return self._attributeHandlers[attribute]['handler']
+            return handler
         elif handlerType == Deliverable.ATTRIB_TYPE_REGEX:
-            attribMatch = re.search(
-             self._attributeHandlers[attribute]['handler'], self.basename,
-             self._attributeHandlers[attribute]['regexFlags'])
+            attribMatch = handler.search(self.basename)
 
             if attribMatch is None:
                 return None
@@ -424,14 +467,586 @@ class Deliverable(object):
             else:
                 return attribMatch.groups()
         elif handlerType == Deliverable.ATTRIB_TYPE_CALLBACK:
-            return self._attributeHandlers[attribute]['handler'](self)
+            statKey = self._GetStatKey()
+            if self._IsAttributeCached(attribute, statKey):
+                return self._attributeCache[attribute][1]
+
+            value = handler(self)
+            self._CacheAttribute(attribute, statKey, value)
+            return value
         else:
             assert False, "Unknown attribute handler type: %s" % (handlerType)
 
+class _DeliverableMatchRule(object):
+    """
+    The parts of a deliverable class definition, i.e. a
+    C{[deliverable:name]} section, needed to decide which files belong to the
+    class: its name or (compiled) regular expression, and its subdirectory.
+    """
+    def __init__(self, deliverableClass, config):
+        self.deliverableClass = deliverableClass
+        self.configSection = DeliverableSectionNameFromClass(deliverableClass)
+        self.name = None
+        self.regex = None
+        self.regexFlags = 0
+        self.matchType = None
+        self.subdir = None
+        self._compiledRegex = None
+        self._config = config
+        self._descriptor = None
+
+        section = self.configSection
+        sectionItems = config.GetSectionItems(section)
+
+        if 'name' in sectionItems:
+            self.name = config.SectionGet(section, 'name').strip()
+
+        if 'regex' in sectionItems:
+            self.regex = config.SectionGet(section, 'regex').strip()
+
+        if self.name is not None:
+            self.matchType = 'name'
+        elif self.regex is not None:
+            self.matchType = 'regex'
+        else:
+            raise ConfigSpecError(Deliverable.ERROR_STR_NEED_NAME_OR_REGEX %
+             (deliverableClass))
+
+        if 'regexflags' in sectionItems:
+            self.regexFlags = eval(config.SectionGet(section,
+             'regexflags').strip())
+
+        if self.regex is not None:
+            self._compiledRegex = re.compile(self.regex, self.regexFlags)
+
+        if 'subdir' in sectionItems:
+            subdir = os.path.normpath(config.SectionGet(section,
+             'subdir').strip()).strip(os.sep)
+            if subdir != os.curdir:
+                self.subdir = subdir
+
+    def Matches(self, fileName):
+        if self.matchType == 'name':
+            return fileName == self.name
+        else:
+            return self._compiledRegex.search(fileName) is not None
+
+    def GetDescriptor(self):
+        """
+        Return the full L{_DeliverableClassDescriptor} for the class. It is
+        only created (resolving the class's attribute callbacks and subclass)
+        when first requested, i.e. once a file matches the class.
+        """
+        if self._descriptor is None:
+            self._descriptor = _GetDeliverableClassDescriptor(self._config,
+             self.deliverableClass)
+
+        return self._descriptor
+
+class _DeliverableClassDescriptor(_DeliverableMatchRule):
+    """
+    The parsed definition of a single deliverable class, i.e. a 
+    C{[deliverable:name]} section, with its regular expressions compiled and
+    its attribute callbacks and subclass resolved.
+
+    One descriptor exists per deliverable class and L{ConfigSpec}; it is shared
+    by all L{Deliverable}s of that class.
+    """
+    def __init__(self, deliverableClass, config):
+        _DeliverableMatchRule.__init__(self, deliverableClass, config)
+        self.attributes = ()
+        self.attributeHandlers = {}
+        self.filterAttributes = None
+        self.factory = Deliverable
+        # Descriptors are pickled along with deliverables, so don't keep a
+        # reference to the config.
+        self._config = None
+        self._descriptor = self
+
+        section = self.configSection
+        sectionItems = config.GetSectionItems(section)
+
+        if 'attributes' in sectionItems:
+            self.attributes = tuple(config.SectionGet(section, 'attributes',
+             list))
+
+        for attr in self.attributes:
+            if ('attrib_%s_handler' % (attr)) in sectionItems:
+                callbackName = config.SectionGet(section,
+                 'attrib_%s_handler' % (attr))
+                self.attributeHandlers[attr] = (Deliverable.ATTRIB_TYPE_CALLBACK,
+                 self._ResolveCallback(attr, callbackName))
+            elif ('attrib_%s_regex' % (attr)) in sectionItems:
+                self.attributeHandlers[attr] = (Deliverable.ATTRIB_TYPE_REGEX,
+                 re.compile(config.SectionGet(section,
+                 'attrib_%s_regex' % (attr)), self.regexFlags))
+            elif ('attrib_%s_value' % (attr)) in sectionItems:
+                self.attributeHandlers[attr] = (Deliverable.ATTRIB_TYPE_VALUE,
+                 config.SectionGet(section, 'attrib_%s_value' % (attr)))
+            else:
+                raise ConfigSpecError("Deliverable class '%s' defines "
+                 "attribute '%s', but doesn't define handler for it." %
+                 (deliverableClass, attr))
+
+        if 'filter_attributes' in sectionItems:
+            self.filterAttributes = tuple(config.SectionGet(section,
+             'filter_attributes', list))
+
+            for fa in self.filterAttributes:
+                if fa not in self.attributes:
+                    raise ConfigSpecError("Deliverable class '%s' defines "
+                     "invalid filter attribute '%s'" % (deliverableClass, fa))
+
+        if 'subclass' in sectionItems:
+            try:
+                self.factory = ImportFunction(config.SectionGet(section,
+                 'subclass').strip())
+            except NameError, ex:
+                raise ConfigSpecError("subclass error %s" % (ex)) 
+
+    def _ResolveCallback(self, attr, callbackName):
+        try:
+            return Deliverable._gAttributeCallbackCache[callbackName]
+        except KeyError:
+            pass
+
+        try:
+            handlerFunction = ImportFunction(callbackName)
+        except NameError, ex:
+            raise ConfigSpecError("Deliverable class '%s' defines "
+             "an attribute callback handler for attribute '%s', "
+             "but the callback is undefined: %s" % (
+             self.deliverableClass, attr, str(ex)))
+
+        Deliverable._gAttributeCallbackCache[callbackName] = handlerFunction
+        return handlerFunction
+
+    def __deepcopy__(self, memo):
+        # Descriptors are shared by design (and compiled regular expressions
+        # can't be deep-copied anyway).
+        return self
+
+def _GetDeliverableClassDescriptor(config, deliverableClass):
+    try:
+        return Deliverable._gClassDescriptorCache[config][deliverableClass]
+    except KeyError:
+        pass
+
+    descriptor = _DeliverableClassDescriptor(deliverableClass, config)
+
+    if config not in Deliverable._gClassDescriptorCache:
+        Deliverable._gClassDescriptorCache[config] = {}
+
+    Deliverable._gClassDescriptorCache[config][deliverableClass] = descriptor
+    return descriptor
+
+class _QueriedDeliverable(object):
+    """
+    A lightweight, read-only view of a cached L{Deliverable}, returned by
+    L{GetDeliverables}.
+
+    The view shares the underlying deliverable object (instead of copying it)
+    and carries the deliverable class name, including any filter attributes,
+    that was used to query for it. All other attribute access is passed
+    through to the underlying deliverable, so views behave like the
+    L{Deliverable} (or subclass) they represent. Methods and properties of
+    the deliverable's class are called with the view as C{self} (so
+    C{queriedName} is set within them, and for attribute callbacks); the
+    private state they store (e.g. cached values) is stored on the
+    underlying deliverable.
+    """
+    __slots__ = ('_deliverable', '_queriedDeliverableClass')
+
+    # (deliverable type, attribute name) -> the class attribute (a method or
+    # property) to call with the view as self, or None
+    _gBoundAttributeCache = {}
+
+    def __init__(self, deliverable, queriedDeliverableClass):
+        object.__setattr__(self, '_deliverable', deliverable)
+        object.__setattr__(self, '_queriedDeliverableClass',
+         queriedDeliverableClass)
+
+    @staticmethod
+    def _GetBoundClassAttribute(delivType, name):
+        cacheKey = (delivType, name)
+        try:
+            return _QueriedDeliverable._gBoundAttributeCache[cacheKey]
+        except KeyError:
+            pass
+
+        classAttr = None
+        for klass in delivType.__mro__:
+            if name in klass.__dict__:
+                if isinstance(klass.__dict__[name], (property,
+                 types.FunctionType)):
+                    classAttr = klass.__dict__[name]
+                break
+
+        _QueriedDeliverable._gBoundAttributeCache[cacheKey] = classAttr
+        return classAttr
+
+    def __getattr__(self, name):
+        deliverable = self._deliverable
+        delivType = type(deliverable)
+        classAttr = _QueriedDeliverable._GetBoundClassAttribute(delivType,
+         name)
+
+        if isinstance(classAttr, property):
+            return classAttr.__get__(self, delivType)
+        elif (classAttr is not None and
+         name not in getattr(deliverable, '__dict__', ())):
+            return types.MethodType(classAttr, self, delivType)
+
+        return getattr(deliverable, name)
+
+    def __setattr__(self, name, value):
+        # Only the deliverable's own methods (called with the view as self)
+        # set private attributes.
+        if name.startswith('_'):
+            setattr(self._deliverable, name, value)
+        else:
+            raise AttributeError("Queried deliverable objects are read-only.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Queried deliverable objects are read-only.")
+
+    def __reduce__(self):
+        return (_QueriedDeliverable, (self._deliverable,
+         self._queriedDeliverableClass))
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
+    def __str__(self):
+        return str(self._deliverable)
+
+    def __repr__(self):
+        return repr(self._deliverable)
+
+    def _GetDeliverableType(self): return type(self._deliverable)
+    def _GetQueriedName(self): return self._queriedDeliverableClass
+
+    # So isinstance() checks against Deliverable (and subclasses) still work.
+    __class__ = property(_GetDeliverableType)
+
+    queriedName = property(_GetQueriedName)
+
+class _EncodedColumn(object):
+    """
+    A column of (usually string) values, stored as an array of integer codes
+    into a list of the column's distinct values.
+    """
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, rawValues):
+        self.values = []
+        self.codes = array('l')
+        valueCodes = {}
+
+        for v in rawValues:
+            try:
+                code = valueCodes[v]
+            except KeyError:
+                code = valueCodes[v] = len(self.values)
+                self.values.append(v)
+            except TypeError:
+                # Unhashable values (possible with callback attributes) just
+                # aren't shared.
+                code = len(self.values)
+                self.values.append(v)
+
+            self.codes.append(code)
+
+    def __getitem__(self, ndx):
+        return self.values[self.codes[ndx]]
+
+class DeliverableTable(object):
+    """
+    A column-oriented view of a set of L{Deliverable}s, useful for reporting
+    on and selecting from large sets of deliverables.
+
+    Each deliverable is a row; the columns are:
+      1. C{fileName}: the full path to the deliverable
+      2. C{name}: the deliverable's class name
+      3. C{size}: the size of the deliverable file, in bytes
+      4. C{mtime}: the modification time of the deliverable file
+      5. One column per deliverable attribute; deliverables whose class
+      doesn't define the attribute have a value of C{None}.
+
+    String-valued columns are stored as arrays of codes into the column's
+    distinct values, so predicates are evaluated once per distinct value, not
+    once per deliverable; C{size} and C{mtime} are stored as arrays of
+    C{float}s. (Sizes are exact up to 2**53 bytes.)
+
+    Selecting rows (via L{Where} or L{Select}) returns a new table sharing
+    the same column storage, so selections can be chained cheaply::
+
+        bigInstallers = (GetDeliverableTable()
+         .Select(name='installer:linux', locale=('de', 'fr'))
+         .Where('size', '>', 10 * 1024 * 1024))
+
+        for d in bigInstallers.deliverables:
+            print d.fileName
+
+    If U{NumPy<http://www.numpy.org>} is available, numeric predicates are
+    evaluated with it, and the table can be exported with L{ToNumPy}; if
+    U{pandas<http://pandas.pydata.org>} is available, it can be exported as a
+    C{DataFrame} with L{ToDataFrame}.
+    """
+    STANDARD_COLUMNS = ('fileName', 'name', 'size', 'mtime')
+    NUMERIC_COLUMNS = ('size', 'mtime')
+
+    OPERATORS = { '==': operator.eq,
+                  '!=': operator.ne,
+                  '<': operator.lt,
+                  '<=': operator.le,
+                  '>': operator.gt,
+                  '>=': operator.ge,
+                  'in': lambda value, container: value in container,
+                  'not in': lambda value, container: value not in container,
+                }
+    """The operators supported by L{Where}."""
+
+    def __init__(self, deliverables, attributes=None):
+        """
+        Construct a table from the given deliverables.
+
+        @param deliverables: The deliverables to include in the table.
+        @type deliverables: iterable of L{Deliverable}s
+
+        @param attributes: The names of attributes to create columns for.
+        Default: all attributes defined by any of the given deliverables.
+        @type attributes: C{list} of C{str} or C{None}
+
+        @raise ValueError: If an attribute name conflicts with one of the
+        L{STANDARD_COLUMNS}.
+        """
+        object.__init__(self)
+
+        self._deliverables = tuple(deliverables)
+
+        if attributes is None:
+            attributes = []
+            for d in self._deliverables:
+                for attr in d.attributes:
+                    if attr not in attributes:
+                        attributes.append(attr)
+
+        for attr in attributes:
+            if attr in DeliverableTable.STANDARD_COLUMNS:
+                raise ValueError("Deliverable attribute '%s' conflicts with a "
+                 "standard DeliverableTable column" % (attr))
+
+        sizes = array('d')
+        mtimes = array('d')
+        for d in self._deliverables:
+            try:
+                fileStat = d._GetStat()
+                sizes.append(fileStat.st_size)
+                mtimes.append(fileStat.st_mtime)
+            except OSError:
+                sizes.append(float('nan'))
+                mtimes.append(float('nan'))
+
+        self._columns = { 'fileName': list(d.fileName for d in
+                                           self._deliverables),
+                          'name': _EncodedColumn(d.name for d in
+                                                 self._deliverables),
+                          'size': sizes,
+                          'mtime': mtimes,
+                        }
+
+        for attr in attributes:
+            self._columns[attr] = _EncodedColumn(d.GetAttribute(attr) if
+             attr in d.attributes else None for d in self._deliverables)
+
+        self._columnNames = DeliverableTable.STANDARD_COLUMNS + tuple(
+         attributes)
+        self._rows = array('l', xrange(len(self._deliverables)))
+
+    def __len__(self):
+        return len(self._rows)
+
+    # Tables returned by selections share the column storage of the table
+    # they were selected from.
+    def _Subset(self, rows):
+        subset = object.__new__(DeliverableTable)
+        subset._deliverables = self._deliverables
+        subset._columns = self._columns
+        subset._columnNames = self._columnNames
+        subset._rows = rows
+        return subset
+
+    def _GetColumnNames(self): return self._columnNames
+
+    def _GetDeliverables(self):
+        return tuple(self._deliverables[r] for r in self._rows)
+
+    columns = property(_GetColumnNames)
+    """The names of the table's columns. Read-only.
+    @type: C{tuple} of C{str}"""
+
+    deliverables = property(_GetDeliverables)
+    """The deliverables in the table, in row order. Read-only.
+    @type: C{tuple} of L{Deliverable}s"""
+
+    def _GetColumnStorage(self, column):
+        try:
+            return self._columns[column]
+        except KeyError:
+            raise ValueError("Unknown DeliverableTable column: %s" % (column))
+
+    def Column(self, column):
+        """
+        Get the values of a column.
+
+        @param column: The name of the column.
+        @type column: C{str}
+
+        @return: The column's values, in row order.
+        @rtype: C{list}
+
+        @raise ValueError: If the column doesn't exist.
+        """
+        storage = self._GetColumnStorage(column)
+        return list(storage[r] for r in self._rows)
+
+    def Where(self, column, op, value=None):
+        """
+        Select the rows of the table where the given column's value
+        satisfies a predicate.
+
+        @param column: The name of the column to evaluate the predicate on.
+        @type column: C{str}
+
+        @param op: Either one of the L{OPERATORS} (e.g. C{'>='} or C{'in'}),
+        which is evaluated as C{columnValue op value}, or a function which
+        will be called with the column value, and returns whether the row
+        should be selected.
+        @type op: C{str} or C{function}
+
+        @param value: The value to compare column values against; unused if
+        C{op} is a function.
+
+        @return: A new table containing the selected rows.
+        @rtype: L{DeliverableTable}
+
+        @raise ValueError: If the column or operator don't exist.
+        """
+        storage = self._GetColumnStorage(column)
+
+        if callable(op):
+            predicate = op
+        else:
+            try:
+                opFunction = DeliverableTable.OPERATORS[op]
+            except KeyError:
+                raise ValueError("Unknown DeliverableTable operator: %s" % (op))
+            predicate = lambda columnValue: opFunction(columnValue, value)
+
+        if type(storage) is _EncodedColumn:
+            matchingCodes = set(code for (code, v) in enumerate(storage.values)
+             if predicate(v))
+            codes = storage.codes
+            rows = array('l', (r for r in self._rows if codes[r] in
+             matchingCodes))
+        elif (column in DeliverableTable.NUMERIC_COLUMNS and numpy is not None
+         and not callable(op) and op in ('==', '!=', '<', '<=', '>', '>=')
+         and len(self._rows) != 0):
+            rowArray = numpy.frombuffer(self._rows, dtype='l')
+            columnArray = numpy.frombuffer(storage, dtype=numpy.float64)
+            selected = rowArray[opFunction(columnArray[rowArray], value)]
+            rows = array('l')
+            rows.fromstring(selected.tostring())
+        else:
+            rows = array('l', (r for r in self._rows if predicate(storage[r])))
+
+        return self._Subset(rows)
+
+    def Select(self, **criteria):
+        """
+        Select the rows of the table matching all the given criteria.
+
+        Each keyword argument names a column; its value is either a function
+        (see L{Where}), a C{list}, C{tuple}, C{set} or C{frozenset} of values
+        the column value must be in, or a value the column value must equal.
+
+        @return: A new table containing the selected rows.
+        @rtype: L{DeliverableTable}
+
+        @raise ValueError: If a column doesn't exist.
+        """
+        table = self
+        for (column, criterion) in criteria.items():
+            if callable(criterion):
+                table = table.Where(column, criterion)
+            elif type(criterion) in (list, tuple, set, frozenset):
+                table = table.Where(column, 'in', frozenset(criterion))
+            else:
+                table = table.Where(column, '==', criterion)
+
+        return table
+
+    def ToNumPy(self):
+        """
+        Export the table as NumPy arrays.
+
+        @return: A dictionary of column names to arrays; C{size} and C{mtime}
+        are arrays of C{float64}s; all other columns are arrays of objects.
+        @rtype: C{dict}
+
+        @raise ReleaseFrameworkError: If NumPy is not available.
+        """
+        if numpy is None:
+            raise ReleaseFrameworkError("DeliverableTable.ToNumPy() requires "
+             "NumPy, which is not installed.")
+
+        rowArray = numpy.array(self._rows, dtype='l')
+        exported = {}
+
+        for column in self._columnNames:
+            storage = self._columns[column]
+            if type(storage) is _EncodedColumn:
+                values = numpy.empty(len(storage.values), dtype=object)
+                values[:] = storage.values
+                codes = numpy.array(storage.codes, dtype='l')
+                exported[column] = values[codes[rowArray]]
+            elif column in DeliverableTable.NUMERIC_COLUMNS:
+                exported[column] = numpy.array(storage,
+                 dtype=numpy.float64)[rowArray]
+            else:
+                values = numpy.empty(len(storage), dtype=object)
+                values[:] = storage
+                exported[column] = values[rowArray]
+
+        return exported
+
+    def ToDataFrame(self):
+        """
+        Export the table as a pandas C{DataFrame}.
+
+        @return: The table's columns, as a C{DataFrame}.
+        @rtype: C{pandas.DataFrame}
+
+        @raise ReleaseFrameworkError: If pandas (or NumPy) is not available.
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ReleaseFrameworkError("DeliverableTable.ToDataFrame() "
+             "requires pandas, which is not installed.")
+
+        return pandas.DataFrame(self.ToNumPy(), columns=self._columnNames)
+
 def FindDeliverables(deliverableDir, config):
     """
     Prime the L{Deliverable<quickrelease.deliverable.Deliverable>} cache by recursively traversing the given directory and searching for all deliverables defined in the given L{ConfigSpec<quickrelease.config.ConfigSpec>} file.
 
+    The traversal can be restricted with the following items:
+      1. C{deliverable_scan_exclude} (in the C{[quickrelease]} section): a whitespace-separated list of glob patterns; files and directories whose name or path (relative to C{deliverableDir}) match one are skipped, e.g. C{.git .svn objdir*}.
+      2. C{deliverable_scan_max_depth} (in the C{[quickrelease]} section): the number of directory levels below C{deliverableDir} to descend into; C{0} only searches C{deliverableDir} itself.
+      3. C{subdir} (in a deliverable section): the directory, relative to C{deliverableDir}, this class of deliverables lives in; the class is only matched against files in that directory's subtree. If every deliverable section defines one, directories outside of those subtrees are not traversed at all.
+
     @param deliverableDir: A directory to recursively search through for deliverables.
     @type deliverableDir: C{str}
 
@@ -456,104 +1071,237 @@ def FindDeliverables(deliverableDir, config):
         return None
 
     deliverables = []
-    deliverableSections = GetDeliverableSections(config)
-
-    ignoreUndefinedDeliverables = True 
-    try:
-        ignoreUndefinedDeliverables = config.SectionGet('quickrelease',
-         'ignore_undefined_deliverables', bool)
-    except ConfigSpecError, ex:
-        if not ConfSpecErrorIsMissingError(ex.details):
-            raise ex
+    scanRules = _DeliverableScanRules(config)
 
     for root, dirs, files in os.walk(deliverableDir):
+        relDir = os.path.relpath(root, deliverableDir)
+        if relDir == os.curdir:
+            relDir = ''
+
+        scanRules.PruneDirs(relDir, dirs)
+
         for f in files:
             #print "Looking at: %s" % (JoinPaths(root, f))
-            deliverableDescList = []
-            for section in deliverableSections:
-                delivRegex = None
-                delivName = None
-                matchType = None
-                subclassType = None
-
-                sectionItems = config.GetSectionItems(section)
-
-                regexFlags = 0
-                if 'name' in sectionItems:
-                    delivName = config.SectionGet(section, 'name').strip()
-                    matchType = 'name'
-                elif 'regex' in sectionItems:
-                    delivRegex = config.SectionGet(section, 'regex').strip()
-                    matchType = 'regex'
-               
-                    try:
-                        regexFlagsStr = config.SectionGet(section,
-                         'regexflags').strip()
-                        regexFlags = eval(regexFlagsStr)
-                    except ConfigSpecError, ex:
-                        if not ConfSpecErrorIsMissingError(ex.details):
-                            raise ex
-
-                else:
-                    raise ConfigSpecError(
-                     Deliverable.ERROR_STR_NEED_NAME_OR_REGEX %
-                     DeliverableClassFromSectionName(section))
-
-                #print "f is %s, name is %s, regex is %s" % (f, delivName, delivRegex)          
-                if ((delivName is not None and f == delivName) or 
-                 (delivRegex is not None and re.search(delivRegex, f,
-                 regexFlags))):
-                    if 'subclass' in sectionItems:
-                        subclassType = config.SectionGet(section,
-                         'subclass').strip()
-
-                    delivClassDescription = { 
-                     'type': matchType,
-                     'subclass' : subclassType,
-                     'class' : DeliverableClassFromSectionName(section),
-                     'file' : JoinPaths(root, f),
-                    }
-
-
-                    deliverableDescList.append(delivClassDescription)
-
-            if len(deliverableDescList) == 0:
-                if not ignoreUndefinedDeliverables:
-                    assert False, "Should be a release framework error."
-                else:
-                    continue
-
-            if len(deliverableDescList) == 1:
-                delivDesc = deliverableDescList[0]
-
-                if delivDesc['subclass'] is not None:
-                    try:
-                        subclassModule = ImportFunction(delivDesc['subclass'])
-                        newDelivObj = subclassModule(delivDesc['file'],
-                         delivDesc['class'], config)
-                    except NameError, ex:
-                        raise ConfigSpecError("subclass error %s" % (ex)) 
-                else:
-                    newDelivObj = Deliverable(delivDesc['file'], 
-                     delivDesc['class'], config)
-
-                deliverables.append(newDelivObj)
+            fileLoc = JoinPaths(root, f)
+            delivDesc = scanRules.Classify(os.path.join(relDir, f), fileLoc)
 
-            else:
-                matchedClassList = []
-                fileLoc = deliverableDescList[0]['file']
-                for delivDesc in deliverableDescList:
-                    assert fileLoc == delivDesc['file'], ("Deliverable file "
-                     "name mismatch (%s vs %s)?" % (fileLoc, delivDesc['file']))
+            if delivDesc is not None:
+                deliverables.append(delivDesc.factory(fileLoc,
+                 delivDesc.deliverableClass, config))
 
-                    matchedClassList.append("%s (matched via %s)" % (
-                     delivDesc['class'], delivDesc['type']))
+    Deliverable._gDeliverablesCache[deliverableDir] = tuple(deliverables)
+    return len(deliverables)
 
-                raise ConfigSpecError("More than one deliverable class for "
-                 "the file %s: %s" % (fileLoc, ', '.join(matchedClassList)))
+def FindDeliverablesFromListing(listing, baseDir, config, verifyFiles=False):
+    """
+    Prime the L{Deliverable<quickrelease.deliverable.Deliverable>} cache from
+    a listing of files, instead of by traversing a directory. Files are
+    classified exactly as they are by L{FindDeliverables}, including its
+    exclusion, depth, and C{subdir} rules.
+
+    This is useful when a listing of a release directory already exists (e.g.
+    a C{SHA1SUMS} file), or the directory is on slow or remote storage: unless
+    C{verifyFiles} is set, the files are not accessed at all until a 
+    deliverable's C{size}, C{mtime}, checksums, or callback attributes are 
+    requested.
+
+    @param listing: Either the path to a file listing the deliverables, or an
+    iterable of paths. A listing file may be a checksum manifest (see
+    L{ParseChecksumManifest<quickrelease.utils.ParseChecksumManifest>}) or
+    contain one path per line. Paths are relative to C{baseDir}.
+    @type listing: C{str} or iterable of C{str}
+
+    @param baseDir: The directory the paths in the listing are relative to. 
+    It is also the key to use for this listing in the deliverable cache, e.g.
+    when calling L{GetAllDeliverables}. It need not exist.
+    @type baseDir: C{str}
 
-    Deliverable._gDeliverablesCache[deliverableDir] = tuple(deliverables)
-    return len(tuple(deliverables))
+    @param config: A reference to a L{ConfigSpec<quickrelease.config.ConfigSpec>} containing definitions deliverable definitions.
+    @type config: L{ConfigSpec<quickrelease.config.ConfigSpec>}
+
+    @param verifyFiles: Check that every deliverable in the listing exists.
+    @type verifyFiles: C{bool}
+
+    @return: The number of deliverables found in the listing. If C{baseDir}
+    already exists in the deliverables cache, B{None}.
+    @rtype: C{int} or C{None}
+
+    @raise ValueError: If the listing file can't be read, or C{verifyFiles}
+    is set and a listed deliverable doesn't exist.
+    @raise ConfigSpecError: In the same cases as L{FindDeliverables}.
+    """
+    if Deliverable._gDeliverablesCache.has_key(baseDir):
+        return None
+
+    if isinstance(listing, basestring):
+        try:
+            listedPaths = list(path for (checksum, path) in
+             ParseChecksumManifest(listing))
+        except ValueError:
+            listedPaths = list(p for p in ReadMemo(listing, list) if
+             len(p.strip()) != 0)
+    else:
+        listedPaths = listing
+
+    absBaseDir = os.path.abspath(baseDir)
+    deliverables = []
+    scanRules = _DeliverableScanRules(config)
+
+    for path in listedPaths:
+        relPath = os.path.normpath(path.strip())
+        fileLoc = JoinPaths(absBaseDir, relPath)
+        delivDesc = scanRules.Classify(relPath, fileLoc)
+
+        if delivDesc is None:
+            continue
+
+        if verifyFiles:
+            newDelivObj = delivDesc.factory(fileLoc,
+             delivDesc.deliverableClass, config)
+        else:
+            newDelivObj = _CreateUnverifiedDeliverable(delivDesc.factory,
+             fileLoc, delivDesc.deliverableClass, config)
+
+        deliverables.append(newDelivObj)
+
+    Deliverable._gDeliverablesCache[baseDir] = tuple(deliverables)
+    return len(deliverables)
+
+# Set while _CreateUnverifiedDeliverable() is constructing a deliverable, so
+# Deliverable.__init__() skips checking that its file exists, without
+# subclasses' constructors having to pass anything along.
+_gUnverifiedConstruction = local()
+
+def _CreateUnverifiedDeliverable(factory, *args):
+    _gUnverifiedConstruction.active = True
+    try:
+        return factory(*args)
+    finally:
+        _gUnverifiedConstruction.active = False
+
+def _IsSubPath(path, parentPath):
+    return (parentPath == '' or path == parentPath or
+     path.startswith(parentPath + os.sep))
+
+class _DeliverableScanRules(object):
+    """
+    The deliverable match rules and traversal rules used when searching for
+    deliverables; see L{FindDeliverables}. Paths passed to its methods are
+    relative to the directory being searched, with C{''} being the directory
+    itself.
+    """
+    def __init__(self, config):
+        # Only what's needed to match files is parsed up front; a class's
+        # full descriptor is created once a file matches it.
+        self.matchRules = tuple(_DeliverableMatchRule(
+         DeliverableClassFromSectionName(s), config) for s in
+         GetDeliverableSections(config))
+
+        self.ignoreUndefinedDeliverables = self._GetSetting(config,
+         'ignore_undefined_deliverables', bool, True)
+        self.excludes = tuple(self._GetSetting(config,
+         'deliverable_scan_exclude', list, ()))
+        self.maxDepth = self._GetSetting(config, 'deliverable_scan_max_depth',
+         int, None)
+
+        self.subdirs = None
+        if (len(self.matchRules) > 0 and
+         None not in list(r.subdir for r in self.matchRules)):
+            self.subdirs = tuple(set(r.subdir for r in self.matchRules))
+
+        self._matchRulesByDir = {}
+
+    @staticmethod
+    def _GetSetting(config, name, coercion, default):
+        try:
+            return config.SectionGet('quickrelease', name, coercion)
+        except ConfigSpecError, ex:
+            if not ConfSpecErrorIsMissingError(ex.details):
+                raise ex
+
+        return default
+
+    @staticmethod
+    def _GetDepth(relDir):
+        if relDir == '':
+            return 0
+
+        return relDir.count(os.sep) + 1
+
+    def _IsExcluded(self, relPath):
+        name = os.path.basename(relPath)
+        for pattern in self.excludes:
+            if (fnmatch.fnmatch(name, pattern) or
+             fnmatch.fnmatch(relPath, pattern)):
+                return True
+
+        return False
+
+    def _GetMatchRulesForDir(self, relDir):
+        try:
+            return self._matchRulesByDir[relDir]
+        except KeyError:
+            pass
+
+        matchRules = tuple(r for r in self.matchRules if r.subdir is None or
+         _IsSubPath(relDir, r.subdir))
+        self._matchRulesByDir[relDir] = matchRules
+        return matchRules
+
+    def PruneDirs(self, relDir, dirs):
+        """
+        Remove the directories in C{dirs} (the subdirectories of C{relDir},
+        as returned by C{os.walk()}) that shouldn't be traversed, in place.
+        """
+        keptDirs = []
+        for d in dirs:
+            relPath = os.path.join(relDir, d)
+
+            if self._IsExcluded(relPath):
+                continue
+            elif (self.maxDepth is not None and
+             self._GetDepth(relPath) > self.maxDepth):
+                continue
+            elif self.subdirs is not None and not [s for s in self.subdirs if
+             _IsSubPath(relPath, s) or _IsSubPath(s, relPath)]:
+                continue
+
+            keptDirs.append(d)
+
+        dirs[:] = keptDirs
+
+    def Classify(self, relPath, fileLoc):
+        """
+        Return the descriptor for the deliverable class the file at
+        C{relPath} belongs to, or C{None} if it isn't a deliverable.
+
+        @raise ConfigSpecError: If the file matches more than one deliverable
+        class.
+        """
+        (relDir, fileName) = os.path.split(relPath)
+
+        if self._IsExcluded(relPath):
+            return None
+        elif (self.maxDepth is not None and
+         self._GetDepth(relDir) > self.maxDepth):
+            return None
+
+        matchedRules = list(r for r in self._GetMatchRulesForDir(relDir) if
+         r.Matches(fileName))
+
+        if len(matchedRules) == 0:
+            if not self.ignoreUndefinedDeliverables:
+                assert False, "Should be a release framework error."
+
+            return None
+        elif len(matchedRules) == 1:
+            return matchedRules[0].GetDescriptor()
+        else:
+            matchedClassList = list("%s (matched via %s)" % (
+             r.deliverableClass, r.matchType) for r in matchedRules)
+
+            raise ConfigSpecError("More than one deliverable class for "
+             "the file %s: %s" % (fileLoc, ', '.join(matchedClassList)))
 
 def GetAllDeliverables(deliverableDir=None):
     """
@@ -566,6 +1314,9 @@ def GetAllDeliverables(deliverableDir=None):
     @rtype: C{tuple} of L{Deliverable<quickrelease.deliverable.Deliverable>}
 
     @raise ValueError: When either L{FindDeliverables} has not been called yet, or the specified L{deliverableDir} has not yet been scanned with L{FindDeliverables}. 
+
+    @see: L{GetDeliverableTable}, to get the deliverables as a column-oriented
+    table.
     """
 
     if deliverableDir is not None:
@@ -588,6 +1339,38 @@ def GetAllDeliverables(deliverableDir=None):
 
         return tuple(allDeliverables)
 
+def GetDeliverableTable(deliverableDir=None, attributes=None, workers=1):
+    """
+    Return the known deliverables in the deliverable cache as a column-oriented
+    L{DeliverableTable}, for fast selection and reporting over large sets of
+    deliverables.
+
+    Callback attributes are evaluated (see L{PrecomputeAttributes}) before
+    the table is built. By default, this is done serially; passing a larger
+    number of C{workers} evaluates them in parallel, which is only safe if
+    the callbacks are thread-safe.
+
+    @param deliverableDir: Only include deliverables found in this directory.
+    Default: all directories scanned with L{FindDeliverables}.
+    @type deliverableDir: C{str} or C{None}
+
+    @param attributes: The attributes to create columns for. Default: all 
+    defined attributes.
+    @type attributes: C{list} of C{str} or C{None}
+
+    @param workers: The number of threads to use to evaluate callback
+    attributes; C{None} means the number returned by L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}. Default: 1.
+    @type workers: C{int}
+
+    @return: A table of all the deliverables.
+    @rtype: L{DeliverableTable}
+
+    @raise ValueError: See L{GetAllDeliverables}.
+    """
+    deliverables = GetAllDeliverables(deliverableDir)
+    PrecomputeAttributes(deliverables, attributes, workers)
+    return DeliverableTable(deliverables, attributes)
+
 def GetDeliverables(deliverableClass, deliverableDir=None):
     """
     Get all deliverables matching the given deliverable class (including filter attributes).
@@ -600,6 +1383,8 @@ def GetDeliverables(deliverableClass, deliverableDir=None):
     @type deliverableDir: C{str}
 
     @return: All deliverables matching the given class in the given directory.
+    The returned objects are read-only views which share the cached
+    deliverables; their C{queriedName} is set to C{deliverableClass}.
     @rtype: C{list} of L{Deliverable}
 
     @raise ValueError: ValueErrors are raised in the followin cases:
@@ -607,76 +1392,134 @@ def GetDeliverables(deliverableClass, deliverableDir=None):
        2. If more filter attributes were provided in the query than than are defined in the deliverable definition.
     """
     filterArgs = deliverableClass.split(':')
-    filterArgsLen = len(filterArgs)
     filteredDeliverableList = []
 
-    # Process the static filters, given in the config file
     for deliv in GetAllDeliverables(deliverableDir):
-        staticFilters = deliv.name.split(':')
-        staticFilterLen = len(staticFilters)
+        if _MatchDeliverableFilters(deliv, filterArgs) is not None:
+            filteredDeliverableList.append(_QueriedDeliverable(deliv,
+             deliverableClass))
 
-        filterNdx = 0
+    return filteredDeliverableList
 
-        skipThisDeliv = False
-        while filterNdx < filterArgsLen and filterNdx < staticFilterLen:
-            if filterArgs[filterNdx] != staticFilters[filterNdx]:
-                skipThisDeliv = True
-                break
+# Returns the number of the deliverable's filter attributes used to match
+# the given filter arguments, or None if it doesn't match.
+def _MatchDeliverableFilters(deliv, filterArgs):
+    filterArgsLen = len(filterArgs)
+    staticFilters = deliv.name.split(':')
+    staticFilterLen = len(staticFilters)
 
-            filterNdx += 1
+    filterNdx = 0
 
-        if skipThisDeliv:
-            continue
+    # Process the static filters, given in the config file
+    while filterNdx < filterArgsLen and filterNdx < staticFilterLen:
+        if filterArgs[filterNdx] != staticFilters[filterNdx]:
+            return None
 
-        # If we've parsed all of the filter arguments, we're done
-        if filterNdx == filterArgsLen:
-            retDeliv = copy.deepcopy(deliv)
-            retDeliv._queriedDeliverableClass = deliverableClass
-            filteredDeliverableList.append(retDeliv)
-            continue
+        filterNdx += 1
 
-        dynamicFilters = deliv.filterAttributes
-
-        if dynamicFilters is None and filterNdx < filterArgsLen:
-            raise ValueError("GetDeliverables passed filter '%s' for a "
-             "deliverable class that defines no filter attributes" %
-             ':'.join(filterArgs[filterNdx:]))
-
-        dynamicFilterLen = len(dynamicFilters)
-
-        while filterNdx < filterArgsLen:
-            dynNdx = filterNdx - staticFilterLen
-            assert dynNdx >= 0, "Invalid (negative) dynamic filter index."
-            if dynNdx >= dynamicFilterLen:
-                availableFilters = staticFilters[1:] + list(dynamicFilters)
-                availableFiltersStr = ', '.join(availableFilters)
-                filterCount = len(availableFilters)
-                if filterCount > 1:
-                    pluralFilters = "s"
-                else:
-                    pluralFilters = ""
-
-                raise ValueError("GetDeliverables passed extra filter '%s' "
-                 "for deliverable %s; %s defines %d filter%s: %s." % (
-                 ':'.join(filterArgs[filterNdx:]), deliv.name,
-                 deliv.name, filterCount, pluralFilters,
-                 availableFiltersStr))
-
-            if (deliv.GetAttribute(dynamicFilters[dynNdx]) != 
-             filterArgs[filterNdx]):
-                skipThisDeliv = True
-                break
+    # If we've parsed all of the filter arguments, we're done
+    if filterNdx == filterArgsLen:
+        return 0
+
+    dynamicFilters = deliv.filterAttributes
+
+    if dynamicFilters is None and filterNdx < filterArgsLen:
+        raise ValueError("GetDeliverables passed filter '%s' for a "
+         "deliverable class that defines no filter attributes" %
+         ':'.join(filterArgs[filterNdx:]))
+
+    dynamicFilterLen = len(dynamicFilters)
+
+    while filterNdx < filterArgsLen:
+        dynNdx = filterNdx - staticFilterLen
+        assert dynNdx >= 0, "Invalid (negative) dynamic filter index."
+        if dynNdx >= dynamicFilterLen:
+            availableFilters = staticFilters[1:] + list(dynamicFilters)
+            availableFiltersStr = ', '.join(availableFilters)
+            filterCount = len(availableFilters)
+            if filterCount > 1:
+                pluralFilters = "s"
+            else:
+                pluralFilters = ""
+
+            raise ValueError("GetDeliverables passed extra filter '%s' "
+             "for deliverable %s; %s defines %d filter%s: %s." % (
+             ':'.join(filterArgs[filterNdx:]), deliv.name,
+             deliv.name, filterCount, pluralFilters,
+             availableFiltersStr))
+
+        if (deliv.GetAttribute(dynamicFilters[dynNdx]) != 
+         filterArgs[filterNdx]):
+            return None
+
+        filterNdx += 1
+
+    return filterArgsLen - staticFilterLen
+
+def GroupDeliverables(deliverableClass, byAttributes=None,
+ deliverableDir=None):
+    """
+    Get all deliverables matching the given deliverable class (including
+    filter attributes), grouped by the values of the given attributes.
+
+    This is done in a single pass over the deliverable cache, so it is much
+    faster than calling L{GetDeliverables} in a loop for each possible value
+    of an attribute. For example, instead of::
+
+        for locale in locales:
+            installers = GetDeliverables('installer:linux:%s' % (locale))
+            ...
+
+    use::
+
+        installersByLocale = GroupDeliverables('installer:linux', ('locale',))
+        for locale in locales:
+            installers = installersByLocale.get((locale,), [])
+            ...
+
+    @param deliverableClass: The class of deliverable to return.
+    @type deliverableClass: C{str}
+
+    @param byAttributes: The names of the attributes to group the deliverables
+    by. Default: each deliverable's filter attributes which were not used
+    in C{deliverableClass}.
+    @type byAttributes: C{list} or C{tuple} of C{str}
+
+    @param deliverableDir: Only return deliverables found in this directory. 
+    Default: all directories scanned with L{FindDeliverables}. 
+    @type deliverableDir: C{str}
 
-            filterNdx += 1
+    @return: A dictionary mapping tuples of attribute values (in the order
+    given in C{byAttributes}) to lists of deliverables with those values.
+    Like L{GetDeliverables}, the deliverables are read-only views; their
+    C{queriedName} is set to C{deliverableClass}.
+    @rtype: C{dict}
 
-        if skipThisDeliv:
+    @raise ValueError: In the same cases as L{GetDeliverables}, and if a
+    deliverable matching C{deliverableClass} doesn't define one of the 
+    attributes in C{byAttributes}.
+    """
+    filterArgs = deliverableClass.split(':')
+    groupedDeliverables = {}
+
+    for deliv in GetAllDeliverables(deliverableDir):
+        usedFilterCount = _MatchDeliverableFilters(deliv, filterArgs)
+        if usedFilterCount is None:
             continue
 
-        retDeliv = copy.deepcopy(deliv)
-        retDeliv._queriedDeliverableClass = deliverableClass
-        filteredDeliverableList.append(retDeliv)
+        groupAttributes = byAttributes
+        if groupAttributes is None:
+            groupAttributes = (deliv.filterAttributes or ())[usedFilterCount:]
 
-    return filteredDeliverableList
+        groupKey = tuple(deliv.GetAttribute(a) for a in groupAttributes)
+
+        if groupKey not in groupedDeliverables:
+            groupedDeliverables[groupKey] = []
+
+        groupedDeliverables[groupKey].append(_QueriedDeliverable(deliv,
+         deliverableClass))
+
+    return groupedDeliverables
 
 def GetDeliverable(deliverableClass, deliverableDir=None):
     """
@@ -704,6 +1547,363 @@ def GetDeliverable(deliverableClass, deliverableDir=None):
     else:
         return possibleDelivs[0]
 
+def PrecomputeAttributes(deliverables, attributes=None, workers=None,
+ useProcesses=False):
+    """
+    Evaluate the callback attributes of the given deliverables across a pool
+    of workers, and cache the results, so later calls to 
+    L{GetAttribute<quickrelease.deliverable.Deliverable.GetAttribute>} (and
+    queries using those attributes as filters) don't have to call them.
+
+    This is useful when callback attributes are expensive to evaluate, e.g.
+    they open archives or read manifests. Attributes which already have a
+    valid cached value, and regular expression and value attributes (which
+    are cheap to evaluate) are skipped.
+
+    B{Note}: the callbacks are called concurrently, from several threads (or
+    processes); only use this with callbacks which are safe to call that
+    way. (Pass C{workers=1} to evaluate them serially.)
+
+    @param deliverables: The deliverables to evaluate attributes for.
+    @type deliverables: iterable of L{Deliverable}s
+
+    @param attributes: The names of the attributes to evaluate. Attributes
+    a deliverable doesn't define are ignored for that deliverable. Default:
+    all of each deliverable's attributes.
+    @type attributes: C{list} of C{str} or C{None}
+
+    @param workers: The number of workers to use. Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+
+    @param useProcesses: Evaluate the callbacks in a pool of processes,
+    instead of threads. The callbacks must be defined at the top level of
+    a module, and the deliverables and results must be picklable.
+    @type useProcesses: C{bool}
+
+    @return: The number of callbacks evaluated.
+    @rtype: C{int}
+    """
+    work = []
+
+    for deliv in deliverables:
+        attributeHandlers = deliv._descriptor.attributeHandlers
+
+        if attributes is None:
+            delivAttributes = deliv.attributes
+        else:
+            delivAttributes = list(a for a in attributes if a in
+             attributeHandlers)
+
+        statKey = None
+        for attr in delivAttributes:
+            if attributeHandlers[attr][0] != Deliverable.ATTRIB_TYPE_CALLBACK:
+                continue
+
+            if statKey is None:
+                statKey = deliv._GetStatKey()
+
+            if not deliv._IsAttributeCached(attr, statKey):
+                work.append((deliv, attr, statKey))
+
+    results = ParallelMap(_EvaluateCallbackAttribute,
+     list((deliv, attr) for (deliv, attr, statKey) in work), workers,
+     useProcesses)
+
+    for ((deliv, attr, statKey), value) in zip(work, results):
+        deliv._CacheAttribute(attr, statKey, value)
+
+    return len(work)
+
+def _EvaluateCallbackAttribute(work):
+    (deliv, attribute) = work
+    return deliv._CallAttributeCallback(attribute)
+
+def PrecomputeDigests(deliverables, algorithms=('sha1',), workers=None):
+    """
+    Compute (and cache) checksums of the given deliverables in parallel, so 
+    later calls to L{GetDigest<quickrelease.deliverable.Deliverable.GetDigest>}
+    return immediately. All the requested checksums for a file are computed
+    in a single pass over it.
+
+    @param deliverables: The deliverables to compute checksums for.
+    @type deliverables: iterable of L{Deliverable}s
+
+    @param algorithms: The names of the checksum algorithms to compute.
+    @type algorithms: C{list} or C{tuple} of C{str}
+
+    @param workers: The number of threads to use. Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+    """
+    ParallelMap(lambda d: d._GetDigests(algorithms), deliverables, workers)
+
+class DeliverableDiff(object):
+    """
+    The difference between the deliverables in two directories, as computed
+    by L{DiffDeliverables}. Deliverables are the (cached) L{Deliverable}
+    objects found in each directory.
+    """
+    def __init__(self, added, removed, changed, unchanged):
+        object.__init__(self)
+        self._added = tuple(added)
+        self._removed = tuple(removed)
+        self._changed = tuple(changed)
+        self._unchanged = tuple(unchanged)
+
+    def _GetAdded(self): return self._added
+    def _GetRemoved(self): return self._removed
+    def _GetChanged(self): return self._changed
+    def _GetUnchanged(self): return self._unchanged
+
+    added = property(_GetAdded)
+    """Deliverables in the new directory without a counterpart in the old
+    one. Read-only.
+    @type: C{tuple} of L{Deliverable}s"""
+
+    removed = property(_GetRemoved)
+    """Deliverables in the old directory without a counterpart in the new
+    one. Read-only.
+    @type: C{tuple} of L{Deliverable}s"""
+
+    changed = property(_GetChanged)
+    """Paired deliverables whose contents differ, as C{(oldDeliverable, 
+    newDeliverable)} tuples. Read-only.
+    @type: C{tuple} of C{tuple}s"""
+
+    unchanged = property(_GetUnchanged)
+    """Paired deliverables whose contents are the same, as 
+    C{(oldDeliverable, newDeliverable)} tuples. Read-only.
+    @type: C{tuple} of C{tuple}s"""
+
+    def __str__(self):
+        return ("%d added, %d removed, %d changed, %d unchanged" % (
+         len(self.added), len(self.removed), len(self.changed),
+         len(self.unchanged)))
+
+def DiffDeliverables(oldDir, newDir, config, algorithm='sha1', workers=None):
+    """
+    Compare the deliverables in two release directories, e.g. to only upload
+    or generate updates for the deliverables that changed.
+
+    Deliverables are paired by their deliverable class and filter attribute
+    values (or, if those are the same for several deliverables, also by 
+    their path relative to C{oldDir}/C{newDir}). Pairs whose sizes differ are
+    changed; the remaining pairs are compared by checksum, computed in
+    parallel (see L{PrecomputeDigests}). Checksums are cached per file, so
+    files whose size and modification time haven't changed since they were
+    last hashed aren't read again.
+
+    Either directory is scanned with L{FindDeliverables} if it hasn't been yet.
+
+    @param oldDir: The directory containing the old set of deliverables.
+    @type oldDir: C{str}
+
+    @param newDir: The directory containing the new set of deliverables.
+    @type newDir: C{str}
+
+    @param config: A reference to a L{ConfigSpec<quickrelease.config.ConfigSpec>} containing deliverable definitions.
+    @type config: L{ConfigSpec<quickrelease.config.ConfigSpec>}
+
+    @param algorithm: The checksum algorithm to compare contents with.
+    @type algorithm: C{str}
+
+    @param workers: The number of threads to use to compute checksums. 
+    Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+
+    @return: The added, removed, changed and unchanged deliverables.
+    @rtype: L{DeliverableDiff}
+
+    @raise ValueError: If either directory is invalid.
+    """
+    oldIndex = _IndexDeliverablesForDiff(oldDir, config)
+    newIndex = _IndexDeliverablesForDiff(newDir, config)
+
+    added = []
+    removed = []
+    pairs = []
+
+    for key in oldIndex.keys():
+        if key not in newIndex:
+            removed.extend(oldIndex[key])
+            continue
+
+        oldDelivs = oldIndex[key]
+        newDelivs = newIndex[key]
+
+        if len(oldDelivs) == 1 and len(newDelivs) == 1:
+            pairs.append((oldDelivs[0], newDelivs[0]))
+            continue
+
+        newDelivsByPath = {}
+        for deliv in newDelivs:
+            newDelivsByPath[os.path.relpath(deliv.file, newDir)] = deliv
+
+        for deliv in oldDelivs:
+            relPath = os.path.relpath(deliv.file, oldDir)
+            if relPath in newDelivsByPath:
+                pairs.append((deliv, newDelivsByPath[relPath]))
+                del newDelivsByPath[relPath]
+            else:
+                removed.append(deliv)
+
+        added.extend(newDelivsByPath.values())
+
+    for key in newIndex.keys():
+        if key not in oldIndex:
+            added.extend(newIndex[key])
+
+    changed = []
+    unchanged = []
+    ambiguousPairs = []
+
+    # Files in different directories with the same size and modification
+    # time (e.g. copies which preserved it) may still differ, so only sizes
+    # are compared here; the files' stats are refreshed, in case they've
+    # changed since the deliverables were found.
+    for (oldDeliv, newDeliv) in pairs:
+        if (oldDeliv._GetStat(refresh=True).st_size !=
+         newDeliv._GetStat(refresh=True).st_size):
+            changed.append((oldDeliv, newDeliv))
+        else:
+            ambiguousPairs.append((oldDeliv, newDeliv))
+
+    PrecomputeDigests(list(d for pair in ambiguousPairs for d in pair),
+     (algorithm,), workers)
+
+    for (oldDeliv, newDeliv) in ambiguousPairs:
+        if oldDeliv.GetDigest(algorithm) == newDeliv.GetDigest(algorithm):
+            unchanged.append((oldDeliv, newDeliv))
+        else:
+            changed.append((oldDeliv, newDeliv))
+
+    return DeliverableDiff(added, removed, changed, unchanged)
+
+def _IndexDeliverablesForDiff(deliverableDir, config):
+    FindDeliverables(deliverableDir, config)
+
+    index = {}
+    for deliv in GetAllDeliverables(deliverableDir):
+        key = (deliv.name,) + tuple(deliv.GetAttribute(a) for a in
+         (deliv.filterAttributes or ()))
+
+        if key not in index:
+            index[key] = []
+
+        index[key].append(deliv)
+
+    return index
+
+def SaveChecksumCache():
+    """
+    Write the deliverable checksum cache to the file named by the 
+    C{DELIVERABLE_CHECKSUM_CACHE} constant, if it's set.
+
+    This is done automatically when the program exits; calling it directly is
+    only necessary to share the cache with other processes earlier.
+    """
+    _gChecksumCache.Save()
+
+class _ChecksumCache(object):
+    """
+    A cache of file checksums, keyed by path and validated by each file's
+    inode, size and modification time (in nanoseconds). It may be persisted
+    in a sidecar file; see L{SaveChecksumCache}.
+    """
+    def __init__(self):
+        self._entries = None
+        self._storeFile = None
+        self._dirty = False
+        self._lock = Lock()
+
+    @staticmethod
+    def GetStatKey(fileStat):
+        return (fileStat.st_ino, fileStat.st_size,
+         int(fileStat.st_mtime * 1000000000))
+
+    def _Load(self):
+        self._entries = {}
+        self._storeFile = ConfigSpec.GetConstant('DELIVERABLE_CHECKSUM_CACHE')
+
+        if self._storeFile is None or not os.path.isfile(self._storeFile):
+            return
+
+        try:
+            storeHandle = open(self._storeFile, 'rb')
+            try:
+                entries = cPickle.load(storeHandle)
+            finally:
+                storeHandle.close()
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            # A missing or corrupt cache just means we'll rehash.
+            return
+
+        if type(entries) is dict:
+            self._entries = entries
+
+    def Get(self, path, fileStat, algorithms):
+        self._lock.acquire()
+        try:
+            if self._entries is None:
+                self._Load()
+
+            try:
+                (statKey, digests) = self._entries[path]
+            except KeyError:
+                return {}
+
+            if statKey != _ChecksumCache.GetStatKey(fileStat):
+                return {}
+
+            return dict((a, digests[a]) for a in algorithms if a in digests)
+        finally:
+            self._lock.release()
+
+    def Update(self, path, fileStat, newDigests):
+        statKey = _ChecksumCache.GetStatKey(fileStat)
+
+        self._lock.acquire()
+        try:
+            if self._entries is None:
+                self._Load()
+
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != statKey:
+                entry = (statKey, {})
+                self._entries[path] = entry
+
+            entry[1].update(newDigests)
+            self._dirty = True
+        finally:
+            self._lock.release()
+
+    def Save(self):
+        self._lock.acquire()
+        try:
+            if self._storeFile is None or not self._dirty:
+                return
+
+            tmpStoreFile = "%s.%d.tmp" % (self._storeFile, os.getpid())
+            storeHandle = open(tmpStoreFile, 'wb')
+            try:
+                cPickle.dump(self._entries, storeHandle,
+                 cPickle.HIGHEST_PROTOCOL)
+            finally:
+                storeHandle.close()
+
+            # Not atomic on Win32, but close enough for a cache.
+            if os.name == 'nt' and os.path.exists(self._storeFile):
+                os.remove(self._storeFile)
+            os.rename(tmpStoreFile, self._storeFile)
+            self._dirty = False
+        finally:
+            self._lock.release()
+
+_gChecksumCache = _ChecksumCache()
+atexit.register(SaveChecksumCache)
+
 def FlushDeliverableCache(deliverableDir=None):
     """
     Flush the deliverable cache of all L{Deliverable} entries.
@@ -716,6 +1916,7 @@ def FlushDeliverableCache(deliverableDir=None):
     """
     if deliverableDir is None:
         Deliverable._gDeliverablesCache.clear()
+        Deliverable._gClassDescriptorCache.clear()
     else:
         try:
             del Deliverable._gDeliverablesCache[deliverableDir]
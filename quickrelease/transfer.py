@@ -0,0 +1,287 @@
+# ex:ts=4:sw=4:sts=4:et
+# -*- tab-width: 4; c-basic-offset: 4; indent-tabs-mode: nil -*-
+
+r"""Bulk, in-process copying and moving of files, e.g. when staging
+deliverables for partners or mirrors.
+
+Each file is transferred with the cheapest mechanism available: a
+C{rename()} when moving within a filesystem; otherwise (on Linux) a reflink,
+C{copy_file_range()} or C{sendfile()}, so the kernel copies the data without
+it passing through Python buffers; or, failing all those, a plain buffered
+copy. Files are transferred in parallel.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import platform
+import shutil
+from threading import current_thread
+
+from quickrelease.config import ConfigSpec
+from quickrelease.exception import ReleaseFrameworkError
+from quickrelease.utils import GetFileHashes, Makedirs, ParallelMap, ReplaceFile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TRANSFER_METHOD_RENAME = 'rename'
+"""A move within a filesystem, using C{rename()}."""
+TRANSFER_METHOD_REFLINK = 'reflink'
+"""A copy-on-write clone of the file (on filesystems which support it, e.g.
+btrfs and XFS), using the C{FICLONE} C{ioctl()}."""
+TRANSFER_METHOD_COPY_FILE_RANGE = 'copy_file_range'
+"""An in-kernel copy, using C{copy_file_range()}."""
+TRANSFER_METHOD_SENDFILE = 'sendfile'
+"""An in-kernel copy, using C{sendfile()}."""
+TRANSFER_METHOD_COPY = 'copy'
+"""A buffered copy, through Python."""
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+# Errors indicating a mechanism isn't supported for a given pair of files
+# (or at all); the next mechanism is tried when one of these is returned.
+_UNSUPPORTED_ERRNOS = set(getattr(errno, e) for e in ('ENOSYS', 'EXDEV',
+ 'EINVAL', 'ENOTTY', 'EOPNOTSUPP', 'ENOTSUP', 'EBADF', 'EPERM') if
+ hasattr(errno, e))
+
+def _LoadLibc():
+    if platform.system() != 'Linux':
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except OSError:
+        return None
+
+    for (funcName, argTypes) in (('copy_file_range', (ctypes.c_int,
+     ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t,
+     ctypes.c_uint)), ('sendfile', (ctypes.c_int, ctypes.c_int,
+     ctypes.c_void_p, ctypes.c_size_t))):
+        try:
+            func = getattr(libc, funcName)
+        except AttributeError:
+            # e.g. copy_file_range() requires glibc 2.27
+            continue
+
+        func.argtypes = argTypes
+        func.restype = ctypes.c_ssize_t
+
+    return libc
+
+_gLibc = _LoadLibc()
+
+# Mechanisms the running kernel/C library doesn't provide at all.
+_gUnavailableMethods = set()
+
+class _TransferMethodUnsupported(Exception):
+    pass
+
+def _KernelCopy(funcName, srcFd, dstFd, size):
+    if _gLibc is None or not hasattr(_gLibc, funcName):
+        raise _TransferMethodUnsupported()
+
+    copyFunc = getattr(_gLibc, funcName)
+    copied = 0
+
+    while copied < size:
+        if funcName == TRANSFER_METHOD_COPY_FILE_RANGE:
+            rv = copyFunc(srcFd, None, dstFd, None, size - copied, 0)
+        else:
+            rv = copyFunc(dstFd, srcFd, None, size - copied)
+
+        if rv < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                continue
+            elif copied == 0 and err in _UNSUPPORTED_ERRNOS:
+                if err == errno.ENOSYS:
+                    _gUnavailableMethods.add(funcName)
+                raise _TransferMethodUnsupported()
+
+            raise OSError(err, os.strerror(err))
+        elif rv == 0:
+            break
+
+        copied += rv
+
+    if copied < size:
+        # Some filesystems (and special files) return 0 for ranges they
+        # can't copy, rather than an error.
+        if copied == 0:
+            raise _TransferMethodUnsupported()
+
+        raise ReleaseFrameworkError("%s() stopped after copying %d of %d "
+         "bytes" % (funcName, copied, size))
+
+def _Reflink(srcFd, dstFd, size):
+    if fcntl is None or platform.system() != 'Linux':
+        raise _TransferMethodUnsupported()
+
+    try:
+        fcntl.ioctl(dstFd, _FICLONE, srcFd)
+    except IOError, ex:
+        if ex.errno in _UNSUPPORTED_ERRNOS:
+            raise _TransferMethodUnsupported()
+        raise
+
+def _BufferedCopy(srcFd, dstFd, size):
+    chunkSize = ConfigSpec.GetConstant('HASH_READ_CHUNK_SIZE')
+
+    while True:
+        chunk = os.read(srcFd, chunkSize)
+        if not chunk:
+            break
+
+        while chunk:
+            written = os.write(dstFd, chunk)
+            chunk = chunk[written:]
+
+_COPY_METHODS = ((TRANSFER_METHOD_REFLINK, _Reflink),
+                 (TRANSFER_METHOD_COPY_FILE_RANGE,
+                  lambda s, d, n: _KernelCopy(TRANSFER_METHOD_COPY_FILE_RANGE,
+                  s, d, n)),
+                 (TRANSFER_METHOD_SENDFILE,
+                  lambda s, d, n: _KernelCopy(TRANSFER_METHOD_SENDFILE,
+                  s, d, n)),
+                 (TRANSFER_METHOD_COPY, _BufferedCopy),
+                )
+
+def _CopyFileData(source, destination):
+    srcFd = os.open(source, os.O_RDONLY)
+    try:
+        size = os.fstat(srcFd).st_size
+        dstFd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+         0666)
+        try:
+            for (method, copyFunc) in _COPY_METHODS:
+                if method in _gUnavailableMethods:
+                    continue
+
+                try:
+                    copyFunc(srcFd, dstFd, size)
+                    return method
+                except _TransferMethodUnsupported:
+                    continue
+
+            assert False, "Buffered copy should never be unsupported."
+        finally:
+            os.close(dstFd)
+    finally:
+        os.close(srcFd)
+
+def TransferFile(source, destination, move=False, preserveMetadata=True,
+ verifyAlgorithm=None):
+    """
+    Copy or move a single file. See L{TransferFiles}.
+
+    @return: The mechanism used to transfer the file; one of the
+    C{TRANSFER_METHOD_*} constants in this module.
+    @rtype: C{str}
+    """
+    if not os.path.isfile(source):
+        raise ValueError("TransferFile(): invalid source: %s" % (source))
+
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+
+    destDir = os.path.dirname(os.path.abspath(destination))
+    Makedirs(destDir)
+
+    if move and os.stat(source).st_dev == os.stat(destDir).st_dev:
+        ReplaceFile(source, destination)
+        return TRANSFER_METHOD_RENAME
+
+    # Copy to a temporary file next to the destination, so an interrupted
+    # transfer never leaves a partial file under the destination's name.
+    # (The name is unique to this thread, since several may be copying to
+    # the same destination.)
+    tmpDestination = os.path.join(destDir, ".%s.qrtransfer-%d-%d" % (
+     os.path.basename(destination), os.getpid(), current_thread().ident))
+
+    try:
+        method = _CopyFileData(source, tmpDestination)
+
+        if preserveMetadata:
+            shutil.copystat(source, tmpDestination)
+
+        if verifyAlgorithm is not None:
+            sourceDigest = GetFileHashes(source, (verifyAlgorithm,))
+            destDigest = GetFileHashes(tmpDestination, (verifyAlgorithm,))
+
+            if sourceDigest != destDigest:
+                raise ReleaseFrameworkError("Verification of %s copied to %s "
+                 "failed: %s checksums differ (%s vs. %s)" % (source,
+                 destination, verifyAlgorithm,
+                 sourceDigest[verifyAlgorithm],
+                 destDigest[verifyAlgorithm]))
+
+        ReplaceFile(tmpDestination, destination)
+    except:
+        if os.path.exists(tmpDestination):
+            os.remove(tmpDestination)
+        raise
+
+    if move:
+        os.remove(source)
+
+    return method
+
+def TransferFiles(transfers, move=False, workers=None, preserveMetadata=True,
+ verifyAlgorithm=None):
+    """
+    Copy or move a set of files in parallel.
+
+    When moving a file to a destination on the same filesystem, it is
+    renamed. Otherwise it is copied, by the first of these mechanisms that
+    works for the given files: a reflink (copy-on-write clone),
+    C{copy_file_range()}, C{sendfile()} or a buffered copy. Moved files are
+    removed once they've been copied (and verified).
+
+    Files are copied into a temporary file in the destination directory,
+    which is renamed into place when the copy is complete. Missing
+    destination directories are created.
+
+    @param transfers: The files to transfer, as C{(source, destination)}
+    pairs. If a destination is an existing directory, the file is transferred
+    into it, keeping its name.
+    @type transfers: iterable of C{tuple}s
+
+    @param move: Move the files, instead of copying them.
+    @type move: C{bool}
+
+    @param workers: The number of threads to use. Default: see
+    L{GetParallelWorkerCount<quickrelease.utils.GetParallelWorkerCount>}.
+    @type workers: C{int}
+
+    @param preserveMetadata: Copy the permission bits and access and
+    modification times of each file to the copy.
+    @type preserveMetadata: C{bool}
+
+    @param verifyAlgorithm: If set, the name of a checksum algorithm (e.g.
+    C{'sha1'}) used to verify each copy against its source. Renamed files
+    are not verified.
+    @type verifyAlgorithm: C{str} or C{None}
+
+    @return: The mechanism used to transfer each file, in order.
+    @rtype: C{list} of C{str}
+
+    @raise ValueError: If a source file doesn't exist.
+    @raise ReleaseFrameworkError: If a copy is incomplete or doesn't match
+    its source.
+    @raise OSError: If a file can't be transferred.
+    """
+    transfers = list(transfers)
+
+    # Create the destination directories up front, so the workers never race
+    # to create the same one.
+    for (source, destination) in transfers:
+        if not os.path.isdir(destination):
+            Makedirs(os.path.dirname(os.path.abspath(destination)))
+
+    return ParallelMap(lambda t: TransferFile(t[0], t[1], move,
+     preserveMetadata, verifyAlgorithm), transfers, workers)
@@ -5,11 +5,16 @@ r"""Various utility functions that may prove useful in a build/release
 engineering-related context.
 """
 
+import errno
 import hashlib
+import mmap
+import multiprocessing
 import os
 import platform
+from Queue import Queue, Empty
 import re
 import sys
+from threading import Thread
 from urllib import FancyURLopener
 
 from quickrelease.config import ConfigSpec, ConfigSpecError
@@ -106,17 +111,434 @@ def GetSHA1FileHash(path):
 
     @raise ValueError: If the specified path is not a valid file.
 
+    @see: L{GetFileHashes}, to compute multiple checksums in one pass.
     """
     if not os.path.isfile(path):
         raise ValueError("GetSHA1FileHash(): invalid path: %s" % (path))
 
-    sha1 = hashlib.sha1()
+    return GetFileHashes(path, ('sha1',))['sha1']
+
+def GetFileHash(path, algorithm='sha1', useMmap=False):
+    """
+    Get a single checksum of a specific file.
+
+    @param path: Path to the file to checksum.
+    @type path: C{str}
+
+    @param algorithm: The name of the checksum algorithm, as understood by
+    C{hashlib.new()}, e.g. C{'md5'}, C{'sha1'}, C{'sha512'}.
+    @type algorithm: C{str}
+
+    @param useMmap: See L{GetFileHashes}.
+    @type useMmap: C{bool}
+
+    @return: The hex digest of the specified file.
+    @rtype: C{str}
+
+    @raise ValueError: If the specified path is not a valid file, or the
+    algorithm is unknown.
+    """
+    return GetFileHashes(path, (algorithm,), useMmap)[algorithm]
+
+def GetFileHashes(path, algorithms=('sha1',), useMmap=False):
+    """
+    Compute several checksums of a specific file in a single pass over the
+    file.
+
+    The file is read in chunks (of C{HASH_READ_CHUNK_SIZE} bytes; see
+    L{quickrelease.constants}), so files of any size can be hashed without
+    loading them into memory.
+
+    @param path: Path to the file to checksum.
+    @type path: C{str}
+
+    @param algorithms: The names of the checksum algorithms to compute, as
+    understood by C{hashlib.new()}, e.g. C{('md5', 'sha1', 'sha512')}
+    @type algorithms: C{list} or C{tuple} of C{str}
+
+    @param useMmap: Map the file into memory, instead of reading it into
+    buffers. This avoids copying the file's data, which can be faster for
+    large files which are already in the page cache.
+    @type useMmap: C{bool}
+
+    @return: A dictionary of algorithm names to hex digests.
+    @rtype: C{dict}
+
+    @raise ValueError: If the specified path is not a valid file, or an
+    algorithm is unknown.
+    """
+    if not os.path.isfile(path):
+        raise ValueError("GetFileHashes(): invalid path: %s" % (path))
+
+    hashers = list((algo, hashlib.new(algo)) for algo in algorithms)
+    chunkSize = ConfigSpec.GetConstant('HASH_READ_CHUNK_SIZE')
+
+    f = open(path, 'rb')
     try:
-        f = open(path, 'rb')
-        sha1.update(f.read())
+        fileSize = os.fstat(f.fileno()).st_size
+
+        # mmap() can't map empty files.
+        if useMmap and fileSize > 0:
+            fileMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for offset in xrange(0, fileSize, chunkSize):
+                    chunk = buffer(fileMap, offset, chunkSize)
+                    for (algo, h) in hashers:
+                        h.update(chunk)
+            finally:
+                fileMap.close()
+        else:
+            while True:
+                chunk = f.read(chunkSize)
+                if not chunk:
+                    break
+
+                for (algo, h) in hashers:
+                    h.update(chunk)
     finally:
         f.close()
-    return sha1.hexdigest()
+
+    return dict((algo, h.hexdigest()) for (algo, h) in hashers)
+
+def GetFileHashesParallel(paths, algorithms=('sha1',), workers=None,
+ useMmap=False):
+    """
+    Compute several checksums for each of a number of files, hashing the
+    files in parallel across a pool of threads. (The C{hashlib} module
+    releases the GIL while hashing.)
+
+    @param paths: Paths of the files to checksum.
+    @type paths: iterable of C{str}
+
+    @param algorithms: See L{GetFileHashes}.
+    @type algorithms: C{list} or C{tuple} of C{str}
+
+    @param workers: The number of threads to use. Default: see
+    L{GetParallelWorkerCount}.
+    @type workers: C{int}
+
+    @param useMmap: See L{GetFileHashes}.
+    @type useMmap: C{bool}
+
+    @return: A dictionary of paths to dictionaries of algorithm names to hex
+    digests.
+    @rtype: C{dict}
+
+    @raise ValueError: If any of the specified paths are not a valid file, or
+    an algorithm is unknown.
+    """
+    paths = list(paths)
+    hashes = ParallelMap(lambda p: GetFileHashes(p, algorithms, useMmap),
+     paths, workers)
+    return dict(zip(paths, hashes))
+
+CHECKSUM_MANIFEST_ALGORITHMS = { 'MD5SUMS': 'md5',
+                                 'SHA1SUMS': 'sha1',
+                                 'SHA256SUMS': 'sha256',
+                                 'SHA512SUMS': 'sha512',
+                               }
+"""Checksum manifest file names, and the algorithm each one uses."""
+
+_CHECKSUM_LENGTH_ALGORITHMS = { 32: 'md5',
+                                40: 'sha1',
+                                64: 'sha256',
+                                128: 'sha512',
+                              }
+
+def ParseChecksumManifest(manifestPath):
+    """
+    Parse a checksum manifest, in the format produced by the C{md5sum},
+    C{sha1sum}, etc. utilities, e.g. C{MD5SUMS}, C{SHA1SUMS} or 
+    C{SHA512SUMS} files.
+
+    Each line consists of a checksum, whitespace, an optional C{*} (marking
+    a file hashed in binary mode), and a path. Leading C{./} is removed from
+    paths. Blank lines and lines starting with C{#} are ignored.
+
+    @param manifestPath: Path to the checksum manifest.
+    @type manifestPath: C{str}
+
+    @return: The C{(checksum, path)} entries in the manifest, in order.
+    @rtype: C{list} of C{tuple}s
+
+    @raise ValueError: If the manifest can't be read, or contains a
+    malformed line.
+    """
+    entries = []
+
+    try:
+        manifestHandle = open(manifestPath, 'rb')
+    except IOError, ex:
+        raise ValueError(ex)
+
+    try:
+        lineNumber = 0
+        for line in manifestHandle:
+            lineNumber += 1
+            line = line.strip()
+
+            if len(line) == 0 or line.startswith('#'):
+                continue
+
+            lineParts = line.split(None, 1)
+            if (len(lineParts) != 2 or
+             not re.match('^[0-9a-fA-F]+$', lineParts[0])):
+                raise ValueError("Malformed checksum manifest line %d in %s: "
+                 "%s" % (lineNumber, manifestPath, line))
+
+            (checksum, path) = lineParts
+            if path.startswith('*'):
+                path = path[1:]
+
+            while path.startswith('./'):
+                path = path[2:]
+
+            entries.append((checksum.lower(), path))
+    finally:
+        manifestHandle.close()
+
+    return entries
+
+class ChecksumManifestResult(object):
+    """
+    The result of verifying a directory against a checksum manifest with
+    L{VerifyChecksumManifest}. All paths are relative to the verified
+    directory, as given in the manifest.
+    """
+    def __init__(self, algorithm, matched, mismatched, missing, extra):
+        object.__init__(self)
+        self._algorithm = algorithm
+        self._matched = tuple(matched)
+        self._mismatched = tuple(mismatched)
+        self._missing = tuple(missing)
+        self._extra = tuple(extra)
+
+    def _GetAlgorithm(self): return self._algorithm
+    def _GetMatched(self): return self._matched
+    def _GetMismatched(self): return self._mismatched
+    def _GetMissing(self): return self._missing
+    def _GetExtra(self): return self._extra
+    def _GetOk(self):
+        return len(self._mismatched) == 0 and len(self._missing) == 0
+
+    algorithm = property(_GetAlgorithm)
+    """The checksum algorithm used. Read-only.
+    @type: C{str}"""
+
+    matched = property(_GetMatched)
+    """Paths whose checksums match the manifest. Read-only.
+    @type: C{tuple} of C{str}"""
+
+    mismatched = property(_GetMismatched)
+    """Files whose checksums don't match the manifest, as C{(path,
+    expectedChecksum, actualChecksum)} tuples. Read-only.
+    @type: C{tuple} of C{tuple}s"""
+
+    missing = property(_GetMissing)
+    """Paths listed in the manifest which don't exist. Read-only.
+    @type: C{tuple} of C{str}"""
+
+    extra = property(_GetExtra)
+    """Files in the verified directory which aren't listed in the manifest
+    (if requested). Read-only.
+    @type: C{tuple} of C{str}"""
+
+    ok = property(_GetOk)
+    """Whether all files listed in the manifest exist and match their
+    checksums. (Extra files do not affect this.) Read-only.
+    @type: C{bool}"""
+
+    def __str__(self):
+        return ("%d matched, %d mismatched, %d missing, %d extra (%s)" % (
+         len(self.matched), len(self.mismatched), len(self.missing),
+         len(self.extra), self.algorithm))
+
+def VerifyChecksumManifest(manifestPath, rootDir, algorithm=None, workers=None,
+ checkExtra=True):
+    """
+    Verify the files in a directory against a checksum manifest (see 
+    L{ParseChecksumManifest}). Files are hashed in parallel, and are read in
+    chunks, so files of any size may be verified.
+
+    @param manifestPath: Path to the checksum manifest.
+    @type manifestPath: C{str}
+
+    @param rootDir: The directory paths in the manifest are relative to.
+    @type rootDir: C{str}
+
+    @param algorithm: The checksum algorithm the manifest uses. Default: 
+    determined from the manifest file name (see 
+    L{CHECKSUM_MANIFEST_ALGORITHMS}), or else from the length of the 
+    checksums in it.
+    @type algorithm: C{str}
+
+    @param workers: The number of threads to use. Default: see
+    L{GetParallelWorkerCount}.
+    @type workers: C{int}
+
+    @param checkExtra: Whether to look for files in C{rootDir} which are not
+    listed in the manifest. (The manifest file itself is never reported.)
+    @type checkExtra: C{bool}
+
+    @return: The result of the verification.
+    @rtype: L{ChecksumManifestResult}
+
+    @raise ValueError: If the manifest is malformed, the root directory is
+    invalid, or the checksum algorithm can't be determined.
+    """
+    if not os.path.isdir(rootDir):
+        raise ValueError("VerifyChecksumManifest(): invalid root directory: "
+         "%s" % (rootDir))
+
+    entries = ParseChecksumManifest(manifestPath)
+
+    if algorithm is None:
+        algorithm = CHECKSUM_MANIFEST_ALGORITHMS.get(
+         os.path.basename(manifestPath).upper())
+
+    if algorithm is None and len(entries) != 0:
+        algorithm = _CHECKSUM_LENGTH_ALGORITHMS.get(len(entries[0][0]))
+
+    if algorithm is None:
+        raise ValueError("Can't determine checksum algorithm for manifest %s"
+         % (manifestPath))
+
+    missing = []
+    presentEntries = []
+    for (checksum, path) in entries:
+        if os.path.isfile(JoinPaths(rootDir, path)):
+            presentEntries.append((checksum, path))
+        else:
+            missing.append(path)
+
+    actualChecksums = ParallelMap(lambda entry: GetFileHash(
+     JoinPaths(rootDir, entry[1]), algorithm), presentEntries, workers)
+
+    matched = []
+    mismatched = []
+    for ((checksum, path), actualChecksum) in zip(presentEntries,
+     actualChecksums):
+        if checksum == actualChecksum:
+            matched.append(path)
+        else:
+            mismatched.append((path, checksum, actualChecksum))
+
+    extra = []
+    if checkExtra:
+        listedPaths = set(os.path.normpath(path) for (checksum, path) in
+         entries)
+        manifestFile = os.path.abspath(manifestPath)
+
+        for (root, dirs, files) in os.walk(rootDir):
+            for f in files:
+                filePath = os.path.join(root, f)
+                relPath = os.path.relpath(filePath, rootDir)
+                if (relPath not in listedPaths and
+                 os.path.abspath(filePath) != manifestFile):
+                    extra.append(relPath.replace(os.sep, '/'))
+
+    return ChecksumManifestResult(algorithm, matched, mismatched, missing,
+     extra)
+
+def GetParallelWorkerCount():
+    """
+    Get the default number of workers to use for operations QuickRelease
+    runs in parallel.
+
+    This is controlled by the C{PARALLEL_WORKER_COUNT} constant; if it is
+    C{0} (the default), the number of CPUs on the machine is used.
+
+    @return: The number of workers to use.
+    @rtype: C{int}
+    """
+    workers = ConfigSpec.GetConstant('PARALLEL_WORKER_COUNT')
+    if workers > 0:
+        return workers
+
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def ParallelMap(function, items, workers=None, useProcesses=False):
+    """
+    Call the given function on each of the given items using a pool of
+    workers, and return the results in the same order as the items.
+
+    Threads are used by default; this works well for functions that spend
+    their time in I/O or in C code which releases the GIL (hashing,
+    compression, etc.) If C{useProcesses} is set, a pool of processes is used
+    instead; in that case, the function must be defined at the top level of
+    a module and the items and results must be picklable.
+
+    @param function: The function to call on each item.
+    @type function: C{function}
+
+    @param items: The items to call the function on.
+    @type items: iterable
+
+    @param workers: The number of workers to use. Default: the value
+    returned by L{GetParallelWorkerCount}.
+    @type workers: C{int}
+
+    @param useProcesses: Use a pool of processes instead of threads.
+    @type useProcesses: C{bool}
+
+    @return: The results of each call, in order.
+    @rtype: C{list}
+
+    @raise Exception: The first exception raised by the function, if any, is
+    re-raised in the caller once all the workers have stopped.
+    """
+    items = list(items)
+
+    if workers is None:
+        workers = GetParallelWorkerCount()
+
+    workers = min(workers, len(items))
+
+    if workers <= 1:
+        return list(function(i) for i in items)
+
+    if useProcesses:
+        pool = multiprocessing.Pool(workers)
+        try:
+            return pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    results = [None] * len(items)
+    errors = []
+    workQueue = Queue()
+
+    for ndx in range(len(items)):
+        workQueue.put(ndx)
+
+    def RunWorker():
+        while len(errors) == 0:
+            # All the work is queued before the workers start, so an empty
+            # queue means we're done.
+            try:
+                ndx = workQueue.get_nowait()
+            except Empty:
+                return
+
+            try:
+                results[ndx] = function(items[ndx])
+            except:
+                errors.append(sys.exc_info())
+
+    workerThreads = list(Thread(target=RunWorker) for i in range(workers))
+    for t in workerThreads:
+        t.start()
+    for t in workerThreads:
+        t.join()
+
+    if len(errors) != 0:
+        raise errors[0][0], errors[0][1], errors[0][2]
+
+    return results
 
 def GetBuildPlatform():
     """
@@ -156,7 +578,34 @@ def Makedirs(path):
     """
     if os.path.isdir(path):
         return
-    return os.makedirs(path)
+
+    try:
+        os.makedirs(path)
+    except OSError, ex:
+        # Another thread (or process) may have created it in the meantime.
+        if ex.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+def ReplaceFile(source, destination):
+    """
+    A wrapper around os.rename() which replaces the destination file if it
+    exists, as it does on POSIX platforms.
+
+    On Win32, os.rename() refuses to replace an existing file, so the
+    destination is removed first; the replacement is not atomic there.
+
+    @param source: The file to rename.
+    @type source: C{str}
+
+    @param destination: The new name of the file.
+    @type destination: C{str}
+
+    @raise OSError: for any errors the underlying implementation of 
+    C{os.rename()} (or C{os.remove()}) would.
+    """
+    if os.name == 'nt' and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
 
 def Chdir(path):
     """